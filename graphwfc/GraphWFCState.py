@@ -1,7 +1,15 @@
+import asyncio
 import math
 import random
-from collections import defaultdict
-from .helpers import get_isos, get_patterns
+import time
+from array import array
+from contextlib import nullcontext
+from functools import partial
+from heapq import heappush, heappop
+from itertools import accumulate, repeat
+import numpy as np
+from .helpers import get_iso_arrays, get_patterns, get_automorphisms, fold_patterns
+from .stats import Stats
 
 
 class _FinishedObserving(RuntimeError):
@@ -13,249 +21,1509 @@ class _Contradiction(RuntimeError):
         self.location = location
 
 
+# the kinds of changes recorded in the trail, see GraphWFCState._undo
+_TRAIL_VALUES, _TRAIL_PATTERNS, _TRAIL_FINAL_VALUE, _TRAIL_FREED_ISO, _TRAIL_FREED_NODE = range(5)
+
+_NO_PHASE = nullcontext()
+
+
+def _no_phase(name):
+    """used instead of Stats.phase if there are no stats"""
+    return _NO_PHASE
+
+
+# the amount of isos handled at once in every step of the waves, limits the temporary memory
+_WAVE_CHUNK = 1 << 16
+# after this many removed colors _propagate does the rest of the cascade in waves
+_WAVE_THRESHOLD = 1 << 10
+
+
+def _ranges(starts, ends):
+    """returns range(start, end) for all starts and ends concatenated as numpy array"""
+    lengths = ends - starts
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+
+class Step:
+    """what changed in an iteration, see :func:`~graphwfc.GraphWFCState.GraphWFCState.steps`
+
+    :ivar iteration: the iteration_count of the state after the step
+    :ivar GL_id: the index of the GL of the observed iso, None if there was nothing left to observe
+    :ivar iso: the nodes of the observed iso, None if there was nothing left to observe
+    :ivar pattern: the colors of the pattern chosen for the iso, None if there was nothing left to observe
+    :ivar colors: the color of every node whose possible colors changed in this step, None if it has
+            no final color (anymore)
+    :ivar backtracked: whether the step ran into a contradiction and backtracked
+    :ivar result: None, but True if GO is colored or False if a contradiction ended the run for the last step
+    """
+    __slots__ = 'iteration', 'GL_id', 'iso', 'pattern', 'colors', 'backtracked', 'result'
+
+    def __init__(self, iteration, GL_id, iso, pattern, colors, backtracked=False, result=None):
+        self.iteration = iteration
+        self.GL_id = GL_id
+        self.iso = iso
+        self.pattern = pattern
+        self.colors = colors
+        self.backtracked = backtracked
+        self.result = result
+
+
+class _SetDomain:
+    """domains stored as python sets of interned ids"""
+    @staticmethod
+    def full(size):
+        return set(range(size))
+
+    @staticmethod
+    def from_ids(ids):
+        return set(ids)
+
+    @staticmethod
+    def ids(domain):
+        """the ids in ascending order, both domain types have to agree on the order for fixed seeds"""
+        return sorted(domain)
+
+    @staticmethod
+    def single(i):
+        return {i}
+
+    count = len
+
+    @staticmethod
+    def contains(domain, i):
+        return i in domain
+
+    @staticmethod
+    def only(domain):
+        return next(iter(domain))
+
+    @staticmethod
+    def intersection(domain_a, domain_b):
+        return domain_a & domain_b
+
+    @staticmethod
+    def union(domain_a, domain_b):
+        return domain_a | domain_b
+
+    @staticmethod
+    def difference(domain_a, domain_b):
+        return domain_a - domain_b
+
+
+class _BitsetDomain:
+    """domains stored as python ints, the bit i is set if id i is in the domain"""
+    @staticmethod
+    def full(size):
+        return (1 << size) - 1
+
+    @staticmethod
+    def from_ids(ids):
+        domain = 0
+        for i in ids:
+            domain |= 1 << i
+        return domain
+
+    @staticmethod
+    def ids(domain):
+        ids = []
+        while domain:
+            lowest_bit = domain & -domain
+            ids.append(lowest_bit.bit_length() - 1)
+            domain ^= lowest_bit
+        return ids
+
+    @staticmethod
+    def single(i):
+        return 1 << i
+
+    @staticmethod
+    def count(domain):
+        return bin(domain).count('1')
+
+    @staticmethod
+    def contains(domain, i):
+        return domain >> i & 1 == 1
+
+    @staticmethod
+    def only(domain):
+        return domain.bit_length() - 1
+
+    @staticmethod
+    def intersection(domain_a, domain_b):
+        return domain_a & domain_b
+
+    @staticmethod
+    def union(domain_a, domain_b):
+        return domain_a | domain_b
+
+    @staticmethod
+    def difference(domain_a, domain_b):
+        return domain_a & ~domain_b
+
+
 class GraphWFCState:
     """includes everything needed to run GraphWaveFunctionCollapse
 
-    :ivar GO: a copy of the input GO but with 'invisible' nodes removed.
-            After :func:`~graphwfc.GraphWFCState.run` returned True it will be colored.
     :ivar iteration_count: The amount of iterations that :py:meth:run did since the last :py:meth:reset
+    :ivar backtrack_count: The amount of backtracks that :py:meth:run did since the last :py:meth:reset
     :ivar invisible_nodes: The nodes omitted from GO since they are not targeted by any isomorphism
+    :ivar stats: the :class:`~graphwfc.stats.Stats` collected by this state or None
+    :ivar contradiction: the location (a node or an iso) of the last contradiction :py:meth:run ran into
+            since the last :py:meth:reset, None if there was none
 
+    The input GO is not copied by the constructor, :py:attr:`GO` copies it when it's first used after the
+    construction or a :py:meth:reset. So the input GO must not be changed while the state is used, changes would
+    show up in the copies. A copy is colored in place until the next reset, then a new one is made.
     """
-    __slots__ = '_pattern_count_per_GL', '_GL_count', '_all_colors', '_values_per_node', '_node_attr', \
-                'GO', '_GO_backup', '_GO_isos_per_GL', \
-                '_isos_per_node', '_patterns_per_GL_per_iso', '_iso_entropies_per_GL', \
-                'iteration_count', 'invisible_nodes'
+    __slots__ = '_pattern_count_per_GL', '_GL_count', '_values_per_node', '_node_attr', \
+                '_domain', '_colors', '_color_ids', '_patterns_per_GL', '_pattern_weights_per_GL', '_patterns_per_GL_position_color', \
+                '_pattern_supports_per_GL', '_unsupported_values_per_GL_position', '_initial_supports_per_GL', \
+                '_pattern_weight_logs_per_GL', \
+                '_GO', '_GO_input', '_colors_in_GO', '_color_per_node', '_initial_color_per_node', '_nodes', '_node_ids', '_iso_counts_per_GL', '_GL_sizes', '_iso_nodes_per_GL', \
+                '_iso_offsets_per_node', '_iso_GL_ids', '_iso_ids', '_iso_positions', \
+                '_patterns_per_GL_per_iso', '_supports_per_GL', '_iso_entropies_per_GL', \
+                '_weight_sums_per_GL', '_weight_log_sums_per_GL', '_isos_per_entropy', '_entropy_heap', \
+                '_iso_entropy_positions_per_GL', '_removed_values', '_trail', '_decisions', \
+                '_changed_nodes', '_changed_isos_per_GL', '_initial_values_per_node', '_initial_values_in_GO', \
+                '_initial_patterns_per_GL_per_iso', '_initial_support_rows_per_GL', '_initial_changed_supports_per_GL', \
+                '_initial_weight_sums_per_GL', '_initial_weight_log_sums_per_GL', \
+                '_initial_iso_entropies_per_GL', '_initial_iso_entropy_positions_per_GL', '_initial_isos_per_entropy', \
+                '_initial_entropy_heap', '_random', '_pins', '_changed_in_step', '_nogoods_per_iso', '_nogoods_hold', \
+                'iteration_count', 'backtrack_count', 'invisible_nodes', 'stats', 'contradiction'
 
     def __init__(self, GO, GI=None, GLs=None, pattern_count_per_GL=None, GI_isos_per_GL=None, GO_isos_per_GL=None,
-                 node_attr='color', edge_attr='type'):
+                 node_attr='color', edge_attr='type', compact=False, seed=None, cache_dir=None, unique=False,
+                 stats=None):
         """the constructor sets up the state after 0 iterations
 
         This will create a GraphWFCState. Since we have to find isomorphisms this can take a while if a GL in GLs is
         'big'. If available GI_isos_per_GL, GO_isos_per_GL and pattern_count_per_GL can be set
         so they do need to be computed.
 
-        :param GO: the output graph to be colored
+        :param GO: the output graph to be colored. Nodes that already have a color (that isn't None) keep it.
+                It is not changed, but it's only copied when :py:attr:`GO` is used, so don't change it before.
         :param GI: the colored graph used as the example input. Every node must be colored and
                 None is not a accepted as color.
         :param GLs: the ordered (e.g. a list) graphs that describe the patterns
                 (optional if pattern_count_per_GL, GI_isos_per_GL and GO_isos_per_GL are given)
         :param pattern_count_per_GL: (optional) a cached return value from helpers.get_patterns()
         :param GI_isos_per_GL: (optional) a cached return value from helpers.get_isos()
-        :param GO_isos_per_GL: (optional) a cached return value from helpers.get_isos()
+        :param GO_isos_per_GL: (optional) a cached return value from helpers.get_isos() or helpers.get_iso_arrays(),
+                e.g. from a :class:`~graphwfc.lattice.Lattice`
         :param node_attr: the name of the node attribute used as color
         :param edge_attr: the name of the edge attribute used to distinguish between edges
+        :param compact: if True the possible colors per node and patterns per iso are stored as bitmasks (python ints)
+                instead of sets. This uses less memory and is faster for many colors/patterns.
+                For a fixed seed both give the same result.
+        :param seed: (optional) the seed of the random number generator used by this state.
+                If not given the global one of the random module is used.
+        :param cache_dir: (optional) a directory to cache the isos and patterns in, so they don't need to be computed
+                again for the same graphs, or an :class:`~graphwfc.cache.IsoCache`, e.g. one with another max_size
+        :param unique: if True only one iso per set of nodes in GO is used instead of one per automorphism of its GL.
+                This allows the same colorings with less work and memory for symmetric GLs, see
+                :func:`~graphwfc.helpers.unique_isos`. Needs GLs.
+        :param stats: (optional) a :class:`~graphwfc.stats.Stats` to collect numbers about this state in,
+                or True for new ones. Nothing is collected if not given.
         :raises ValueError: if OG can't be colored (if it doesn't throw it still may be impossible)
         """
         assert GLs is not None or GO_isos_per_GL is not None
         assert pattern_count_per_GL is not None or (GI is not None and (GLs is not None or GI_isos_per_GL is not None))
+        assert GLs is not None or not unique
         self._node_attr = node_attr
+        self._random = random if seed is None else random.Random(seed)
+        self._pins = dict()
+        # the nogoods by the isos in them, see learn_nogood()
+        self._nogoods_per_iso = dict()
+        # the nogoods are learned with the colors of the input GO, they don't hold once a pin replaced one
+        self._nogoods_hold = True
+        self.contradiction = None
+        # the nodes changed in the current step, only recorded by steps()
+        self._changed_in_step = None
+        self.stats = Stats() if stats is True else stats or None
+        phase = _no_phase if self.stats is None else self.stats.phase
 
         # count patterns in GI for each GL
-        if pattern_count_per_GL is None:
-            pattern_count_per_GL = get_patterns(GI=GI, GLs=GLs, GI_isos_per_GL=GI_isos_per_GL,
-                                                node_attr=node_attr, edge_attr=edge_attr)
+        with phase('patterns'):
+            if pattern_count_per_GL is None:
+                pattern_count_per_GL = get_patterns(GI=GI, GLs=GLs, GI_isos_per_GL=GI_isos_per_GL,
+                                                    node_attr=node_attr, edge_attr=edge_attr, cache_dir=cache_dir,
+                                                    unique=unique and GI_isos_per_GL is None)
+            if unique:
+                # an iso now stands for all isos on its nodes, so its patterns have to be allowed in all of them
+                pattern_count_per_GL = [fold_patterns(counted_patterns, get_automorphisms(GL, edge_attr=edge_attr))
+                                        for counted_patterns, GL in zip(pattern_count_per_GL, GLs)]
+        setup_start = time.perf_counter()
         self._pattern_count_per_GL = pattern_count_per_GL
         # count the GLs
         self._GL_count = len(pattern_count_per_GL)
 
+        self._domain = _BitsetDomain if compact else _SetDomain
+
         # get the color a GO node can be set to
         # this might not be every color of GI since only those in an area targeted by an iso are considered
         # although this might be a way to optimize...
-        self._values_per_node = dict()
-        self._all_colors = set()
+        # colors and patterns are interned, the domains only store their ids
+        self._colors = list()
+        self._color_ids = color_ids = dict()
+        self._patterns_per_GL = list()
+        self._pattern_weights_per_GL = list()
         for counted_patterns in self._pattern_count_per_GL:
             for pattern in counted_patterns.keys():
-                self._all_colors.update(pattern)
-        assert None not in self._all_colors
-
-        # find the isos in GO
-        if GO_isos_per_GL is None:
-            GO_isos_per_GL = get_isos(GB=GO, GLs=GLs, edge_attr=edge_attr)
-        self._GO_isos_per_GL = GO_isos_per_GL
-
-        # copy since we won't change input graph (deepcopy?)
-        # self.GO will be set in reset()
-        self._GO_backup = GO.copy()
-
-        # save per node in which isos it is
-        self._isos_per_node = dict()
-        for node in self._GO_backup.nodes():
-            self._isos_per_node[node] = [set() for GL in GLs]
-        for GL_id, isos in enumerate(self._GO_isos_per_GL):
-            for iso in isos:
-                for node in iso:
-                    assert node in self._GO_backup.nodes()
-                    self._isos_per_node[node][GL_id].add(iso)
-
-        # are some nodes in no are of an iso (aka invisible)? -> remove them from our Graph
+                for color in pattern:
+                    if color not in color_ids:
+                        color_ids[color] = len(self._colors)
+                        self._colors.append(color)
+            self._patterns_per_GL.append(list(counted_patterns.keys()))
+            self._pattern_weights_per_GL.append(list(counted_patterns.values()))
+        assert None not in color_ids
+        # w * log(w) per pattern, the entropy of an iso is log(sum(w)) - sum(w * log(w)) / sum(w)
+        self._pattern_weight_logs_per_GL = [[weight * math.log(weight) for weight in pattern_weights]
+                                            for pattern_weights in self._pattern_weights_per_GL]
+
+        # save which patterns have which color at which position, this is what we propagate with
+        # a support is a (position, color) pair of a GL stored as the index position * color count + color,
+        # per iso we count how many of its remaining patterns have this color at this position (AC-4)
+        self._patterns_per_GL_position_color = list()
+        self._pattern_supports_per_GL = list()
+        self._initial_supports_per_GL = list()
+        self._unsupported_values_per_GL_position = list()
+        for patterns in self._patterns_per_GL:
+            position_count = len(patterns[0]) if patterns else 0
+            pattern_ids_per_position_color = [[[] for color in self._colors] for position in range(position_count)]
+            pattern_supports = list()
+            initial_supports = array('i', [0] * (position_count * len(self._colors)))
+            for pattern_id, pattern in enumerate(patterns):
+                supports = tuple(position * len(self._colors) + color_ids[color]
+                                 for position, color in enumerate(pattern))
+                for position, color in enumerate(pattern):
+                    pattern_ids_per_position_color[position][color_ids[color]].append(pattern_id)
+                for support in supports:
+                    initial_supports[support] += 1
+                pattern_supports.append(supports)
+            self._patterns_per_GL_position_color.append(
+                [[self._domain.from_ids(pattern_ids) for pattern_ids in pattern_ids_per_color]
+                 for pattern_ids_per_color in pattern_ids_per_position_color])
+            self._pattern_supports_per_GL.append(pattern_supports)
+            self._initial_supports_per_GL.append(initial_supports)
+            # the colors that no pattern has at a position, they are removed from every node of an iso there
+            self._unsupported_values_per_GL_position.append(
+                [[color for color, pattern_ids in enumerate(pattern_ids_per_color) if not pattern_ids]
+                 for pattern_ids_per_color in pattern_ids_per_position_color])
+
+        # find the isos in GO, nodes are interned as their index in the node list of GO
+        # and the isos of a GL are stored as one array with a row per iso
+        self._nodes = list(GO.nodes())
+        setup_time = time.perf_counter() - setup_start
+        with phase('isos'):
+            iso_arrays = get_iso_arrays(GB=GO, GLs=GLs, GB_isos_per_GL=GO_isos_per_GL, edge_attr=edge_attr,
+                                        cache_dir=cache_dir, unique=unique)
+        setup_start = time.perf_counter()
+        self._iso_counts_per_GL = [len(iso_array) for iso_array in iso_arrays]
+        self._GL_sizes = [iso_array.shape[1] for iso_array in iso_arrays]
+        self._iso_nodes_per_GL = [array('i', np.ascontiguousarray(iso_array, dtype=np.intc).tobytes())
+                                  for iso_array in iso_arrays]
+
+        # save per node in which isos it is and at which position as CSR, the entries of a node are
+        # in _iso_GL_ids, _iso_ids and _iso_positions from _iso_offsets_per_node[node] to _iso_offsets_per_node[node + 1]
+        iso_nodes = np.concatenate([iso_array.ravel() for iso_array in iso_arrays])
+        iso_GL_ids = np.concatenate([np.full(iso_array.size, GL_id, np.intc)
+                                     for GL_id, iso_array in enumerate(iso_arrays)])
+        iso_ids = np.concatenate([np.repeat(np.arange(len(iso_array), dtype=np.intc), iso_array.shape[1])
+                                  for iso_array in iso_arrays])
+        iso_positions = np.concatenate([np.tile(np.arange(iso_array.shape[1], dtype=np.intc), len(iso_array))
+                                        for iso_array in iso_arrays])
+        # a stable sort keeps the entries of a node ordered by GL, iso and position
+        order = np.argsort(iso_nodes, kind='stable')
+        self._iso_GL_ids = array('i', iso_GL_ids[order].tobytes())
+        self._iso_ids = array('i', iso_ids[order].tobytes())
+        self._iso_positions = array('i', iso_positions[order].tobytes())
+        offsets = np.zeros(len(self._nodes) + 1, np.int64)
+        np.cumsum(np.bincount(iso_nodes, minlength=len(self._nodes)), out=offsets[1:])
+        self._iso_offsets_per_node = array('q', offsets.tobytes())
+
+        # the input graph is only copied when the GO property is used, the colors are kept per node id
+        self._GO_input = GO
+        self._GO = None
+        self._colors_in_GO = None
+
+        # are some nodes in no are of an iso (aka invisible)? -> they are not in our GO
         # technically not needed but it's easier if we don't need to keep them in mind
-        self.invisible_nodes = {node for node, isos_per_node in self._isos_per_node.items()
-                                if not any(isos_per_node[GL_id] for GL_id in range(self._GL_count))}
-        if self.invisible_nodes:
-            self._GO_backup = self._GO_backup.subgraph(self._GO_backup.nodes() - self.invisible_nodes).copy()
-            if __debug__:
-                print('not all nodes are in a GL-iso area, namely: ' + str(self.invisible_nodes))
-
-        # create self.GO and set initial colors
-        self.reset()
+        visible = offsets[1:] != offsets[:-1]
+        self.invisible_nodes = {self._nodes[node] for node in np.flatnonzero(~visible).tolist()}
+        self._node_ids = {self._nodes[node]: node for node in np.flatnonzero(visible).tolist()}
+        if self.invisible_nodes and __debug__:
+            print('not all nodes are in a GL-iso area, namely: ' + str(self.invisible_nodes))
+        self._initial_values_in_GO = {node: attributes[self._node_attr] for node, attributes in GO.nodes(data=True)
+                                      if self._node_attr in attributes and node in self._node_ids}
+        # the final color per node id, None if it has none (yet). Invisible nodes never get one
+        self._color_per_node = [None] * len(self._nodes)
+        for node_name, color in self._initial_values_in_GO.items():
+            self._color_per_node[self._node_ids[node_name]] = color
+        setup_time += time.perf_counter() - setup_start
+        initialization_start = time.perf_counter()
+
+        # set initial colors and propagate
+        self._initialize()
 
-    def reset(self):
+        # the state after the initial propagation is the same for every run, reset() restores it.
+        # Domains are never changed in place, so shallow copies suffice.
+        self._initial_values_per_node = self._values_per_node.copy()
+        self._initial_color_per_node = self._color_per_node.copy()
+        self._initial_patterns_per_GL_per_iso = [tuple(iso_patterns) for iso_patterns in self._patterns_per_GL_per_iso]
+        # the supports are changed in place, only those of changed isos differ from the supports of all patterns.
+        # They are kept as matrix with a row per changed iso, the row of an iso is -1 if it didn't change
+        self._initial_support_rows_per_GL = list()
+        self._initial_changed_supports_per_GL = list()
+        for GL_id, changed_isos in enumerate(self._changed_isos_per_GL):
+            rows = np.full(self._iso_counts_per_GL[GL_id], -1, np.intc)
+            changed_isos = np.array(sorted(changed_isos), np.intp)
+            rows[changed_isos] = np.arange(len(changed_isos))
+            self._initial_support_rows_per_GL.append(rows)
+            self._initial_changed_supports_per_GL.append(self._supports_matrix(GL_id)[changed_isos])
+        self._initial_weight_sums_per_GL = [array('d', weight_sums) for weight_sums in self._weight_sums_per_GL]
+        self._initial_weight_log_sums_per_GL = [array('d', weight_log_sums)
+                                                for weight_log_sums in self._weight_log_sums_per_GL]
+        self._initial_iso_entropies_per_GL = [array('d', entropies) for entropies in self._iso_entropies_per_GL]
+        self._initial_iso_entropy_positions_per_GL = [array('q', positions)
+                                                      for positions in self._iso_entropy_positions_per_GL]
+        self._initial_isos_per_entropy = {entropy: array('q', isos) for entropy, isos in self._isos_per_entropy.items()}
+        self._initial_entropy_heap = tuple(self._entropy_heap)
+        # what changes after this is recorded, so reset() only has to restore that
+        self._changed_nodes.clear()
+        for changed_isos in self._changed_isos_per_GL:
+            changed_isos.clear()
+        if self.stats is not None:
+            self.stats.add_time('setup', setup_time)
+            self.stats.add_time('initial propagation', time.perf_counter() - initialization_start)
+            self.stats.iso_counts_per_GL = list(self._iso_counts_per_GL)
+            self._record_domains()
+            self.stats.emit('construct')
+
+    def reset(self, seed=None):
         """resets the object to the state after the construction
 
         This is useful if run() runs into a contradiction (it returns false).
         Call this method and and run() can be called again.
-        This is not called automatically so that information about the contradiction can be extracted
+        This is not called automatically so that information about the contradiction can be extracted.
+        Only the nodes and isos changed since the construction or the last reset are restored, together with
+        the order of the isos in their entropy buckets, so that a run after reset() behaves exactly like
+        one after the construction.
+
+        :param seed: (optional) reseeds the random number generator of this state,
+                a run after reset(seed) gives the same result as one of a new GraphWFCState(..., seed=seed)
         """
-        # create new GO
-        self.GO = self._GO_backup.copy()
+        reset_start = time.perf_counter()
+        if seed is not None:
+            self._random = random.Random(seed)
+        self._restore()
+        # a GO returned before keeps the colors of its attempt
+        self._GO = None
+        self._colors_in_GO = None
+        self.contradiction = None
+        self.iteration_count = 0
+        self.backtrack_count = 0
+        if self.stats is not None:
+            self.stats.add_time('reset', time.perf_counter() - reset_start)
+            self.stats.emit('reset')
+
+    def _restore(self):
+        """restores the domains to the state after the construction
 
+        Only the changed nodes and isos are restored, the numbers per iso with numpy. An iso that was moved within
+        its entropy bucket counts as changed, so the buckets of the changed isos are all that differ.
+        If most nodes or isos changed, their domains are copied as a whole instead of one by one.
+        """
+        changed_nodes = self._changed_nodes
+        if 2 * len(changed_nodes) > len(self._nodes):
+            self._values_per_node[:] = self._initial_values_per_node
+            self._color_per_node[:] = self._initial_color_per_node
+        else:
+            for node in changed_nodes:
+                self._values_per_node[node] = self._initial_values_per_node[node]
+                self._color_per_node[node] = self._initial_color_per_node[node]
+        changed_nodes.clear()
+        changed_entropies = set()
+        for GL_id, changed_isos in enumerate(self._changed_isos_per_GL):
+            if not changed_isos:
+                continue
+            isos = np.fromiter(changed_isos, np.intp, len(changed_isos))
+            supports = self._supports_matrix(GL_id)
+            supports[isos] = np.frombuffer(self._initial_supports_per_GL[GL_id], np.intc)
+            rows = self._initial_support_rows_per_GL[GL_id][isos]
+            initially_changed = rows >= 0
+            supports[isos[initially_changed]] = self._initial_changed_supports_per_GL[GL_id][rows[initially_changed]]
+            entropies = np.frombuffer(self._iso_entropies_per_GL[GL_id], np.float64)
+            initial_entropies = np.frombuffer(self._initial_iso_entropies_per_GL[GL_id], np.float64)
+            changed_entropies.update(np.unique(entropies[isos]).tolist())
+            changed_entropies.update(np.unique(initial_entropies[isos]).tolist())
+            entropies[isos] = initial_entropies[isos]
+            for numbers, initial_numbers, dtype in (
+                    (self._weight_sums_per_GL, self._initial_weight_sums_per_GL, np.float64),
+                    (self._weight_log_sums_per_GL, self._initial_weight_log_sums_per_GL, np.float64),
+                    (self._iso_entropy_positions_per_GL, self._initial_iso_entropy_positions_per_GL, np.int64)):
+                np.frombuffer(numbers[GL_id], dtype)[isos] = np.frombuffer(initial_numbers[GL_id], dtype)[isos]
+            # release the buffers of the arrays
+            del supports, entropies
+            iso_patterns = self._patterns_per_GL_per_iso[GL_id]
+            initial_iso_patterns = self._initial_patterns_per_GL_per_iso[GL_id]
+            if 2 * len(changed_isos) > len(iso_patterns):
+                iso_patterns[:] = initial_iso_patterns
+            else:
+                for iso_id in changed_isos:
+                    iso_patterns[iso_id] = initial_iso_patterns[iso_id]
+            changed_isos.clear()
+        # isos with entropy 0 are in no bucket
+        changed_entropies.discard(0)
+        for entropy in changed_entropies:
+            isos = self._initial_isos_per_entropy.get(entropy)
+            if isos is None:
+                self._isos_per_entropy.pop(entropy, None)
+            else:
+                self._isos_per_entropy[entropy] = isos[:]
+        self._entropy_heap = list(self._initial_entropy_heap)
+        self._removed_values.clear()
+        self._trail = None
+        self._decisions = []
+        self._nogoods_hold = True
+
+    def _initialize(self):
+        """sets all colors and patterns as possible and propagates, this is the state after the construction"""
         # set possible colors per node
-        for node in self.GO.nodes():
-            self._values_per_node[node] = self._all_colors.copy()
+        all_values = self._domain.full(len(self._colors))
+        self._values_per_node = [None] * len(self._nodes)
+        for node in self._node_ids.values():
+            self._values_per_node[node] = all_values
 
         # set initially all patterns to allowed in all isos per GL and the respective iso entropies
-        self._patterns_per_GL_per_iso = [{} for GL_id in range(self._GL_count)]
-        self._iso_entropies_per_GL = [{} for GL_id in range(self._GL_count)]
+        self._patterns_per_GL_per_iso = [None] * self._GL_count
+        self._supports_per_GL = [None] * self._GL_count
+        self._weight_sums_per_GL = [None] * self._GL_count
+        self._weight_log_sums_per_GL = [None] * self._GL_count
+        self._iso_entropies_per_GL = [None] * self._GL_count
+        self._iso_entropy_positions_per_GL = [None] * self._GL_count
+        self._isos_per_entropy = dict()
+        self._entropy_heap = []
+        self._removed_values = []
+        self._changed_nodes = set()
+        self._changed_isos_per_GL = [set() for GL_id in range(self._GL_count)]
+        # the trail of changes is only recorded if run() may backtrack, the decisions always
+        self._trail = None
+        self._decisions = []
         for GL_id in range(self._GL_count):
-            for iso in self._GO_isos_per_GL[GL_id]:
-                self._patterns_per_GL_per_iso[GL_id][iso] = set(self._pattern_count_per_GL[GL_id].keys())
-                # TODO, if I start with all possible patterns, then this entroy is allways the same
-                self._iso_entropies_per_GL[GL_id][iso] = self._iso_entropy_per_GL(GL_id, iso)
+            iso_count = self._iso_counts_per_GL[GL_id]
+            # domains are never changed in place, so every iso can share the same one
+            self._patterns_per_GL_per_iso[GL_id] = [self._domain.full(len(self._patterns_per_GL[GL_id]))] * iso_count
+            # the supports of all isos of a GL are in one array, one after another
+            self._supports_per_GL[GL_id] = self._initial_supports_per_GL[GL_id] * iso_count
+            # the numbers per iso are stored in arrays, the sums of the weights are small enough to be exact
+            self._weight_sums_per_GL[GL_id] = array('d', [sum(self._pattern_weights_per_GL[GL_id])]) * iso_count
+            self._weight_log_sums_per_GL[GL_id] = \
+                array('d', [math.fsum(self._pattern_weight_logs_per_GL[GL_id])]) * iso_count
+            # if all patterns are possible the entropy is the same for every iso
+            self._iso_entropies_per_GL[GL_id] = array('d', [0]) * iso_count
+            self._iso_entropy_positions_per_GL[GL_id] = array('q', [0]) * iso_count
+            if iso_count:
+                entropy = self._iso_entropy_per_GL(GL_id, 0)
+                if entropy > 0:
+                    # all isos go into the same bucket at once, like _set_iso_entropy would put them there
+                    isos = self._isos_per_entropy.get(entropy)
+                    if isos is None:
+                        isos = self._isos_per_entropy[entropy] = array('q')
+                        heappush(self._entropy_heap, entropy)
+                    self._iso_entropies_per_GL[GL_id] = array('d', [entropy]) * iso_count
+                    self._iso_entropy_positions_per_GL[GL_id] = array('q', range(len(isos), len(isos) + iso_count))
+                    isos.extend(range(GL_id, iso_count * self._GL_count, self._GL_count))
 
         # constraint propagation -> remove some unallowed colors per node and patterns per iso
         try:
-            self._propagate(self.GO.nodes())
+            for GL_id in range(self._GL_count):
+                if self._iso_counts_per_GL[GL_id] and not self._patterns_per_GL[GL_id]:
+                    raise _Contradiction(self._iso(GL_id, 0))
+            self._propagate_initial()
         except _Contradiction as contradiction:
             raise ValueError("the input GO contains unallowed patterns, or isos have no allowed patterns , e.g. at: " +
                              str(contradiction.location))
+        # nodes that were not reduced but only have one color left (e.g. if there is only one color)
+        for node, values in enumerate(self._values_per_node):
+            if values is not None and self._domain.count(values) == 1:
+                self._set_final_value(node, values)
 
-        # reset iteration count
         self.iteration_count = 0
+        self.backtrack_count = 0
 
-    def _fitting_patterns_per_GL(self, GL_id, iso, removed_colors_per_node):
-        iso_patterns = self._patterns_per_GL_per_iso[GL_id][iso].copy()
-        for node in set(iso).intersection(removed_colors_per_node.keys()):
-            iso_patterns -= {pattern for pattern in iso_patterns if
-                                    pattern[iso.index(node)] in removed_colors_per_node[node]}
-        return iso_patterns
+    def _propagate_initial(self):
+        """the constraint propagation of the construction, with _waves
 
-    def _fitting_values(self, node):
-        assert self.GO.has_node(node)
-        allowedvalues_per_iso = [self._values_per_node[node]]  # it will always be a subset of this
-        for GL_id in range(self._GL_count):
-            for iso in self._isos_per_node[node][GL_id]:
-                # should safre index per node and iso, seems to be expensive?
-                value_id = iso.index(node)
-                allowedvalues_per_iso.append(
-                    {pattern[value_id] for pattern in self._patterns_per_GL_per_iso[GL_id][iso]})
-        return set.intersection(*allowedvalues_per_iso)
-
-    # multithread this?
-    def _propagate_nodes(self, nodes_to_propagate):
-        isos_to_propagate_per_GL = [set() for GL_id in range(self._GL_count)]
-        removed_values_per_node = defaultdict(set)
-        while nodes_to_propagate:
-            node = nodes_to_propagate.pop()
-            old_colors = self._values_per_node[node]
-            new_colors = self._fitting_values(node)
-            if len(new_colors) < len(old_colors):
-                self._values_per_node[node] = new_colors
-                removed_values_per_node[node].update(old_colors - new_colors)
-                for GL_id in range(self._GL_count):
-                    for iso in self._isos_per_node[node][GL_id]:
-                        isos_to_propagate_per_GL[GL_id].add(iso)
-            if len(new_colors) == 0:
-                raise _Contradiction(node)  # we can't fill GO with given patterns in the current state
-            if len(new_colors) == 1 and \
-                    (self._node_attr not in self.GO.nodes[node] or self.GO.nodes[node][self._node_attr] is None):
-                # we have the final color for this node and set it in GO
-                self.GO.nodes[node][self._node_attr] = next(iter(new_colors))  # extract the only element
-        return isos_to_propagate_per_GL, removed_values_per_node
-
-    # multithread this?
-    def _propagate_isos(self, isos_to_propagate_per_GL, removed_values_per_node):
-        nodes_to_propagate = set()
-        for GL_id in range(self._GL_count):
-            for iso in isos_to_propagate_per_GL[GL_id]:
-                old_iso_patterns = self._patterns_per_GL_per_iso[GL_id][iso]
-                new_iso_patterns = self._fitting_patterns_per_GL(GL_id, iso, removed_values_per_node)
-                # this contradiction would be found in _propagate nodes, but it's nice to know there it comes from
-                if len(new_iso_patterns) == 0:
-                    raise _Contradiction(iso)
-                if len(new_iso_patterns) < len(old_iso_patterns):
-                    self._patterns_per_GL_per_iso[GL_id][iso] = new_iso_patterns
-                    self._iso_entropies_per_GL[GL_id][iso] = self._iso_entropy_per_GL(GL_id, iso)
-                    nodes_to_propagate.update(iso)
-        return nodes_to_propagate
-
-    def _propagate(self, startnodes):
-        """constraint propagation"""
-        assert startnodes is not None
-        nodes_to_propagate = set(startnodes)
-        while nodes_to_propagate:
-            isos_to_propagate_per_GL, removed_values_per_node = self._propagate_nodes(nodes_to_propagate)
-            nodes_to_propagate = self._propagate_isos(isos_to_propagate_per_GL, removed_values_per_node)
+        This gives the same domains as removing the unsupported colors and the colors other than those of the input
+        GO with _remove_value and calling _propagate.
+        """
+        color_count = len(self._colors)
+        offsets = np.frombuffer(self._iso_offsets_per_node, np.int64)
+        # the possible colors per node, invisible nodes have none
+        visible = offsets[1:] != offsets[:-1]
+        node_colors = np.zeros((len(self._nodes), color_count), bool)
+        node_colors[visible] = True
+        wave_arrays = self._wave_arrays()
+        iso_nodes_per_GL, pattern_colors_per_GL, _ = wave_arrays
+
+        for GL_id, unsupported_values_per_position in enumerate(self._unsupported_values_per_GL_position):
+            for position, unsupported_values in enumerate(unsupported_values_per_position):
+                if unsupported_values and self._iso_counts_per_GL[GL_id]:
+                    node_colors[np.ix_(iso_nodes_per_GL[GL_id][:, position], unsupported_values)] = False
+        # nodes colored in the input GO can only have that color
+        colored_nodes = list()
+        given_colors = list()
+        for node_name, color in self._initial_values_in_GO.items():
+            if color is None:
+                continue
+            if color not in self._color_ids:
+                raise _Contradiction(node_name)
+            colored_nodes.append(self._node_ids[node_name])
+            given_colors.append(self._color_ids[color])
+        if colored_nodes:
+            given = np.zeros((len(colored_nodes), color_count), bool)
+            given[np.arange(len(colored_nodes)), given_colors] = True
+            node_colors[colored_nodes] &= given
+        # the possible patterns per iso, only created for a GL once one of its isos lost patterns
+        iso_patterns_per_GL = [None] * self._GL_count
+        changed_isos_per_GL = self._waves(node_colors, np.flatnonzero(visible & ~node_colors.all(axis=1)),
+                                          iso_patterns_per_GL, wave_arrays)
+
+        # write the changes to the domains
+        self._set_wave_colors(np.flatnonzero(visible & ~node_colors.all(axis=1)), node_colors)
+        for GL_id, changed_isos in enumerate(changed_isos_per_GL):
+            if len(changed_isos):
+                self._changed_isos_per_GL[GL_id].update(changed_isos.tolist())
+                self._set_wave_patterns(GL_id, changed_isos, iso_patterns_per_GL[GL_id], pattern_colors_per_GL[GL_id])
+        if self.stats is not None:
+            self.stats.add_wave(int(visible.sum()) * color_count - int(node_colors.sum()),
+                                sum(len(changed_isos) for changed_isos in changed_isos_per_GL))
+
+    def _propagate_waves(self):
+        """propagates the colors left in _removed_values like _propagate, but with _waves
+
+        The domains of all of GO are turned into matrices first, so this is only worth it for a big cascade.
+        The domains are only written if there was no contradiction, like the changes of _propagate they are
+        recorded in the trail and the current step.
+
+        :return: the amount of removed colors and of changed isos, for the stats
+        """
+        changed_nodes = np.unique(np.fromiter((node for node, _ in self._removed_values), np.intp,
+                                              len(self._removed_values)))
+        self._removed_values.clear()
+        wave_arrays = self._wave_arrays()
+        node_colors = self._domain_matrix(self._values_per_node, len(self._colors))
+        old_node_colors = node_colors.copy()
+        iso_patterns_per_GL = [self._domain_matrix(patterns_per_iso, len(patterns))
+                               for patterns_per_iso, patterns in zip(self._patterns_per_GL_per_iso,
+                                                                     self._patterns_per_GL)]
+        changed_isos_per_GL = self._waves(node_colors, changed_nodes, iso_patterns_per_GL, wave_arrays)
+
+        changed_nodes = np.flatnonzero((node_colors != old_node_colors).any(axis=1))
+        self._set_wave_colors(changed_nodes, node_colors)
+        for GL_id, changed_isos in enumerate(changed_isos_per_GL):
+            if len(changed_isos):
+                self._changed_isos_per_GL[GL_id].update(changed_isos.tolist())
+                self._set_wave_patterns(GL_id, changed_isos, iso_patterns_per_GL[GL_id], wave_arrays[1][GL_id])
+        return (int(old_node_colors.sum()) - int(node_colors.sum()),
+                sum(len(changed_isos) for changed_isos in changed_isos_per_GL))
+
+    def _domain_matrix(self, domains, size):
+        """returns the domains as bool matrix with a row per domain, None gives an empty row"""
+        # shared domains are only converted once, they are in the list so their ids can't be reused
+        _, first_indices, inverse = np.unique(np.fromiter(map(id, domains), np.int64, len(domains)),
+                                              return_index=True, return_inverse=True)
+        rows = np.zeros((len(first_indices), size), bool)
+        for row, index in enumerate(first_indices.tolist()):
+            if domains[index] is not None:
+                rows[row, self._domain.ids(domains[index])] = True
+        return rows[inverse]
+
+    def _wave_arrays(self):
+        """returns what _waves needs to know about the isos and patterns as numpy arrays, per GL
+
+        :return: the nodes of the isos as matrix with a row per iso, the color of every pattern at every
+                position and per position a matrix whether a pattern has a color there
+        """
+        color_count = len(self._colors)
+        iso_nodes_per_GL = [np.frombuffer(iso_nodes, np.intc).reshape(-1, GL_size)
+                            for iso_nodes, GL_size in zip(self._iso_nodes_per_GL, self._GL_sizes)]
+        pattern_colors_per_GL = [np.array([[self._color_ids[color] for color in pattern] for pattern in patterns],
+                                          np.intp).reshape(len(patterns), GL_size)
+                                 for patterns, GL_size in zip(self._patterns_per_GL, self._GL_sizes)]
+        # as matrix to find the colors of the remaining patterns
+        pattern_has_color_per_GL_position = list()
+        for pattern_colors in pattern_colors_per_GL:
+            pattern_has_color_per_position = list()
+            for position in range(pattern_colors.shape[1]):
+                pattern_has_color = np.zeros((len(pattern_colors), color_count), np.float32)
+                pattern_has_color[np.arange(len(pattern_colors)), pattern_colors[:, position]] = 1
+                pattern_has_color_per_position.append(pattern_has_color)
+            pattern_has_color_per_GL_position.append(pattern_has_color_per_position)
+        return iso_nodes_per_GL, pattern_colors_per_GL, pattern_has_color_per_GL_position
+
+    def _waves(self, node_colors, changed_nodes, iso_patterns_per_GL, wave_arrays):
+        """propagates the colors removed from the changed nodes in waves until nothing changes
+
+        Every wave is done by numpy: first the patterns of all isos with a node that lost colors in the wave before
+        are restricted, then the colors of the nodes of the isos that lost patterns.
+
+        :param node_colors: the possible colors per node as bool matrix, changed in place
+        :param changed_nodes: the nodes whose removed colors weren't propagated yet
+        :param iso_patterns_per_GL: per GL the possible patterns per iso as bool matrix, changed in place.
+                None if every iso has every pattern, it is created once one of them loses patterns
+        :param wave_arrays: from _wave_arrays
+        :return: per GL the sorted ids of the isos that lost patterns
+        """
+        offsets = np.frombuffer(self._iso_offsets_per_node, np.int64)
+        entry_GL_ids = np.frombuffer(self._iso_GL_ids, np.intc)
+        entry_iso_ids = np.frombuffer(self._iso_ids, np.intc)
+        iso_nodes_per_GL, pattern_colors_per_GL, pattern_has_color_per_GL_position = wave_arrays
+        all_changed_isos_per_GL = [[] for _ in range(self._GL_count)]
+        self._check_node_colors(node_colors, changed_nodes)
+
+        while len(changed_nodes):
+            entries = _ranges(offsets[changed_nodes], offsets[changed_nodes + 1])
+            changed_isos_per_GL = list()
+            for GL_id in range(self._GL_count):
+                isos = np.unique(entry_iso_ids[entries[entry_GL_ids[entries] == GL_id]])
+                if not len(isos):
+                    changed_isos_per_GL.append(isos)
+                    continue
+                if iso_patterns_per_GL[GL_id] is None:
+                    iso_patterns_per_GL[GL_id] = np.ones((self._iso_counts_per_GL[GL_id],
+                                                          len(self._patterns_per_GL[GL_id])), bool)
+                iso_patterns = iso_patterns_per_GL[GL_id]
+                iso_nodes = iso_nodes_per_GL[GL_id]
+                pattern_colors = pattern_colors_per_GL[GL_id]
+                changed_isos = list()
+                for chunk_start in range(0, len(isos), _WAVE_CHUNK):
+                    chunk = isos[chunk_start:chunk_start + _WAVE_CHUNK]
+                    old_patterns = iso_patterns[chunk]
+                    # a pattern stays if every node of the iso still has its color at the position
+                    patterns = old_patterns.copy()
+                    for position in range(iso_nodes.shape[1]):
+                        patterns &= node_colors[iso_nodes[chunk, position]][:, pattern_colors[:, position]]
+                    changed = (patterns != old_patterns).any(axis=1)
+                    if changed.any():
+                        # an iso without patterns takes every color from its nodes below, so the contradiction
+                        # is reported at a node like in _propagate, which removes colors before patterns run out
+                        iso_patterns[chunk[changed]] = patterns[changed]
+                        changed_isos.append(chunk[changed])
+                changed_isos = np.concatenate(changed_isos) if changed_isos else isos[:0]
+                all_changed_isos_per_GL[GL_id].append(changed_isos)
+                changed_isos_per_GL.append(changed_isos)
+            # the nodes of the changed isos only keep the colors a remaining pattern has at their position
+            candidates = np.unique(np.concatenate([iso_nodes_per_GL[GL_id][changed_isos].ravel()
+                                                   for GL_id, changed_isos in enumerate(changed_isos_per_GL)]))
+            old_colors = node_colors[candidates]
+            for GL_id, changed_isos in enumerate(changed_isos_per_GL):
+                iso_nodes = iso_nodes_per_GL[GL_id]
+                for chunk_start in range(0, len(changed_isos), _WAVE_CHUNK):
+                    chunk = changed_isos[chunk_start:chunk_start + _WAVE_CHUNK]
+                    patterns = iso_patterns_per_GL[GL_id][chunk].astype(np.float32)
+                    for position, pattern_has_color in enumerate(pattern_has_color_per_GL_position[GL_id]):
+                        # a node may be in several isos of the chunk, setting False is the same for each of them
+                        isos, colors = np.nonzero(patterns @ pattern_has_color == 0)
+                        node_colors[iso_nodes[chunk[isos], position], colors] = False
+            changed_nodes = candidates[(node_colors[candidates] != old_colors).any(axis=1)]
+            self._check_node_colors(node_colors, changed_nodes)
+        return [np.unique(np.concatenate(changed_isos)) if changed_isos else np.zeros(0, np.intp)
+                for changed_isos in all_changed_isos_per_GL]
+
+    def _set_wave_colors(self, nodes, node_colors):
+        """sets the colors the waves left to the nodes, a node with one color left gets it as final color"""
+        # equal domains are shared
+        domains = dict()
+        trail = self._trail
+        changed_in_step = self._changed_in_step
+        for node, colors in zip(nodes.tolist(), node_colors[nodes]):
+            key = colors.tobytes()
+            values = domains.get(key)
+            if values is None:
+                values = domains[key] = self._domain.from_ids(np.flatnonzero(colors).tolist())
+            if trail is not None:
+                trail.append((_TRAIL_VALUES, node, self._values_per_node[node]))
+            self._values_per_node[node] = values
+            if changed_in_step is not None:
+                changed_in_step.append(node)
+            if self._domain.count(values) == 1:
+                self._set_final_value(node, values)
+        self._changed_nodes.update(nodes.tolist())
+
+    def _set_wave_patterns(self, GL_id, isos, iso_patterns, pattern_colors):
+        """sets the patterns the waves left to the isos of the GL, together with their supports, sums and entropies"""
+        color_count = len(self._colors)
+        pattern_count = iso_patterns.shape[1]
+        # the supports are counted like in __init__, a support is position * color count + color
+        pattern_supports = np.zeros((pattern_count, len(self._initial_supports_per_GL[GL_id])), np.float32)
+        for position in range(pattern_colors.shape[1]):
+            pattern_supports[np.arange(pattern_count), position * color_count + pattern_colors[:, position]] = 1
+        pattern_weights = np.array(self._pattern_weights_per_GL[GL_id], np.float64)
+        pattern_weight_logs = np.array(self._pattern_weight_logs_per_GL[GL_id], np.float64)
+        patterns_per_iso = self._patterns_per_GL_per_iso[GL_id]
+        trail = self._trail
+        supports = self._supports_matrix(GL_id)
+        weight_sums = np.frombuffer(self._weight_sums_per_GL[GL_id], np.float64)
+        weight_log_sums = np.frombuffer(self._weight_log_sums_per_GL[GL_id], np.float64)
+        # equal domains are shared
+        domains = dict()
+        for chunk_start in range(0, len(isos), _WAVE_CHUNK):
+            chunk = isos[chunk_start:chunk_start + _WAVE_CHUNK]
+            iso_ids = chunk.tolist()
+            if trail is not None:
+                trail.extend(zip(repeat(_TRAIL_PATTERNS), repeat(GL_id), iso_ids,
+                                 [patterns_per_iso[iso_id] for iso_id in iso_ids], weight_sums[chunk].tolist(),
+                                 weight_log_sums[chunk].tolist()))
+            patterns = iso_patterns[chunk]
+            supports[chunk] = patterns.astype(np.float32) @ pattern_supports
+            weight_sums[chunk] = patterns @ pattern_weights
+            weight_log_sums[chunk] = patterns @ pattern_weight_logs
+            for iso_id, patterns_of_iso in zip(iso_ids, patterns):
+                key = patterns_of_iso.tobytes()
+                if key not in domains:
+                    domains[key] = self._domain.from_ids(np.flatnonzero(patterns_of_iso).tolist())
+                patterns_per_iso[iso_id] = domains[key]
+                self._set_iso_entropy(GL_id, iso_id, self._iso_entropy_per_GL(GL_id, iso_id))
+        # release the buffers of the arrays
+        del supports, weight_sums, weight_log_sums
+
+    def _check_node_colors(self, node_colors, nodes):
+        """raises a contradiction at the first of the nodes without colors"""
+        empty = ~node_colors[nodes].any(axis=1)
+        if empty.any():
+            raise _Contradiction(self._nodes[int(nodes[np.argmax(empty)])])
+
+    def _set_final_value(self, node, values):
+        if self._color_per_node[node] is None:
+            # we have the final color for this node, GO gets it when it's used
+            self._color_per_node[node] = self._colors[self._domain.only(values)]
+            if self._trail is not None:
+                self._trail.append((_TRAIL_FINAL_VALUE, node))
+
+    def _remove_value(self, node, color):
+        """removes a color from a node, the isos of the node will be updated in _propagate"""
+        values = self._values_per_node[node]
+        if not self._domain.contains(values, color):
+            return
+        values = self._domain.difference(values, self._domain.single(color))
+        if not values:
+            raise _Contradiction(self._nodes[node])  # we can't fill GO with given patterns in the current state
+        if self._trail is not None:
+            self._trail.append((_TRAIL_VALUES, node, self._values_per_node[node]))
+        self._values_per_node[node] = values
+        self._changed_nodes.add(node)
+        self._removed_values.append((node, color))
+        if self._changed_in_step is not None:
+            # recorded here and not when it is propagated, a contradiction leaves colors unpropagated
+            self._changed_in_step.append(node)
+        if self._domain.count(values) == 1:
+            self._set_final_value(node, values)
+
+    def _remove_patterns(self, GL_id, iso_id, removed_patterns):
+        """removes patterns from an iso and every color from a node that lost its last supporting pattern"""
+        iso_patterns = self._domain.difference(self._patterns_per_GL_per_iso[GL_id][iso_id], removed_patterns)
+        # this contradiction would be found for a node, but it's nice to know there it comes from
+        if not iso_patterns:
+            raise _Contradiction(self._iso(GL_id, iso_id))
+        if self._trail is not None:
+            self._trail.append((_TRAIL_PATTERNS, GL_id, iso_id, self._patterns_per_GL_per_iso[GL_id][iso_id],
+                                self._weight_sums_per_GL[GL_id][iso_id], self._weight_log_sums_per_GL[GL_id][iso_id]))
+        self._patterns_per_GL_per_iso[GL_id][iso_id] = iso_patterns
+        self._changed_isos_per_GL[GL_id].add(iso_id)
+        removed_pattern_ids = self._domain.ids(removed_patterns)
+        # update the sums the entropy is computed from instead of recomputing them
+        pattern_weights = self._pattern_weights_per_GL[GL_id]
+        pattern_weight_logs = self._pattern_weight_logs_per_GL[GL_id]
+        weight_sums = self._weight_sums_per_GL[GL_id]
+        weight_log_sums = self._weight_log_sums_per_GL[GL_id]
+        for pattern_id in removed_pattern_ids:
+            weight_sums[iso_id] -= pattern_weights[pattern_id]
+            weight_log_sums[iso_id] -= pattern_weight_logs[pattern_id]
+        self._set_iso_entropy(GL_id, iso_id, self._iso_entropy_per_GL(GL_id, iso_id))
+        # views of the parts of the arrays of the GL that belong to the iso
+        support_count = len(self._initial_supports_per_GL[GL_id])
+        supports = memoryview(self._supports_per_GL[GL_id])[iso_id * support_count:(iso_id + 1) * support_count]
+        GL_size = self._GL_sizes[GL_id]
+        iso = self._iso_nodes_per_GL[GL_id][iso_id * GL_size:(iso_id + 1) * GL_size]
+        pattern_supports = self._pattern_supports_per_GL[GL_id]
+        color_count = len(self._colors)
+        # all supports are counted down before a color is removed, as that may raise a contradiction and the
+        # trail entry above gives every removed pattern its supports back
+        unsupported = list()
+        for pattern_id in removed_pattern_ids:
+            for support in pattern_supports[pattern_id]:
+                supports[support] -= 1
+                if not supports[support]:
+                    unsupported.append(support)
+        for support in unsupported:
+            self._remove_value(iso[support // color_count], support % color_count)
+
+    def _propagate(self, nodes=None):
+        """constraint propagation
+
+        Every removed color removes the patterns with that color from the isos of its node.
+        This only touches the isos of nodes that lost a color and not the whole domains.
+
+        A big cascade is finished by _propagate_waves once _WAVE_THRESHOLD colors were propagated.
+
+        :param nodes: (optional) only the colors removed from these node ids are propagated, see _contradicts.
+                This isn't recorded in the stats and never done in waves.
+        """
+        removed_values = self._removed_values
+        offsets = self._iso_offsets_per_node
+        stats = self.stats if nodes is None else None
+        # counted for the stats
+        removed_value_count = changed_iso_count = 0
+        try:
+            while removed_values:
+                if removed_value_count == _WAVE_THRESHOLD and nodes is None:
+                    wave_removed_value_count, wave_changed_iso_count = self._propagate_waves()
+                    removed_value_count += wave_removed_value_count
+                    changed_iso_count += wave_changed_iso_count
+                    break
+                node, color = removed_values.pop()
+                if nodes is not None and node not in nodes:
+                    continue
+                removed_value_count += 1
+                start, end = offsets[node], offsets[node + 1]
+                for GL_id, iso_id, position in zip(self._iso_GL_ids[start:end], self._iso_ids[start:end],
+                                                   self._iso_positions[start:end]):
+                    removed_patterns = self._domain.intersection(self._patterns_per_GL_per_iso[GL_id][iso_id],
+                                                                 self._patterns_per_GL_position_color[GL_id][position][color])
+                    if removed_patterns:
+                        changed_iso_count += 1
+                        self._remove_patterns(GL_id, iso_id, removed_patterns)
+        except _Contradiction:
+            removed_values.clear()
+            raise
+        finally:
+            if stats is not None:
+                stats.add_wave(removed_value_count, changed_iso_count)
+
+    def _set_iso_entropy(self, GL_id, iso_id, entropy):
+        """moves the iso into the bucket of isos with the given entropy, isos with entropy 0 are in no bucket
+
+        The buckets are arrays, an iso is stored in them as iso_id * GL count + GL_id.
+        """
+        old_entropy = self._iso_entropies_per_GL[GL_id][iso_id]
+        if entropy == old_entropy:
+            return
+        positions = self._iso_entropy_positions_per_GL
+        if old_entropy > 0:
+            # swap the last iso of the bucket into the position of the removed one
+            isos = self._isos_per_entropy[old_entropy]
+            position = positions[GL_id][iso_id]
+            last_iso = isos.pop()
+            if position < len(isos):
+                isos[position] = last_iso
+                last_iso_id, last_GL_id = divmod(last_iso, self._GL_count)
+                positions[last_GL_id][last_iso_id] = position
+                # its position has to be restored by reset()
+                self._changed_isos_per_GL[last_GL_id].add(last_iso_id)
+            elif not isos:
+                # the entropy stays in the heap, it is skipped when it comes up in _iso_observe
+                del self._isos_per_entropy[old_entropy]
+        self._iso_entropies_per_GL[GL_id][iso_id] = entropy
+        if entropy > 0:
+            isos = self._isos_per_entropy.get(entropy)
+            if isos is None:
+                isos = self._isos_per_entropy[entropy] = array('q')
+                heappush(self._entropy_heap, entropy)
+            positions[GL_id][iso_id] = len(isos)
+            isos.append(iso_id * self._GL_count + GL_id)
 
     def _iso_observe(self):
-        """"chooses iso with low entropy > 0 and applies a pattern"""
-        # choose an isomorphism
-        min_GL_and_isos = []
-        min_entropy = float('inf')
-        for GL_id in range(self._GL_count):
-            for iso, entropy in self._iso_entropies_per_GL[GL_id].items():
-                if entropy > 0:
-                    if entropy < min_entropy:
-                        min_GL_and_isos = []
-                        min_entropy = entropy
-                    if entropy == min_entropy:
-                        min_GL_and_isos.append((GL_id, iso))
-        if not min_GL_and_isos:
+        """"chooses iso with low entropy > 0 and applies a pattern
+
+        :return: the GL id and id of the iso and the id of the pattern
+        """
+        # choose an isomorphism from the bucket with the lowest entropy
+        while self._entropy_heap and self._entropy_heap[0] not in self._isos_per_entropy:
+            heappop(self._entropy_heap)
+        if not self._entropy_heap:
             # we finished observing GO since all entropies are 0
             raise _FinishedObserving
-        observe_GL, observe_iso = random.choice(min_GL_and_isos)
-        # choose a pattern
-        possible_patterns = self._patterns_per_GL_per_iso[observe_GL][observe_iso]
-        weighted_patterns = []
-        for pattern in possible_patterns:
-            weighted_patterns.extend([pattern] * self._pattern_count_per_GL[observe_GL][pattern])
-        chosen_pattern = random.choice(weighted_patterns)
+        observe_iso, observe_GL = divmod(self._random.choice(self._isos_per_entropy[self._entropy_heap[0]]),
+                                         self._GL_count)
+        if self._nogoods_per_iso and self._nogoods_hold:
+            # the patterns that would complete a nogood can't be chosen
+            banned_patterns = self._domain.intersection(self._patterns_per_GL_per_iso[observe_GL][observe_iso],
+                                                        self._nogood_patterns(observe_GL, observe_iso))
+            if banned_patterns:
+                self._remove_patterns(observe_GL, observe_iso, banned_patterns)
+        # choose a pattern, random.choices uses a binary search on the cumulative weights
+        possible_patterns = self._domain.ids(self._patterns_per_GL_per_iso[observe_GL][observe_iso])
+        pattern_weights = self._pattern_weights_per_GL[observe_GL]
+        chosen_pattern = self._random.choices(possible_patterns, cum_weights=list(
+            accumulate(pattern_weights[pattern] for pattern in possible_patterns)))[0]
+        self._decisions.append((0 if self._trail is None else len(self._trail), observe_GL, observe_iso,
+                                chosen_pattern))
         # apply pattern
-        self._patterns_per_GL_per_iso[observe_GL][observe_iso] = {chosen_pattern}
-        self._iso_entropies_per_GL[observe_GL][observe_iso] = 0  # 0 == self.iso_entropy(observe_iso)
-        return observe_iso
+        self._remove_patterns(observe_GL, observe_iso,
+                              self._domain.difference(self._patterns_per_GL_per_iso[observe_GL][observe_iso],
+                                                      self._domain.single(chosen_pattern)))
+        assert self._iso_entropies_per_GL[observe_GL][observe_iso] == 0
+        return observe_GL, observe_iso, chosen_pattern
+
+    def _undo(self, trail_length):
+        """reverts the changes in the trail until it has the given length"""
+        self._removed_values.clear()
+        trail = self._trail
+        while len(trail) > trail_length:
+            change = trail.pop()
+            if change[0] == _TRAIL_VALUES:
+                _, node, values = change
+                self._values_per_node[node] = values
+                if self._changed_in_step is not None:
+                    self._changed_in_step.append(node)
+            elif change[0] == _TRAIL_PATTERNS:
+                _, GL_id, iso_id, iso_patterns, weight_sum, weight_log_sum = change
+                # give the removed patterns their support back
+                supports = self._supports_per_GL[GL_id]
+                first_support = iso_id * len(self._initial_supports_per_GL[GL_id])
+                pattern_supports = self._pattern_supports_per_GL[GL_id]
+                removed_patterns = self._domain.difference(iso_patterns, self._patterns_per_GL_per_iso[GL_id][iso_id])
+                for pattern_id in self._domain.ids(removed_patterns):
+                    for support in pattern_supports[pattern_id]:
+                        supports[first_support + support] += 1
+                self._patterns_per_GL_per_iso[GL_id][iso_id] = iso_patterns
+                self._weight_sums_per_GL[GL_id][iso_id] = weight_sum
+                self._weight_log_sums_per_GL[GL_id][iso_id] = weight_log_sum
+                self._set_iso_entropy(GL_id, iso_id, self._iso_entropy_per_GL(GL_id, iso_id))
+            elif change[0] == _TRAIL_FINAL_VALUE:
+                _, node = change
+                self._color_per_node[node] = None
+            elif change[0] == _TRAIL_FREED_ISO:
+                _, GL_id, iso_id, iso_patterns, weight_sum, weight_log_sum, iso_supports = change
+                support_count = len(self._initial_supports_per_GL[GL_id])
+                self._supports_per_GL[GL_id][iso_id * support_count:(iso_id + 1) * support_count] = iso_supports
+                self._patterns_per_GL_per_iso[GL_id][iso_id] = iso_patterns
+                self._weight_sums_per_GL[GL_id][iso_id] = weight_sum
+                self._weight_log_sums_per_GL[GL_id][iso_id] = weight_log_sum
+                self._set_iso_entropy(GL_id, iso_id, self._iso_entropy_per_GL(GL_id, iso_id))
+            else:
+                _, node, color = change
+                self._color_per_node[node] = color
 
-    def run(self, iter: int = -1):
+    def _nogood_patterns(self, GL_id, iso_id):
+        """returns the patterns of the iso that are the last decision missing from a nogood, as domain"""
+        banned_patterns = list()
+        for nogood in self._nogoods_per_iso.get(iso_id * self._GL_count + GL_id, ()):
+            for nogood_GL_id, nogood_iso_id, pattern_id in nogood:
+                if nogood_GL_id == GL_id and nogood_iso_id == iso_id:
+                    banned_pattern = pattern_id
+                elif self._patterns_per_GL_per_iso[nogood_GL_id][nogood_iso_id] != self._domain.single(pattern_id):
+                    break
+            else:
+                banned_patterns.append(banned_pattern)
+        return self._domain.from_ids(banned_patterns)
+
+    def _backtrack(self, max_backtracks, backtrack_depth):
+        """undoes the last decisions and bans the pattern chosen by the first of them
+
+        If banning the pattern leads to a contradiction too, the decision before it is undone.
+
+        :return: False if there was no decision left to undo or the backtrack budget was used up
+        """
+        while self._decisions and self.backtrack_count < max_backtracks:
+            self.backtrack_count += 1
+            undone_decisions = self._decisions[-backtrack_depth:]
+            del self._decisions[-backtrack_depth:]
+            trail_length, GL_id, iso_id, pattern_id = undone_decisions[0]
+            self._undo(trail_length)
+            try:
+                self._remove_patterns(GL_id, iso_id, self._domain.single(pattern_id))
+                self._propagate()
+                return True
+            except _Contradiction:
+                backtrack_depth = 1
+        return False
+
+    def run(self, iter: int = -1, max_backtracks: int = 0, backtrack_depth: int = 1, time_budget=None):
         """runs GraphWaveFunctionCollapse on the graphs
 
         After initialising the GraphWFCState, we need to run the GraphWaveFunctionCollapse algorithm using this method.
         It will iterate until a contradiction is observed, colors were determined for all nodes
         or after the given amount of maximal iterations.
+        If backtracking is allowed, the changes of every iteration are recorded. A contradiction then undoes the last
+        iterations and forbids the pattern that was chosen in the first of them instead of failing.
 
         :param iter: the maximum amount of GraphWaveFunctionCollapse-iterations. No limiting if negative
+        :param max_backtracks: how often we may backtrack since the last :py:meth:reset, see backtrack_count
+        :param backtrack_depth: the amount of iterations undone per backtrack
+        :param time_budget: (optional) the seconds after which run() returns like when iter is used up,
+                calling it again continues. This allows to give control back, e.g. to an event loop
         :return: True if GO has been completely colored, False if a contradiction occurred and nothing if the maximum amount
-                of iterations was used up.
+                of iterations or the time budget was used up.
         """
-        try:
-            while iter != 0:
+        assert backtrack_depth > 0
+        if max_backtracks > self.backtrack_count and self._trail is None:
+            self._trail = []
+            self._decisions = []
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        if self.stats is None:
+            return self._run(iter, max_backtracks, backtrack_depth, deadline, self._iso_observe, self._propagate,
+                             self._backtrack)
+        # without backtracks left a contradiction ends the run, that isn't a backtrack
+        backtrack = self._backtrack if max_backtracks <= self.backtrack_count \
+            else partial(self._timed, 'backtrack', self._backtrack)
+        result = self._run(iter, max_backtracks, backtrack_depth, deadline,
+                           partial(self._timed, 'observe', self._iso_observe),
+                           partial(self._timed, 'propagate', self._propagate), backtrack)
+        if result is not None:
+            # looking at all of GO after every time slice would cost more than the slices
+            self._record_domains()
+        self.stats.emit('run')
+        return result
+
+    def _run(self, iter, max_backtracks, backtrack_depth, deadline, observe, propagate, backtrack):
+        """the loop of run(), the steps are given so that they can be timed"""
+        while iter != 0:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            try:
                 self.iteration_count += 1
-                iso = self._iso_observe()
-                self._propagate(iso)
-                iter -= 1
-        except _FinishedObserving:
-            return True
+                observe()
+                propagate()
+            except _FinishedObserving:
+                return True
+            except _Contradiction as contradiction:
+                self.contradiction = contradiction.location
+                if self.stats is not None:
+                    self.stats.contradictions.append(contradiction.location)
+                if not backtrack(max_backtracks, backtrack_depth):
+                    return False
+            iter -= 1
+
+    def steps(self, max_backtracks: int = 0, backtrack_depth: int = 1):
+        """runs GraphWaveFunctionCollapse like :py:meth:run and yields what changed after every iteration
+
+        Only the nodes that changed are given, so a preview can be updated without looking at all of GO.
+        The generator can be stopped at any time, :py:meth:run or steps() continue from there.
+
+        >>> for step in S.steps():
+        ...     update_preview(step.colors)
+
+        :param max_backtracks: see :py:meth:run
+        :param backtrack_depth: see :py:meth:run
+        :return: a generator of :class:`Step`, the result of the last one is True or False
+        """
+        assert backtrack_depth > 0
+        if max_backtracks > self.backtrack_count and self._trail is None:
+            self._trail = []
+            self._decisions = []
+        self._changed_in_step = changed_nodes = []
+        try:
+            while True:
+                GL_id = iso_id = pattern_id = result = None
+                backtracked = False
+                try:
+                    self.iteration_count += 1
+                    GL_id, iso_id, pattern_id = self._iso_observe()
+                    self._propagate()
+                except _FinishedObserving:
+                    result = True
+                except _Contradiction as contradiction:
+                    self.contradiction = contradiction.location
+                    if self.stats is not None:
+                        self.stats.contradictions.append(contradiction.location)
+                    backtracked = True
+                    if not self._backtrack(max_backtracks, backtrack_depth):
+                        result = False
+                colors = dict()
+                for node in changed_nodes:
+                    colors[self._nodes[node]] = self._color_per_node[node]
+                changed_nodes.clear()
+                if GL_id is None:
+                    yield Step(self.iteration_count, None, None, None, colors, backtracked, result)
+                else:
+                    yield Step(self.iteration_count, GL_id, self._iso(GL_id, iso_id),
+                               self._patterns_per_GL[GL_id][pattern_id], colors, backtracked, result)
+                if result is not None:
+                    return
+        finally:
+            self._changed_in_step = None
+
+    async def run_async(self, max_backtracks: int = 0, backtrack_depth: int = 1, time_slice=0.01):
+        """runs like :py:meth:run but gives control back to the event loop every time_slice seconds
+
+        :param max_backtracks: see :py:meth:run
+        :param backtrack_depth: see :py:meth:run
+        :param time_slice: the seconds to run between giving control back
+        :return: see :py:meth:run
+        """
+        while True:
+            result = self.run(max_backtracks=max_backtracks, backtrack_depth=backtrack_depth, time_budget=time_slice)
+            if result is not None:
+                return result
+            await asyncio.sleep(0)
+
+    async def steps_async(self, max_backtracks: int = 0, backtrack_depth: int = 1, time_slice=0.01):
+        """yields the same steps as :py:meth:steps but gives control back to the event loop every time_slice seconds
+
+        >>> async for step in S.steps_async():
+        ...     await websocket.send(json.dumps(step.colors))
+
+        :param max_backtracks: see :py:meth:run
+        :param backtrack_depth: see :py:meth:run
+        :param time_slice: the seconds to run between giving control back
+        :return: an async generator of :class:`Step`
+        """
+        deadline = time.perf_counter() + time_slice
+        for step in self.steps(max_backtracks=max_backtracks, backtrack_depth=backtrack_depth):
+            yield step
+            if time.perf_counter() >= deadline:
+                await asyncio.sleep(0)
+                deadline = time.perf_counter() + time_slice
+
+    @property
+    def GO(self):
+        """a copy of the input GO but with 'invisible' nodes removed and the colors found so far
+
+        After :func:`~graphwfc.GraphWFCState.run` returned True it will be colored.
+        The copy is made when GO is used first after the construction or a reset, later uses only update the
+        colors that changed since. So every attempt gets its own copy.
+        """
+        if self._GO is None:
+            self._GO = self._GO_input.copy()
+            self._GO.remove_nodes_from(self.invisible_nodes)
+            self._colors_in_GO = [None] * len(self._nodes)
+            for node_name, color in self._initial_values_in_GO.items():
+                self._colors_in_GO[self._node_ids[node_name]] = color
+        if self._colors_in_GO != self._color_per_node:
+            nodes = self._GO.nodes
+            for node, (color, color_in_GO) in enumerate(zip(self._color_per_node, self._colors_in_GO)):
+                if color is not color_in_GO:
+                    node_name = self._nodes[node]
+                    if color is not None or node_name in self._initial_values_in_GO:
+                        nodes[node_name][self._node_attr] = color
+                    else:
+                        del nodes[node_name][self._node_attr]
+            self._colors_in_GO = self._color_per_node.copy()
+        return self._GO
+
+    def colors(self):
+        """returns the color per node without building GO
+
+        Nothing is copied, the lists are the ones of the state and must not be changed.
+        They change when the state does.
+
+        >>> nodes, colors = S.colors()
+        >>> dict(zip(nodes, colors))
+
+        :return: the nodes of the input GO (including the invisible ones) and a list with the color of the node
+                at the same index, None if it has no color (yet)
+        """
+        return self._nodes, self._color_per_node
+
+    def possible_colors(self, node):
+        """returns the colors the node can still have
+
+        :param node: a node of GO
+        """
+        return [self._colors[color] for color in self._domain.ids(self._values_per_node[self._node_ids[node]])]
+
+    def _timed(self, phase, step, *args):
+        with self.stats.phase(phase):
+            return step(*args)
+
+    def _record_domains(self):
+        """sets the histograms of the stats to the current amount of colors per node and patterns per iso"""
+        self.stats.set_histograms(
+            [self._domain.count(values) for values in self._values_per_node if values is not None],
+            [[self._domain.count(iso_patterns) for iso_patterns in patterns_per_iso]
+             for patterns_per_iso in self._patterns_per_GL_per_iso])
+
+    def learn_nogood(self, max_size=8):
+        """learns from a failed run which decisions can't be made together, so that later runs avoid them
+
+        Call this after :py:meth:run returned False. A decision is an iso that was given a pattern by an
+        observation. This looks for a few of the decisions of the run, close to the contradiction, that lead to
+        a contradiction on their own when they are propagated from the state after the construction.
+        Such a nogood holds for every later run of this state. When all but one of its decisions are made,
+        the pattern of the last one is removed from its iso before the iso is observed.
+        The nogoods are learned with the colors of the input GO. After :py:meth:resolve gave a pinned node another
+        color than the one it has in the input GO they may not hold, so they aren't used until the next reset.
+        The state is reset afterwards like with :py:meth:reset (without a seed), the nogoods are kept.
+
+        :param max_size: the most decisions a nogood may have, bigger ones are rarely completed and not learned
+        :return: the nogood as list of (GL id, iso, pattern) or None if none with at most max_size decisions
+                was found
+        """
+        decisions = [(GL_id, iso_id, pattern_id) for _, GL_id, iso_id, pattern_id in self._decisions]
+        location = self.contradiction
+        self.reset()
+        if not decisions or location is None:
+            return None
+        nogood = self._find_nogood(decisions, location, max_size)
+        if nogood is None:
+            return None
+        for GL_id, iso_id, _ in nogood:
+            self._nogoods_per_iso.setdefault(iso_id * self._GL_count + GL_id, []).append(nogood)
+        return [(GL_id, self._iso(GL_id, iso_id), self._patterns_per_GL[GL_id][pattern_id])
+                for GL_id, iso_id, pattern_id in nogood]
+
+    def _find_nogood(self, decisions, location, max_size):
+        """returns a small subset of the decisions that contradicts, as sorted tuple, or None"""
+        # the decisions by the distance of their isos to the contradiction (a hop is an iso),
+        # the later ones first if they have the same distance
+        decision_order = {decision: index for index, decision in enumerate(decisions)}
+        decisions_per_node = dict()
+        for GL_id, iso_id, pattern_id in decision_order:
+            GL_size = self._GL_sizes[GL_id]
+            for node in self._iso_nodes_per_GL[GL_id][iso_id * GL_size:(iso_id + 1) * GL_size]:
+                decisions_per_node.setdefault(node, []).append((GL_id, iso_id, pattern_id))
+        location_nodes = [location] if location in self._node_ids else location
+        nearby_nodes = {self._node_ids[node] for node in location_nodes}
+        frontier = list(nearby_nodes)
+        candidates = list()
+        while frontier and len(candidates) < min(4 * max_size, len(decision_order)):
+            new_decisions = {decision for node in frontier for decision in decisions_per_node.get(node, ())}
+            new_decisions.difference_update(candidates)
+            candidates.extend(sorted(new_decisions, key=decision_order.get, reverse=True))
+            frontier = [node for node in self._iso_neighborhood(frontier, 1) if node not in nearby_nodes]
+            nearby_nodes.update(frontier)
+        # the propagation of the tests stays close to the candidates, far away contradictions aren't needed
+        region = self._iso_neighborhood(nearby_nodes, 2)
+        if not self._contradicts(candidates, region):
+            return None
+        # the shortest start of the candidates that contradicts, its last decision is needed
+        low, high = 0, len(candidates)
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self._contradicts(candidates[:middle], region):
+                high = middle
+            else:
+                low = middle
+        if high > 2 * max_size:
+            return None
+        # leave out the other decisions that aren't needed, the farthest first
+        nogood = candidates[:high]
+        for decision in reversed(candidates[:high - 1]):
+            nogood.remove(decision)
+            if not self._contradicts(nogood, region):
+                nogood.append(decision)
+        if len(nogood) > max_size:
+            return None
+        return tuple(sorted(nogood))
+
+    def _contradicts(self, decisions, nodes):
+        """returns whether the decisions lead to a contradiction from the state after the construction
+
+        Only the colors removed from the given nodes are propagated. Every contradiction found like this is one
+        of the full propagation too, but this doesn't have to touch all of GO. The state is restored afterwards.
+        """
+        try:
+            for GL_id, iso_id, pattern_id in decisions:
+                iso_patterns = self._patterns_per_GL_per_iso[GL_id][iso_id]
+                if not self._domain.contains(iso_patterns, pattern_id):
+                    return True
+                removed_patterns = self._domain.difference(iso_patterns, self._domain.single(pattern_id))
+                if removed_patterns:
+                    self._remove_patterns(GL_id, iso_id, removed_patterns)
+            self._propagate(nodes)
+            return False
         except _Contradiction:
+            return True
+        finally:
+            self._restore()
+
+    @property
+    def nogoods(self):
+        """the nogoods learned by :py:meth:learn_nogood, each as list of (GL id, iso, pattern)"""
+        nogoods = {nogood for iso_nogoods in self._nogoods_per_iso.values() for nogood in iso_nogoods}
+        return [[(GL_id, self._iso(GL_id, iso_id), self._patterns_per_GL[GL_id][pattern_id])
+                 for GL_id, iso_id, pattern_id in nogood] for nogood in sorted(nogoods)]
+
+    def pin(self, colors):
+        """pins nodes to colors, :py:meth:resolve only gives them these colors
+
+        A pin takes the place of a color the node had in the input GO. Nothing changes until the nodes are resolved.
+        Resolving a node pinned to another color than its color in the input GO turns the learned nogoods off until
+        the next reset, see :py:meth:learn_nogood.
+
+        :param colors: a dict with the color per node, the colors have to be in a pattern
+        """
+        for node, color in colors.items():
+            assert node in self._node_ids, 'only nodes in GO can be pinned'
+            assert color in self._color_ids, 'the color is in no pattern'
+        self._pins.update(colors)
+
+    def unpin(self, nodes):
+        """removes the pins of the nodes, nodes without a pin are ignored
+
+        :param nodes: the nodes to unpin
+        """
+        for node in nodes:
+            self._pins.pop(node, None)
+
+    @property
+    def pins(self):
+        """a copy of the pinned color per node"""
+        return dict(self._pins)
+
+    def resolve(self, nodes, hops=1, iter=-1, max_backtracks=0, backtrack_depth=1):
+        """colors the nodes and their surroundings again while the rest of GO keeps its colors
+
+        The nodes at most hops isos away from the given nodes are freed, that is they may get any color again,
+        and the isos with a freed node any pattern. This is propagated from the colors of the other nodes, which
+        don't change, and the pins (or the colors of the input GO) of the freed nodes. Then :py:meth:run colors
+        the freed nodes, its work only depends on their amount and not on the size of GO.
+        Usually called after run() returned True, e.g. after some nodes were pinned to new colors.
+        If the freed nodes can't be colored, the state before resolve() is restored.
+
+        :param nodes: the nodes to color again, the center of the freed area
+        :param hops: the freed nodes share a chain of at most this many isos with one of the given nodes,
+                with 0 only the given nodes are freed
+        :param iter: see :py:meth:run
+        :param max_backtracks: see :py:meth:run, iteration_count and backtrack_count start at 0 again
+        :param backtrack_depth: see :py:meth:run
+        :return: True if the freed nodes were colored, False if not (nothing changed) and nothing if the iterations
+                were used up, run() continues then
+        """
+        freed_nodes = sorted(self._iso_neighborhood([self._node_ids[node] for node in nodes], hops))
+        freed_isos_per_GL = [set() for GL_id in range(self._GL_count)]
+        for node in freed_nodes:
+            for entry in range(self._iso_offsets_per_node[node], self._iso_offsets_per_node[node + 1]):
+                freed_isos_per_GL[self._iso_GL_ids[entry]].add(self._iso_ids[entry])
+        # a pin that replaces a color of the input GO may allow what a learned nogood forbids
+        nogoods_held = self._nogoods_hold
+        for node in freed_nodes:
+            given_color = self._initial_values_in_GO.get(self._nodes[node])
+            if given_color is not None and self._pins.get(self._nodes[node], given_color) != given_color:
+                self._nogoods_hold = False
+        # everything from here on is recorded, so that a failure can be undone
+        self._trail = []
+        self._decisions = []
+        self._removed_values.clear()
+        self.iteration_count = 0
+        self.backtrack_count = 0
+        for GL_id, freed_isos in enumerate(freed_isos_per_GL):
+            weight_sum = sum(self._pattern_weights_per_GL[GL_id])
+            weight_log_sum = math.fsum(self._pattern_weight_logs_per_GL[GL_id])
+            for iso_id in sorted(freed_isos):
+                self._free_iso(GL_id, iso_id, weight_sum, weight_log_sum)
+        for node in freed_nodes:
+            self._free_node(node)
+        try:
+            for node in freed_nodes:
+                for entry in range(self._iso_offsets_per_node[node], self._iso_offsets_per_node[node + 1]):
+                    for color in self._unsupported_values_per_GL_position[self._iso_GL_ids[entry]][
+                            self._iso_positions[entry]]:
+                        self._remove_value(node, color)
+                node_name = self._nodes[node]
+                color = self._pins.get(node_name, self._initial_values_in_GO.get(node_name))
+                if color is not None:
+                    if color not in self._color_ids:
+                        raise _Contradiction(node_name)
+                    for other_color in range(len(self._colors)):
+                        if other_color != self._color_ids[color]:
+                            self._remove_value(node, other_color)
+            # the freed isos only keep the patterns that fit the colors their nodes have left
+            for GL_id, freed_isos in enumerate(freed_isos_per_GL):
+                for iso_id in sorted(freed_isos):
+                    self._restrict_iso(GL_id, iso_id)
+            self._propagate()
+        except _Contradiction as contradiction:
+            if self.stats is not None:
+                self.stats.contradictions.append(contradiction.location)
+            self._undo(0)
+            self._trail = None
+            self._decisions = []
+            self._nogoods_hold = nogoods_held
             return False
+        for node in freed_nodes:
+            if self._domain.count(self._values_per_node[node]) == 1:
+                self._set_final_value(node, self._values_per_node[node])
+        result = self.run(iter=iter, max_backtracks=max_backtracks, backtrack_depth=backtrack_depth)
+        if result is None:
+            return None
+        if not result:
+            self._undo(0)
+            self._nogoods_hold = nogoods_held
+        self._trail = None
+        self._decisions = []
+        return result
+
+    def _iso_neighborhood(self, nodes, hops):
+        """returns the nodes that share a chain of at most hops isos with one of the given nodes"""
+        neighborhood = set(nodes)
+        frontier = list(neighborhood)
+        offsets = self._iso_offsets_per_node
+        for hop in range(hops):
+            next_frontier = list()
+            for node in frontier:
+                for entry in range(offsets[node], offsets[node + 1]):
+                    GL_size = self._GL_sizes[self._iso_GL_ids[entry]]
+                    first_node = self._iso_ids[entry] * GL_size
+                    for other_node in self._iso_nodes_per_GL[self._iso_GL_ids[entry]][first_node:first_node + GL_size]:
+                        if other_node not in neighborhood:
+                            neighborhood.add(other_node)
+                            next_frontier.append(other_node)
+            frontier = next_frontier
+        return neighborhood
+
+    def _free_iso(self, GL_id, iso_id, weight_sum, weight_log_sum):
+        """allows every pattern in the iso again, the removed patterns are not propagated"""
+        all_supports = self._initial_supports_per_GL[GL_id]
+        supports = self._supports_per_GL[GL_id]
+        first_support = iso_id * len(all_supports)
+        self._trail.append((_TRAIL_FREED_ISO, GL_id, iso_id, self._patterns_per_GL_per_iso[GL_id][iso_id],
+                            self._weight_sums_per_GL[GL_id][iso_id], self._weight_log_sums_per_GL[GL_id][iso_id],
+                            supports[first_support:first_support + len(all_supports)]))
+        supports[first_support:first_support + len(all_supports)] = all_supports
+        self._patterns_per_GL_per_iso[GL_id][iso_id] = self._domain.full(len(self._patterns_per_GL[GL_id]))
+        self._weight_sums_per_GL[GL_id][iso_id] = weight_sum
+        self._weight_log_sums_per_GL[GL_id][iso_id] = weight_log_sum
+        self._changed_isos_per_GL[GL_id].add(iso_id)
+        self._set_iso_entropy(GL_id, iso_id, self._iso_entropy_per_GL(GL_id, iso_id))
+
+    def _restrict_iso(self, GL_id, iso_id):
+        """removes the patterns from the iso that have a color at a position that its node doesn't have anymore"""
+        GL_size = self._GL_sizes[GL_id]
+        iso_patterns = self._patterns_per_GL_per_iso[GL_id][iso_id]
+        fitting_patterns = iso_patterns
+        for position, node in enumerate(self._iso_nodes_per_GL[GL_id][iso_id * GL_size:(iso_id + 1) * GL_size]):
+            values = self._values_per_node[node]
+            if self._domain.count(values) == len(self._colors):
+                continue
+            patterns_per_color = self._patterns_per_GL_position_color[GL_id][position]
+            patterns = self._domain.from_ids(())
+            for color in self._domain.ids(values):
+                patterns = self._domain.union(patterns, patterns_per_color[color])
+            fitting_patterns = self._domain.intersection(fitting_patterns, patterns)
+        removed_patterns = self._domain.difference(iso_patterns, fitting_patterns)
+        if removed_patterns:
+            self._remove_patterns(GL_id, iso_id, removed_patterns)
 
-    def _iso_entropy_per_GL(self, GL_id, iso):
-        """returns isos Shannon entropy"""
-        fitting_patterns = self._patterns_per_GL_per_iso[GL_id][iso]
-        if not fitting_patterns:
+    def _free_node(self, node):
+        """allows every color at the node again and removes its color from GO"""
+        self._trail.append((_TRAIL_VALUES, node, self._values_per_node[node]))
+        self._values_per_node[node] = self._domain.full(len(self._colors))
+        self._changed_nodes.add(node)
+        if self._color_per_node[node] is not None:
+            self._trail.append((_TRAIL_FREED_NODE, node, self._color_per_node[node]))
+            self._color_per_node[node] = None
+
+    def _supports_matrix(self, GL_id):
+        """returns the supports of the GL as numpy view with a row per iso, delete it before the array is resized"""
+        return np.frombuffer(self._supports_per_GL[GL_id], np.intc).reshape(
+            self._iso_counts_per_GL[GL_id], len(self._initial_supports_per_GL[GL_id]))
+
+    def _iso(self, GL_id, iso_id):
+        """returns the nodes of an iso like get_isos"""
+        first_node = iso_id * self._GL_sizes[GL_id]
+        iso_nodes = self._iso_nodes_per_GL[GL_id][first_node:first_node + self._GL_sizes[GL_id]]
+        return tuple(self._nodes[node] for node in iso_nodes)
+
+    def _iso_entropy_per_GL(self, GL_id, iso_id):
+        """returns isos Shannon entropy
+
+        It's computed from the sums of weights w and of w * log(w) of the remaining patterns. To keep isos with
+        the same patterns in the same bucket despite rounding errors of the sums, the entropy is rounded.
+        """
+        if self._domain.count(self._patterns_per_GL_per_iso[GL_id][iso_id]) <= 1:
             return 0
-        fitting_patterns_count_total = sum(self._pattern_count_per_GL[GL_id][pattern] for pattern in fitting_patterns)
-        pattern_probabilities = {self._pattern_count_per_GL[GL_id][pattern] / fitting_patterns_count_total
-                                 for pattern in fitting_patterns}
-        entropy = -sum(probability * math.log(probability) for probability in pattern_probabilities)
-        if len(fitting_patterns) == 1:
-            assert entropy == 0
-        return entropy
+        weight_sum = self._weight_sums_per_GL[GL_id][iso_id]
+        return round(math.log(weight_sum) - self._weight_log_sums_per_GL[GL_id][iso_id] / weight_sum, 9)
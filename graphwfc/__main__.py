@@ -1,38 +1,148 @@
 """takes .graphml files and runs GraphWaveFunctionCollapse
 
 This allows to run GraphWaveFunctionCollapse with the command 'python -m graphwfc'.
-I takes .graphml files as input and generates one as output.
+I takes .graphml files as input and generates one as output. Files ending with .gwfc are read and written
+in the binary format of :mod:`graphwfc.binary` instead.
 """
+import json
 import networkx as nx
 from .GraphWFCState import GraphWFCState
+from .parallel import run_parallel
+from .restarts import run_restarts, POLICIES
+from .tiled import run_tiled, bfs_tiles
+from .frontier import run_frontier
+from .helpers import PatternCounter
+from .binary import read_graph, write_graph, write_colors
+from .cache import IsoCache
 import argparse
 
 if __name__ == '__main__':
     # parsing arguments
     parser = argparse.ArgumentParser(description='GraphWaveFuntionCollapse on .graphml files')
-    parser.add_argument('-GI', dest='GI', default='GI.graphml', help='GI GraphML, the example')
+    parser.add_argument('-GI', dest='GIs', default=['GI.graphml'], nargs='+',
+                        help='GI GraphML, the example. The patterns of several examples are counted together')
     parser.add_argument('-GLs', dest='GLs', default=['GL.graphml'], nargs='+', help='GL GraphML, describing the areas')
     parser.add_argument('-GO', dest='GO', default='GO.graphml',
                         help='OG GraphML, describing the output graph (this is an INPUT file)')
     parser.add_argument('-n', type=int, dest='n', default=10, help='how often we try')
-    parser.add_argument('-o', '--output', dest='outputPath', default='out.graphml',
-                        help='the output graph GO with the colors set')
+    parser.add_argument('-j', type=int, dest='j', default=1, help='how many tries run at the same time')
+    parser.add_argument('-s', '--seed', type=int, dest='seed', default=None,
+                        help='the seed of the first try, the following tries use the next seeds')
+    parser.add_argument('-o', '--output', dest='outputPath', default=None,
+                        help='the output graph GO with the colors set, as .gwfc if the name ends with .gwfc, '
+                             'out.graphml by default')
     parser.add_argument('-v', '--node_attr', dest='node_attr', default='value',
                         help='the node attribute used by GraphWaveFunctionCollapse')
     parser.add_argument('-e', '--edge_attr', dest='edge_attr', default='type',
                         help='the edge attribute used by GraphWaveFunctionCollapse')
+    parser.add_argument('-c', '--cache_dir', dest='cache_dir', default=None,
+                        help='a directory to cache the isomorphisms and patterns in, with -t or -f only the patterns')
+    parser.add_argument('--cache_size', type=int, dest='cache_size', default=None,
+                        help='the MiB the cache of -c may take up, 1024 by default')
+    parser.add_argument('-u', '--unique', dest='unique', action='store_true',
+                        help='use only one isomorphism per set of nodes, faster for symmetric GLs')
+    parser.add_argument('-t', '--tile_size', type=int, dest='tile_size', default=None,
+                        help='color GO in tiles of about this many nodes, -n tries per tile, -j tiles at the same time')
+    parser.add_argument('-f', '--frontier', type=int, dest='window', default=None,
+                        help='color GO along a front in chunks of about this many nodes, the isos are only found '
+                             'near the front, -n tries per chunk')
+    parser.add_argument('--stats', dest='stats', action='store_true',
+                        help='print where the time went and how much propagation did, only for -j 1 without -t or -f')
+    parser.add_argument('--restarts', dest='restarts', default=None, choices=POLICIES,
+                        help='give the -n tries backtracks by this policy and learn from failed tries, only for -j 1 '
+                             'without -t or -f')
+    parser.add_argument('--restart_unit', type=int, dest='restart_unit', default=10,
+                        help='the backtracks of the first try with --restarts')
+    parser.add_argument('--no_learning', dest='learn', action='store_false',
+                        help="don't learn nogoods from failed tries with --restarts")
+    parser.add_argument('--colors_only', dest='colors_only', action='store_true',
+                        help='only write the color per node to -o, as lines "node<tab>color" or as .gwfc without '
+                             'edges')
     args = parser.parse_args()
+    # these need the single GraphWFCState that only -j 1 without -t or -f has
+    for option, used in (('--stats', args.stats), ('--restarts', args.restarts is not None)):
+        if used and (args.j > 1 or args.tile_size is not None or args.window is not None):
+            parser.error(option + ' only works with -j 1 without -t or -f')
+    if args.cache_size is not None and args.cache_dir is None:
+        parser.error('--cache_size only works with -c')
+    # the default out.graphml would get lines of text
+    if args.colors_only and args.outputPath is None:
+        parser.error('--colors_only needs -o')
+    if args.outputPath is None:
+        args.outputPath = 'out.graphml'
+    cache = args.cache_dir if args.cache_size is None else IsoCache(args.cache_dir, max_size=args.cache_size << 20)
+
+    def write_output(G):
+        if args.colors_only:
+            write_colors(dict(G.nodes(data=args.node_attr)), args.outputPath, node_attr=args.node_attr)
+        else:
+            write_graph(G, args.outputPath, node_attr=args.node_attr, edge_attr=args.edge_attr)
+
     # initialization
-    GI = nx.read_graphml(args.GI)
-    GLs = [nx.read_graphml(GL) for GL in args.GLs]
-    GO = nx.read_graphml(args.GO)
-    state = GraphWFCState(GO=GO, GI=GI, GLs=GLs, node_attr=args.node_attr, edge_attr=args.edge_attr)
-    # run GraphWaveFunctionCollapse
-    for _ in range(args.n):
-        if state.run():
-            print('SUCCESS')
-            nx.write_graphml(state.GO, args.outputPath)
-            break
+    GLs = [read_graph(GL) for GL in args.GLs]
+    GO = read_graph(args.GO)
+    if len(args.GIs) == 1:
+        GI = read_graph(args.GIs[0])
+        pattern_count_per_GL = None
+    else:
+        # count the patterns one GI after another, so that only one of them has to be in memory
+        GI = None
+        counter = PatternCounter(GLs, node_attr=args.node_attr, edge_attr=args.edge_attr)
+        for GI_path in args.GIs:
+            counter.update(read_graph(GI_path))
+        pattern_count_per_GL = counter.pattern_count_per_GL
+    if args.tile_size is not None or args.window is not None:
+        if args.tile_size is not None:
+            # run GraphWaveFunctionCollapse tile by tile
+            values = run_tiled(GO, bfs_tiles(GO, args.tile_size), GI=GI, GLs=GLs,
+                               pattern_count_per_GL=pattern_count_per_GL, node_attr=args.node_attr,
+                               edge_attr=args.edge_attr, unique=args.unique, attempts=args.n, processes=args.j,
+                               seed=args.seed, cache_dir=cache)
         else:
+            # run GraphWaveFunctionCollapse chunk by chunk along a front
+            values = run_frontier(GO, GI=GI, GLs=GLs, pattern_count_per_GL=pattern_count_per_GL,
+                                  node_attr=args.node_attr, edge_attr=args.edge_attr, window=args.window,
+                                  unique=args.unique, attempts=args.n, seed=args.seed, cache_dir=cache)
+        if values is None:
             print('FAILURE')
-            state.reset()
+        else:
+            print('SUCCESS')
+            GO = GO.subgraph(values.keys()).copy()  # without the invisible nodes
+            nx.set_node_attributes(GO, values, args.node_attr)
+            write_output(GO)
+    elif args.j > 1:
+        # run GraphWaveFunctionCollapse in parallel
+        result = run_parallel(GO=GO, GI=GI, GLs=GLs, pattern_count_per_GL=pattern_count_per_GL,
+                              node_attr=args.node_attr, edge_attr=args.edge_attr, cache_dir=cache,
+                              unique=args.unique, attempts=args.n, processes=args.j, seed=args.seed)
+        if result is None:
+            print('FAILURE')
+        else:
+            seed, values = result
+            print('SUCCESS with seed ' + str(seed))
+            GO = GO.subgraph(values.keys()).copy()  # without the invisible nodes
+            nx.set_node_attributes(GO, values, args.node_attr)
+            write_output(GO)
+    else:
+        state = GraphWFCState(GO=GO, GI=GI, GLs=GLs, pattern_count_per_GL=pattern_count_per_GL,
+                              node_attr=args.node_attr, edge_attr=args.edge_attr, seed=args.seed,
+                              cache_dir=cache, unique=args.unique, stats=args.stats)
+        # run GraphWaveFunctionCollapse
+        if args.restarts is not None:
+            report = run_restarts(state, attempts=args.n, policy=args.restarts, unit=args.restart_unit,
+                                  learn=args.learn, seed=args.seed)
+            print(('SUCCESS ' if report['success'] else 'FAILURE ') + json.dumps(report))
+            if report['success']:
+                write_output(state.GO)
+        else:
+            for attempt in range(args.n):
+                if attempt > 0:
+                    state.reset(None if args.seed is None else args.seed + attempt)
+                if state.run():
+                    print('SUCCESS')
+                    write_output(state.GO)
+                    break
+                else:
+                    print('FAILURE')
+        if args.stats:
+            print(state.stats.summary())
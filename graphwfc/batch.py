@@ -0,0 +1,308 @@
+"""colors many GOs with the same GI and GLs, the patterns are only counted once
+
+The jobs are JSON objects, one per line, read from stdin, a file or the connections to a local (unix) socket.
+They are solved by a pool of worker processes and a JSON line per job is written back as soon as it's done,
+so the results can come in a different order than the jobs. If a worker dies, e.g. because it ran out of memory,
+the jobs that were being solved are tried once more by new workers, those that are lost again get the status
+'error'.
+
+A job has the keys (all but GO are optional):
+
+* GO: the path of the output graph, GraphML or .gwfc
+* id: returned with the result, the line number of the job if not given
+* output: where to write the colored GO, if not given the colors are returned in the result as [node, color] pairs
+* colors_only: if true only the colors are written to output, see :func:`~graphwfc.binary.write_colors`
+* seed: the seed of the first attempt, the n-th attempt uses seed + n. Random if not given
+* attempts, max_backtracks: override the defaults of the command line
+
+The result has the keys id, status ('success', 'failure' or 'error'), seed (of the successful or first attempt),
+attempts (the amount used), time (seconds including reading and writing), solve_time (seconds of construction
+and runs) and either output, colors or error.
+
+python -m graphwfc.batch -GI GI.graphml -GLs GL.graphml -v value -j 4 < jobs.jsonl
+python -m graphwfc.batch -GI GI.graphml -GLs GL.graphml -v value -j 4 --socket /tmp/graphwfc.sock
+"""
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import queue
+import random
+import socket
+import sys
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from .GraphWFCState import GraphWFCState
+from .binary import read_graph, write_graph, write_colors
+from .cache import IsoCache
+from .helpers import PatternCounter
+
+# the arguments shared by all jobs, set in every worker by _init_worker
+_worker_kwargs = None
+
+
+def _init_worker(batch_kwargs):
+    global _worker_kwargs
+    _worker_kwargs = batch_kwargs
+    # stdout is for the results, debug prints of the workers go to stderr
+    sys.stdout = sys.stderr
+    # the workers of a forkserver would draw the same random seeds
+    random.seed()
+
+
+def _solve_line(numbered_line):
+    """solves the job in a line and returns the result as JSON line"""
+    line_number, line = numbered_line
+    start = time.perf_counter()
+    result = {'id': line_number, 'status': 'error'}
+    try:
+        job = json.loads(line)
+        result['id'] = job.get('id', line_number)
+        seed = job.get('seed')
+        if seed is None:
+            seed = random.getrandbits(32)
+        result['seed'] = seed
+        node_attr = _worker_kwargs['node_attr']
+        GO = read_graph(job['GO'])
+        solve_start = time.perf_counter()
+        state = GraphWFCState(GO=GO, GLs=_worker_kwargs['GLs'],
+                              pattern_count_per_GL=_worker_kwargs['pattern_count_per_GL'], node_attr=node_attr,
+                              edge_attr=_worker_kwargs['edge_attr'], cache_dir=_worker_kwargs['cache_dir'],
+                              unique=_worker_kwargs['unique'], seed=seed)
+        result['status'] = 'failure'
+        for attempt in range(job.get('attempts', _worker_kwargs['attempts'])):
+            if attempt > 0:
+                state.reset(seed + attempt)
+            result['attempts'] = attempt + 1
+            if state.run(max_backtracks=job.get('max_backtracks', _worker_kwargs['max_backtracks'])):
+                result['status'] = 'success'
+                result['seed'] = seed + attempt
+                break
+        result['solve_time'] = time.perf_counter() - solve_start
+        if result['status'] == 'success':
+            output = job.get('output')
+            # only the invisible nodes have no color
+            colors = [[node, color] for node, color in zip(*state.colors()) if color is not None]
+            if output is None:
+                result['colors'] = colors
+            elif job.get('colors_only', False):
+                write_colors(dict(colors), output, node_attr=node_attr)
+                result['output'] = output
+            else:
+                write_graph(state.GO, output, node_attr=node_attr, edge_attr=_worker_kwargs['edge_attr'])
+                result['output'] = output
+    except Exception as error:
+        # a broken job must not stop the others
+        result['status'] = 'error'
+        result['error'] = type(error).__name__ + ': ' + str(error)
+    result['time'] = time.perf_counter() - start
+    return json.dumps(result, default=str)
+
+
+def _numbered_lines(lines):
+    for line_number, line in enumerate(lines):
+        if line.strip():
+            yield line_number, line
+
+
+def _lost_line(numbered_line, error):
+    """returns the result line of a job whose worker died"""
+    line_number, line = numbered_line
+    result = {'id': line_number, 'status': 'error', 'error': type(error).__name__ + ': ' + str(error)}
+    try:
+        result['id'] = json.loads(line).get('id', line_number)
+    except Exception:
+        pass
+    return json.dumps(result, default=str)
+
+
+class BatchPool:
+    """the worker processes of :func:`start_pool`, they are started again if one of them dies
+
+    If a worker dies, e.g. because it ran out of memory, the jobs that weren't done yet fail with a
+    BrokenProcessPool and the next job starts new workers.
+    """
+    __slots__ = 'processes', '_batch_kwargs', '_context', '_executor', '_lock'
+
+    def __init__(self, batch_kwargs, processes=None, context=None):
+        """starts the workers
+
+        :param batch_kwargs: the arguments shared by all jobs, passed to every worker
+        :param processes: the amount of worker processes, defaults to the amount of CPUs
+        :param context: the multiprocessing context to start the workers with
+        """
+        self.processes = os.cpu_count() if processes is None else processes
+        self._batch_kwargs = batch_kwargs
+        self._context = context
+        # the connections of serve_socket submit from their own threads
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self):
+        return concurrent.futures.ProcessPoolExecutor(self.processes, mp_context=self._context,
+                                                      initializer=_init_worker, initargs=(self._batch_kwargs,))
+
+    def submit(self, numbered_line):
+        """solves the job in a (line number, line) pair, returns a future of the result line"""
+        with self._lock:
+            try:
+                return self._executor.submit(_solve_line, numbered_line)
+            except BrokenProcessPool:
+                self._executor.shutdown(wait=False)
+                self._executor = self._start()
+                return self._executor.submit(_solve_line, numbered_line)
+
+    def close(self):
+        """stops the workers once their jobs are done"""
+        with self._lock:
+            self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def solve_lines(pool, lines, write):
+    """solves the jobs in the lines with the pool and writes the result lines as they come in
+
+    :param pool: a pool from :func:`start_pool`
+    :param lines: an iterable of JSON lines, it is read while the first jobs are already solved
+    :param write: called with every result line (without line break)
+    """
+    # the done futures and finally the amount of jobs or the error of reading the lines
+    done = queue.Queue()
+
+    def submit(numbered_line, retry):
+        pool.submit(numbered_line).add_done_callback(lambda future: done.put((future, numbered_line, retry)))
+
+    def submit_lines():
+        job_count = 0
+        try:
+            for numbered_line in _numbered_lines(lines):
+                submit(numbered_line, False)
+                job_count += 1
+        except BaseException as error:
+            done.put(error)
+        else:
+            done.put(job_count)
+
+    threading.Thread(target=submit_lines, daemon=True).start()
+    written = 0
+    job_count = None
+    while job_count is None or written < job_count:
+        item = done.get()
+        if isinstance(item, BaseException):
+            raise item
+        if isinstance(item, int):
+            job_count = item
+            continue
+        future, numbered_line, retry = item
+        try:
+            result_line = future.result()
+        except BrokenProcessPool as error:
+            # the job may have been lost with a worker another job killed, so it gets a second chance
+            if not retry:
+                submit(numbered_line, True)
+                continue
+            result_line = _lost_line(numbered_line, error)
+        write(result_line)
+        written += 1
+
+
+def start_pool(GLs, pattern_count_per_GL, node_attr='color', edge_attr='type', cache_dir=None, unique=False,
+               attempts=10, max_backtracks=0, processes=None):
+    """starts the worker processes, they keep the GLs and patterns for all jobs
+
+    :param GLs: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param pattern_count_per_GL: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param node_attr: the name of the node attribute used as color
+    :param edge_attr: the name of the edge attribute used to distinguish between edges
+    :param cache_dir: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param unique: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param attempts: the default maximum amount of attempts per job
+    :param max_backtracks: the default of max_backtracks per attempt
+    :param processes: the amount of worker processes, defaults to the amount of CPUs
+    :return: a :class:`BatchPool`, to be closed by the caller
+    """
+    batch_kwargs = dict(GLs=GLs, pattern_count_per_GL=pattern_count_per_GL, node_attr=node_attr,
+                        edge_attr=edge_attr, cache_dir=cache_dir, unique=unique, attempts=attempts,
+                        max_backtracks=max_backtracks)
+    # the workers are started by the threads that submit jobs, and started again after one died while other threads
+    # run. Forking a process with several threads can deadlock, so they are started by a forkserver if possible.
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                                          else None)
+    return BatchPool(batch_kwargs, processes=processes, context=context)
+
+
+def _serve_connection(pool, connection):
+    with connection, connection.makefile('r') as lines, connection.makefile('w') as results:
+        def write(result_line):
+            results.write(result_line + '\n')
+            results.flush()
+        solve_lines(pool, lines, write)
+
+
+def serve_socket(pool, path):
+    """solves the jobs sent to a unix socket, every connection gets the results of its jobs
+
+    :param pool: a pool from :func:`start_pool`
+    :param path: the path of the socket, an existing file there is replaced
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(path)
+        server.listen()
+        while True:
+            connection, _ = server.accept()
+            threading.Thread(target=_serve_connection, args=(pool, connection), daemon=True).start()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='GraphWaveFunctionCollapse on a stream of GOs with the same GI')
+    parser.add_argument('-GI', dest='GIs', default=['GI.graphml'], nargs='+',
+                        help='GI GraphML, the example. The patterns of several examples are counted together')
+    parser.add_argument('-GLs', dest='GLs', default=['GL.graphml'], nargs='+', help='GL GraphML, describing the areas')
+    parser.add_argument('-n', type=int, dest='n', default=10, help='how often we try per job')
+    parser.add_argument('-b', '--max_backtracks', type=int, dest='max_backtracks', default=0,
+                        help='how often a try may backtrack')
+    parser.add_argument('-j', type=int, dest='j', default=None, help='how many jobs run at the same time')
+    parser.add_argument('-v', '--node_attr', dest='node_attr', default='value',
+                        help='the node attribute used by GraphWaveFunctionCollapse')
+    parser.add_argument('-e', '--edge_attr', dest='edge_attr', default='type',
+                        help='the edge attribute used by GraphWaveFunctionCollapse')
+    parser.add_argument('-c', '--cache_dir', dest='cache_dir', default=None,
+                        help='a directory to cache the isomorphisms in')
+    parser.add_argument('--cache_size', type=int, dest='cache_size', default=None,
+                        help='the MiB the cache of -c may take up, 1024 by default')
+    parser.add_argument('-u', '--unique', dest='unique', action='store_true',
+                        help='use only one isomorphism per set of nodes, faster for symmetric GLs')
+    parser.add_argument('--jobs', dest='jobs', default=None, help='a file with a job per line instead of stdin')
+    parser.add_argument('--socket', dest='socket', default=None,
+                        help='read the jobs from the connections to this unix socket instead of stdin')
+    args = parser.parse_args()
+    if args.cache_size is not None and args.cache_dir is None:
+        parser.error('--cache_size only works with -c')
+    cache = args.cache_dir if args.cache_size is None else IsoCache(args.cache_dir, max_size=args.cache_size << 20)
+    GLs = [read_graph(GL) for GL in args.GLs]
+    counter = PatternCounter(GLs, node_attr=args.node_attr, edge_attr=args.edge_attr)
+    for GI_path in args.GIs:
+        counter.update(read_graph(GI_path))
+    with start_pool(GLs, counter.pattern_count_per_GL, node_attr=args.node_attr, edge_attr=args.edge_attr,
+                    cache_dir=cache, unique=args.unique, attempts=args.n, max_backtracks=args.max_backtracks,
+                    processes=args.j) as batch_pool:
+        if args.socket is not None:
+            serve_socket(batch_pool, args.socket)
+        else:
+            def write_line(result_line):
+                sys.stdout.write(result_line + '\n')
+                sys.stdout.flush()
+            if args.jobs is None:
+                solve_lines(batch_pool, sys.stdin, write_line)
+            else:
+                with open(args.jobs) as job_lines:
+                    solve_lines(batch_pool, job_lines, write_line)
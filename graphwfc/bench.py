@@ -0,0 +1,273 @@
+"""benchmarks GraphWaveFunctionCollapse on the examples and on generated graphs
+
+Every case runs in a new process, so that its peak memory can be measured. Per case the time to count the
+patterns, to find the isos, to construct the GraphWFCState, of reset() and of run() is measured, how many seeds
+succeed and the peak resident memory of the process in bytes. The results are written as JSON, two of these files
+can be compared to find regressions.
+
+python -m graphwfc.bench -o new.json --sizes 1000 10000
+python -m graphwfc.bench --compare old.json new.json
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import time
+import networkx as nx
+import numpy as np
+from .GraphWFCState import GraphWFCState
+from .helpers import get_iso_arrays, get_patterns
+from .lattice import Lattice
+
+try:
+    import resource
+except ImportError:  # not on windows
+    resource = None
+
+EXAMPLES = ('atlas', 'beach', 'maze', 'starcave')
+KINDS = ('examples', 'tree', 'regular', 'grid')
+# the default directory of the examples, they are in the repository but not in the package
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+# metrics where a bigger value is a regression, success_rate is the only one where a smaller one is
+_TIMES = ('patterns_time', 'isos_time', 'construct_time', 'reset_time', 'run_time')
+_MEMORY = 'peak_memory_bytes'
+
+
+def _basic_patterns():
+    """the example of the README, an undirected edge as GL and a path colored b - b - r - y as GI"""
+    GI = nx.Graph([(1, 2), (2, 3), (3, 4)])
+    GI.add_nodes_from([(1, {'c': 'b'}), (2, {'c': 'b'}), (3, {'c': 'r'}), (4, {'c': 'y'})])
+    return GI, [nx.Graph([(1, 2)])], 'c'
+
+
+def _read_example(examples_dir, name):
+    directory = os.path.join(examples_dir, name)
+    return [nx.read_graphml(os.path.join(directory, file_name))
+            for file_name in ('GI.graphml', 'GL.graphml', 'GO.graphml')]
+
+
+def get_cases(kinds=KINDS, sizes=(1000, 10000), examples_dir=EXAMPLES_DIR):
+    """returns the cases to benchmark as (name, kind, parameter)
+
+    :param kinds: which cases: 'examples', 'tree' (random trees), 'regular' (random 3-regular graphs)
+            and 'grid' (2D grids with the patterns of starcave)
+    :param sizes: the amount of nodes of the generated GOs
+    :param examples_dir: the directory with the examples, they are skipped if it doesn't exist
+    """
+    has_examples = os.path.isdir(examples_dir)
+    cases = list()
+    if 'examples' in kinds and has_examples:
+        cases.extend(('example-' + name, 'example', name) for name in EXAMPLES
+                     if os.path.isdir(os.path.join(examples_dir, name)))
+    for size in sizes:
+        if 'tree' in kinds:
+            cases.append(('tree-' + str(size), 'tree', size))
+        if 'regular' in kinds:
+            cases.append(('regular-' + str(size), 'regular', size))
+        if 'grid' in kinds and has_examples:
+            cases.append(('grid-' + str(size), 'grid', size))
+    return cases
+
+
+def _load(kind, parameter, examples_dir):
+    """returns GI, GLs, GO, node_attr and a Lattice or None for a case"""
+    if kind == 'example':
+        GI, GL, GO = _read_example(examples_dir, parameter)
+        return GI, [GL], GO, 'value', None
+    if kind == 'tree':
+        GI, GLs, node_attr = _basic_patterns()
+        # random_tree was replaced in networkx 3
+        random_tree = getattr(nx, 'random_labeled_tree', None) or nx.random_tree
+        return GI, GLs, random_tree(parameter, seed=0), node_attr, None
+    if kind == 'regular':
+        GI, GLs, node_attr = _basic_patterns()
+        return GI, GLs, nx.random_regular_graph(3, parameter, seed=0), node_attr, None
+    if kind == 'grid':
+        GI, GL, _ = _read_example(examples_dir, 'starcave')
+        side = max(3, round(math.sqrt(parameter)))
+        lattice = Lattice.grid((side, side), types=(1, 3))
+        return GI, [GL], lattice.graph(), 'value', lattice
+    raise ValueError('unknown kind of case: ' + str(kind))
+
+
+def _peak_memory():
+    """the peak resident memory of this process in bytes or None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_case(kind, parameter, seeds=5, max_backtracks=10, unique=False, examples_dir=EXAMPLES_DIR):
+    """runs one case in this process and returns its metrics
+
+    :param kind: see :func:`get_cases`
+    :param parameter: see :func:`get_cases`
+    :param seeds: the amount of runs, the n-th one uses the seed n
+    :param max_backtracks: passed to run()
+    :param unique: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param examples_dir: the directory with the examples
+    :return: a dict with the metrics, the times are in seconds. peak_memory_bytes is the peak resident memory of
+            the whole process, including python and the loaded graphs, :func:`run_benchmark` starts a new one per case
+    """
+    GI, GLs, GO, node_attr, lattice = _load(kind, parameter, examples_dir)
+    start = time.perf_counter()
+    pattern_count_per_GL = get_patterns(GI=GI, GLs=GLs, node_attr=node_attr, unique=unique)
+    patterns_time = time.perf_counter() - start
+    start = time.perf_counter()
+    if lattice is None:
+        iso_arrays = get_iso_arrays(GB=GO, GLs=GLs, unique=unique)
+    else:
+        iso_arrays = lattice.get_iso_arrays(GLs, unique=unique)
+    isos_time = time.perf_counter() - start
+    start = time.perf_counter()
+    state = GraphWFCState(GO=GO, GLs=GLs, pattern_count_per_GL=pattern_count_per_GL, GO_isos_per_GL=iso_arrays,
+                          node_attr=node_attr, unique=unique, seed=0)
+    construct_time = time.perf_counter() - start
+    reset_times = list()
+    run_times = list()
+    iteration_counts = list()
+    successes = 0
+    for seed in range(seeds):
+        if seed > 0:
+            start = time.perf_counter()
+            state.reset(seed)
+            reset_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        successes += bool(state.run(max_backtracks=max_backtracks))
+        run_times.append(time.perf_counter() - start)
+        iteration_counts.append(state.iteration_count)
+    return {
+        'nodes': len(GO),
+        'isos': int(sum(len(iso_array) for iso_array in iso_arrays)),
+        'patterns': sum(len(counted_patterns) for counted_patterns in pattern_count_per_GL),
+        'patterns_time': patterns_time,
+        'isos_time': isos_time,
+        'construct_time': construct_time,
+        'reset_time': float(np.mean(reset_times)) if reset_times else None,
+        'run_time': float(np.mean(run_times)),
+        'iterations': float(np.mean(iteration_counts)),
+        'success_rate': successes / seeds,
+        'peak_memory_bytes': _peak_memory(),
+    }
+
+
+def _run_case_task(task):
+    return run_case(*task)
+
+
+def run_benchmark(cases, seeds=5, max_backtracks=10, unique=False, examples_dir=EXAMPLES_DIR, verbose=True):
+    """runs every case in a new process and returns the results
+
+    :param cases: the cases from :func:`get_cases`
+    :param seeds: see :func:`run_case`
+    :param max_backtracks: see :func:`run_case`
+    :param unique: see :func:`run_case`
+    :param examples_dir: see :func:`run_case`
+    :param verbose: whether to print every case when it is done
+    :return: a dict with the versions used and the metrics per case name, it can be written as JSON
+    """
+    results = {
+        'python': platform.python_version(),
+        'networkx': nx.__version__,
+        'numpy': np.__version__,
+        'seeds': seeds,
+        'max_backtracks': max_backtracks,
+        'unique': unique,
+        'cases': dict(),
+    }
+    for name, kind, parameter in cases:
+        # a new process per case, otherwise the peak memory of the cases before would be included.
+        # A forked process starts with the peak of this one, a spawned one with an empty interpreter
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            metrics = pool.apply(_run_case_task, ((kind, parameter, seeds, max_backtracks, unique, examples_dir),))
+        results['cases'][name] = metrics
+        if verbose:
+            print(name + ': construct ' + format(metrics['construct_time'], '.3f') + 's, run ' +
+                  format(metrics['run_time'], '.3f') + 's, success ' + format(metrics['success_rate'], '.0%'))
+    return results
+
+
+def compare(old, new, threshold=0.2, min_seconds=0.01):
+    """compares two results of :func:`run_benchmark` and returns the regressions
+
+    A time or the peak memory is a regression if it grew by more than threshold (relative) and by more than
+    min_seconds for times, the success rate if it dropped by more than threshold (absolute).
+
+    :param old: the results before
+    :param new: the results after
+    :param threshold: how much worse a metric has to be to count as a regression
+    :param min_seconds: smaller changes of times are noise
+    :return: the regressions as readable strings
+    """
+    regressions = list()
+    for name, new_metrics in new['cases'].items():
+        old_metrics = old['cases'].get(name)
+        if old_metrics is None:
+            continue
+        for metric in _TIMES + (_MEMORY,):
+            old_value, new_value = old_metrics.get(metric), new_metrics.get(metric)
+            if old_value is None or new_value is None:
+                continue
+            if new_value > old_value * (1 + threshold) and \
+                    (metric == _MEMORY or new_value - old_value > min_seconds):
+                regressions.append(name + ' ' + metric + ': ' + format(old_value, '.4g') + ' -> ' +
+                                   format(new_value, '.4g'))
+        if new_metrics['success_rate'] < old_metrics['success_rate'] - threshold:
+            regressions.append(name + ' success_rate: ' + format(old_metrics['success_rate'], '.0%') + ' -> ' +
+                               format(new_metrics['success_rate'], '.0%'))
+    return regressions
+
+
+def _print_comparison(old, new):
+    for name, new_metrics in new['cases'].items():
+        old_metrics = old['cases'].get(name)
+        if old_metrics is None:
+            print(name + ': only in the new results')
+            continue
+        changes = list()
+        for metric in _TIMES + (_MEMORY,):
+            old_value, new_value = old_metrics.get(metric), new_metrics.get(metric)
+            if old_value and new_value is not None:
+                changes.append(metric + ' ' + format(new_value / old_value, '.2f') + 'x')
+        print(name + ': ' + ', '.join(changes))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='benchmarks GraphWaveFunctionCollapse')
+    parser.add_argument('-o', '--output', dest='output', default='bench.json', help='the JSON file for the results')
+    parser.add_argument('--kinds', dest='kinds', nargs='+', default=list(KINDS), choices=KINDS,
+                        help='which cases to run')
+    parser.add_argument('--sizes', dest='sizes', nargs='+', type=int, default=[1000, 10000],
+                        help='the amount of nodes of the generated GOs, e.g. 1000 10000 100000 1000000')
+    parser.add_argument('--seeds', dest='seeds', type=int, default=5, help='the amount of runs per case')
+    parser.add_argument('--max_backtracks', dest='max_backtracks', type=int, default=10,
+                        help='passed to run()')
+    parser.add_argument('-u', '--unique', dest='unique', action='store_true',
+                        help='use only one isomorphism per set of nodes')
+    parser.add_argument('--examples', dest='examples_dir', default=EXAMPLES_DIR,
+                        help='the directory with the examples')
+    parser.add_argument('--compare', dest='compare', nargs=2, metavar=('OLD', 'NEW'), default=None,
+                        help='compare two result files instead of running, exits with 1 if there are regressions')
+    parser.add_argument('--threshold', dest='threshold', type=float, default=0.2,
+                        help='how much worse a metric has to be to be a regression, 0.2 is 20%%')
+    args = parser.parse_args()
+    if args.compare is not None:
+        with open(args.compare[0]) as file:
+            old_results = json.load(file)
+        with open(args.compare[1]) as file:
+            new_results = json.load(file)
+        _print_comparison(old_results, new_results)
+        found_regressions = compare(old_results, new_results, threshold=args.threshold)
+        for regression in found_regressions:
+            print('REGRESSION ' + regression)
+        sys.exit(1 if found_regressions else 0)
+    benchmark_results = run_benchmark(get_cases(kinds=args.kinds, sizes=args.sizes, examples_dir=args.examples_dir),
+                                      seeds=args.seeds, max_backtracks=args.max_backtracks, unique=args.unique,
+                                      examples_dir=args.examples_dir)
+    with open(args.output, 'w') as file:
+        json.dump(benchmark_results, file, indent=2)
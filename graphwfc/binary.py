@@ -0,0 +1,200 @@
+"""reads and writes graphs in a binary format that is much faster than GraphML
+
+A .gwfc file is an uncompressed .npz. It stores the node labels, the edges as an array of node indices, and
+the one node attribute (the color) and the one edge attribute (the type) GraphWaveFunctionCollapse uses.
+The attributes are stored as an index per node or edge into a table of their distinct values, -1 if missing.
+Other attributes are dropped. Since the arrays aren't compressed they can be memory-mapped from the file.
+Node labels and attribute values can be ints, floats, strings, bools or tuples of ints (like the nodes of a
+:class:`~graphwfc.lattice.Lattice`). Other values, like None or values of mixed types, are stored as their repr
+if it reads back as the same value.
+
+Files can be converted with 'python -m graphwfc.binary in.graphml out.gwfc -v value' and back.
+"""
+import argparse
+import ast
+import struct
+import zipfile
+import networkx as nx
+import numpy as np
+
+
+def _reads_back(value):
+    """whether the repr of value is a literal of the same value"""
+    try:
+        read = ast.literal_eval(repr(value))
+    except (ValueError, SyntaxError):
+        return False
+    return type(read) is type(value) and read == value
+
+
+def _encode(values):
+    """returns the kind of the values and an array of them"""
+    values = list(values)
+    if all(isinstance(value, (int, np.integer)) and not isinstance(value, bool) for value in values):
+        return 'int', np.array(values, dtype=np.int64)
+    if all(isinstance(value, (bool, np.bool_)) for value in values):
+        return 'bool', np.array(values, dtype=bool)
+    if all(isinstance(value, (float, np.floating)) for value in values):
+        return 'float', np.array(values, dtype=np.float64)
+    if all(isinstance(value, str) for value in values):
+        return 'str', np.array(values, dtype=str)
+    if all(isinstance(value, tuple) and all(isinstance(part, (int, np.integer)) for part in value)
+           for value in values) and len({len(value) for value in values}) == 1:
+        return 'tuple', np.array(values, dtype=np.int64)
+    values = [value.item() if isinstance(value, np.generic) else value for value in values]
+    for value in values:
+        if not _reads_back(value):
+            raise TypeError('{!r} can not be stored, since its repr does not read back as it'.format(value))
+    return 'repr', np.array([repr(value) for value in values], dtype=str)
+
+
+def _decode(kind, array):
+    """the inverse of _encode, returns a list"""
+    if kind == 'tuple':
+        return [tuple(value) for value in array.tolist()]
+    if kind == 'repr':
+        return [ast.literal_eval(value) for value in array.tolist()]
+    return array.tolist()
+
+
+def _codes(values, missing):
+    """returns the index of every value in the table of distinct values (-1 if missing) and the table"""
+    # by type as well, since True == 1 == 1.0 would share an entry
+    table = dict()
+    codes = np.array([-1 if value is missing else table.setdefault((type(value), value), len(table))
+                      for value in values], dtype=np.int32)
+    return codes, [value for _, value in table]
+
+
+def write_gwfc(G, path, node_attr='color', edge_attr='type'):
+    """writes G as .gwfc file, only node_attr and edge_attr are kept
+
+    :param G: a networkx (Di)Graph
+    :param path: the file to write to
+    :param node_attr: the node attribute to store, e.g. the color
+    :param edge_attr: the edge attribute to store, e.g. the type
+    """
+    missing = object()
+    nodes = list(G.nodes())
+    node_ids = {node: node_id for node_id, node in enumerate(nodes)}
+    node_kind, node_array = _encode(nodes) if nodes else ('int', np.zeros(0, dtype=np.int64))
+    node_codes, node_values = _codes((attributes.get(node_attr, missing) for _, attributes in G.nodes(data=True)),
+                                     missing)
+    edges = list(G.edges(data=True))
+    edge_array = np.array([(node_ids[u], node_ids[v]) for u, v, _ in edges],
+                          dtype=np.int32 if len(nodes) < 2**31 else np.int64).reshape(len(edges), 2)
+    edge_codes, edge_values = _codes((attributes.get(edge_attr, missing) for _, _, attributes in edges), missing)
+    arrays = {
+        'directed': np.array(G.is_directed()),
+        'node_attr': np.array(node_attr),
+        'edge_attr': np.array(edge_attr),
+        'nodes': node_array,
+        'node_kind': np.array(node_kind),
+        'node_codes': node_codes,
+        'edges': edge_array,
+        'edge_codes': edge_codes,
+    }
+    for name, values in (('node_values', node_values), ('edge_values', edge_values)):
+        kind, array = _encode(values) if values else ('int', np.zeros(0, dtype=np.int64))
+        arrays[name] = array
+        arrays[name[:-len('values')] + 'value_kind'] = np.array(kind)
+    # a file object, since np.savez would append .npz to the path
+    with open(path, 'wb') as file:
+        np.savez(file, **arrays)
+
+
+def load_gwfc_arrays(path, mmap=True):
+    """returns the arrays stored in a .gwfc (or any uncompressed .npz) file
+
+    :param path: the file to read
+    :param mmap: if True the arrays are memory-mapped read only instead of read into memory
+    :return: a dict with the arrays by name
+    """
+    arrays = dict()
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as file:
+        for info in archive.infolist():
+            name = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if mmap and info.compress_type == zipfile.ZIP_STORED:
+                # the .npy starts after the local header of the zip entry
+                file.seek(info.header_offset + 26)
+                name_length, extra_length = struct.unpack('<HH', file.read(4))
+                file.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(file)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+                if not dtype.hasobject and 0 not in shape and shape != ():
+                    arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=file.tell(), shape=shape,
+                                             order='F' if fortran_order else 'C')
+                    continue
+            with archive.open(info) as member:
+                arrays[name] = np.lib.format.read_array(member)
+    return arrays
+
+
+def read_gwfc(path, mmap=True):
+    """reads a .gwfc file as networkx (Di)Graph
+
+    :param path: the file to read
+    :param mmap: see :func:`load_gwfc_arrays`, the graph itself is always in memory
+    :return: the graph with the node and edge attribute that were stored
+    """
+    arrays = load_gwfc_arrays(path, mmap=mmap)
+    G = nx.DiGraph() if bool(arrays['directed']) else nx.Graph()
+    node_attr = str(arrays['node_attr'])
+    edge_attr = str(arrays['edge_attr'])
+    nodes = _decode(str(arrays['node_kind']), arrays['nodes'])
+    node_values = _decode(str(arrays['node_value_kind']), arrays['node_values'])
+    edge_values = _decode(str(arrays['edge_value_kind']), arrays['edge_values'])
+    G.add_nodes_from((node, {node_attr: node_values[code]} if code >= 0 else {})
+                     for node, code in zip(nodes, arrays['node_codes'].tolist()))
+    G.add_edges_from((nodes[u], nodes[v], {edge_attr: edge_values[code]} if code >= 0 else {})
+                     for (u, v), code in zip(arrays['edges'].tolist(), arrays['edge_codes'].tolist()))
+    return G
+
+
+def write_colors(colors, path, node_attr='color'):
+    """writes only the color per node instead of the whole graph
+
+    A .gwfc path gets a .gwfc file without edges, which :func:`read_gwfc` reads as graph without edges.
+    Any other path gets a text file with a line 'node<tab>color' per node.
+
+    :param colors: a dict with the color per node
+    :param path: the file to write to
+    :param node_attr: the name the colors are stored as in a .gwfc file
+    """
+    if path.endswith('.gwfc'):
+        G = nx.Graph()
+        G.add_nodes_from((node, {node_attr: color}) for node, color in colors.items())
+        write_gwfc(G, path, node_attr=node_attr)
+    else:
+        with open(path, 'w') as file:
+            file.writelines(str(node) + '\t' + str(color) + '\n' for node, color in colors.items())
+
+
+def read_graph(path, mmap=True):
+    """reads a .gwfc file with :func:`read_gwfc` and anything else as GraphML"""
+    if path.endswith('.gwfc'):
+        return read_gwfc(path, mmap=mmap)
+    return nx.read_graphml(path)
+
+
+def write_graph(G, path, node_attr='color', edge_attr='type'):
+    """writes G as .gwfc file with :func:`write_gwfc` if the path ends with .gwfc, otherwise as GraphML"""
+    if path.endswith('.gwfc'):
+        write_gwfc(G, path, node_attr=node_attr, edge_attr=edge_attr)
+    else:
+        nx.write_graphml(G, path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='converts graphs between GraphML and .gwfc, by their extensions')
+    parser.add_argument('input', help='the graph to convert')
+    parser.add_argument('output', help='the converted graph')
+    parser.add_argument('-v', '--node_attr', dest='node_attr', default='value',
+                        help='the node attribute kept in a .gwfc file')
+    parser.add_argument('-e', '--edge_attr', dest='edge_attr', default='type',
+                        help='the edge attribute kept in a .gwfc file')
+    args = parser.parse_args()
+    write_graph(read_graph(args.input), args.output, node_attr=args.node_attr, edge_attr=args.edge_attr)
@@ -0,0 +1,178 @@
+"""caches the results of get_isos and get_patterns on disk
+
+Finding the isos with VF2 is usually the most expensive step. The results are stored in a directory and
+found again by a hash of the graphs and attributes they were computed from.
+The isos per GL are stored as .npy integer arrays with one row per iso. A node is stored as its index
+in the node order of GB, which is part of the hash, so the arrays can be memory-mapped and
+translated back without unpickling anything.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import numpy as np
+
+
+def graph_hash(G, node_attr=None, edge_attr=None):
+    """returns a hash of G that only changes if the graph, its node order or the given attributes change
+
+    :param G: a networkx (Di)Graph
+    :param node_attr: (optional) a node attribute to include in the hash
+    :param edge_attr: (optional) an edge attribute to include in the hash
+    :return: the hash as a hex string
+    """
+    graph_hash = hashlib.sha256()
+    graph_hash.update(b'directed\n' if G.is_directed() else b'undirected\n')
+    node_ids = dict()
+    for node_id, (node, attributes) in enumerate(G.nodes(data=True)):
+        node_ids[node] = node_id
+        graph_hash.update(repr(node).encode())
+        if node_attr is not None:
+            graph_hash.update(b'\t' + repr(attributes.get(node_attr)).encode())
+        graph_hash.update(b'\n')
+    edges = list()
+    for u, v, attributes in G.edges(data=True):
+        u, v = node_ids[u], node_ids[v]
+        if not G.is_directed() and v < u:
+            u, v = v, u
+        edges.append((u, v, repr(attributes.get(edge_attr, -1)) if edge_attr is not None else ''))
+    for edge in sorted(edges):
+        graph_hash.update(repr(edge).encode() + b'\n')
+    return graph_hash.hexdigest()
+
+
+def open_cache(cache_dir):
+    """returns cache_dir if it is an :class:`IsoCache` already, otherwise one with the default max_size in it"""
+    return cache_dir if isinstance(cache_dir, IsoCache) else IsoCache(cache_dir)
+
+
+class IsoCache:
+    """a directory with the results of get_isos and get_patterns
+
+    If the files in the directory get bigger than max_size, the least recently used ones are deleted.
+
+    :ivar cache_dir: the directory of the cache
+    :ivar max_size: the maximal size of the cache in bytes
+    """
+    __slots__ = 'cache_dir', 'max_size'
+
+    def __init__(self, cache_dir, max_size=2**30):
+        """opens the cache in cache_dir, the directory is created if it doesn't exist
+
+        :param cache_dir: the directory of the cache
+        :param max_size: the maximal size of the cache in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, *keys):
+        return os.path.join(self.cache_dir, hashlib.sha256(repr(keys).encode()).hexdigest())
+
+    def _write(self, path, write):
+        # write to a temporary file first, so that other processes never see half written files
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as file:
+                write(file)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        self._evict(keep=path)
+
+    def _evict(self, keep=None):
+        """deletes the least recently used files until the cache is small enough, but not the file keep
+
+        The file just written is kept even if it alone is bigger than max_size, it is evicted by the next write.
+        """
+        files = list()
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith('.tmp') and entry.path != keep:
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in sorted(files):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # removed by another process
+            size -= file_size
+
+    def load_iso_arrays(self, GB, GLs, edge_attr='type', processes=1):
+        """returns the isos like get_isos, but as memory-mapped arrays of node indices
+
+        A row of the array of a GL is an iso, the nodes are given as their index in list(GB.nodes()).
+        Missing results are computed and stored.
+
+        :param GB: the 'big' Graph, GI or GO
+        :param GLs: the 'small' graphs GL in an order (e.g. a list)
+        :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+        :param processes: the amount of processes searching for missing isos, see :func:`~graphwfc.helpers.get_isos`
+        :return: a read only int array with the isos per GL
+        """
+        from .helpers import get_isos, _iso_array
+        GB_hash = graph_hash(GB, edge_attr=edge_attr)
+        GB_node_ids = None
+        iso_arrays_per_GL = list()
+        for GL in GLs:
+            path = self._path('isos', GB_hash, graph_hash(GL, edge_attr=edge_attr), edge_attr) + '.npy'
+            try:
+                os.utime(path)  # it was used recently
+                iso_array = np.load(path, mmap_mode='r')
+            except FileNotFoundError:
+                # not cached yet or just evicted by another process
+                if GB_node_ids is None:
+                    GB_node_ids = {node: node_id for node_id, node in enumerate(GB.nodes())}
+                isos = get_isos(GB, [GL], edge_attr=edge_attr, processes=processes)[0]
+                iso_array = _iso_array(isos, GB_node_ids, len(GL))
+                self._write(path, lambda file: np.save(file, iso_array))
+                # the array in memory is returned, the file may already be evicted by another process
+                iso_array.flags.writeable = False
+            iso_arrays_per_GL.append(iso_array)
+        return iso_arrays_per_GL
+
+    def get_isos(self, GB, GLs, edge_attr='type', processes=1):
+        """returns the same as :func:`~graphwfc.helpers.get_isos` but only computes what isn't cached
+
+        :param GB: the 'big' Graph, GI or GO
+        :param GLs: the 'small' graphs GL in an order (e.g. a list)
+        :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+        :param processes: the amount of processes searching for missing isos, see :func:`~graphwfc.helpers.get_isos`
+        :return: the isos in G per LG
+        """
+        GB_nodes = list(GB.nodes())
+        return [[tuple(GB_nodes[node_id] for node_id in iso) for iso in iso_array.tolist()]
+                for iso_array in self.load_iso_arrays(GB, GLs, edge_attr=edge_attr, processes=processes)]
+
+    def get_patterns(self, GI, GLs, node_attr='color', edge_attr='type', processes=1):
+        """returns the same as :func:`~graphwfc.helpers.get_patterns` but only computes what isn't cached
+
+        The isos in GI are cached as well.
+
+        :param GI: the input Graph to extract the patterns from
+        :param GLs: the (ordered) GLs to define the 'shape' of the patterns
+        :param node_attr: the node attribute to be used in GraphWFC
+        :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+        :param processes: the amount of processes searching for missing isos, see :func:`~graphwfc.helpers.get_isos`
+        :return: the patterns found in GI per LG and how often they were found
+        """
+        from .helpers import get_patterns
+        GI_hash = graph_hash(GI, node_attr=node_attr, edge_attr=edge_attr)
+        pattern_count_per_GL = list()
+        for GL in GLs:
+            path = self._path('patterns', GI_hash, graph_hash(GL, edge_attr=edge_attr), node_attr, edge_attr)
+            try:
+                os.utime(path)
+                with open(path, 'rb') as file:
+                    pattern_count_per_GL.append(pickle.load(file))
+            except FileNotFoundError:
+                # not cached yet or just evicted by another process
+                counted_patterns = get_patterns(GI, [GL], GI_isos_per_GL=self.get_isos(GI, [GL], edge_attr=edge_attr,
+                                                                                          processes=processes),
+                                                node_attr=node_attr, edge_attr=edge_attr)[0]
+                self._write(path, lambda file: pickle.dump(counted_patterns, file))
+                pattern_count_per_GL.append(counted_patterns)
+        return pattern_count_per_GL
@@ -0,0 +1,231 @@
+"""colors big GOs along a moving front, finding the isos only where the front is
+
+Finding all isos of a big GO up front can need more memory than the rest of the run. Here GO is colored in
+chunks, the next chunk grows from the uncolored nodes next to the colored ones, so the colored part
+spreads like a front. Like a tile of :mod:`graphwfc.tiled` a chunk is solved by its own GraphWFCState on the
+chunk and the nodes around it (its region), with the colors already set in the region fixed.
+
+The isos of the region come from a :class:`LazyIsos`. It finds the isos of a node (those that map the first node
+of a GL to it) with an anchored search the first time a region contains the node and keeps them for the next
+regions, which overlap this one. Once no uncolored node is near a node anymore, no region will contain it again
+and its isos are dropped. So only the isos around the front are stored, not those of GO. The GraphWFCState of
+a region still gets all isos of the region when it's created, the isos aren't found while it propagates or observes.
+
+>>> colors = run_frontier(GO, GI=GI, GLs=GLs, window=1000)
+>>> if colors is not None:
+...     nx.set_node_attributes(GO, colors, 'color')
+"""
+import collections
+import random
+import networkx as nx
+from .helpers import get_automorphisms, get_patterns, _iso_finder
+from .tiled import _neighbors, _region, _solve_retries
+
+
+class LazyIsos:
+    """finds the isos of GLs in GO per node when they are needed and keeps them in a cache
+
+    The isos of a node are those that map the first node (in sorted order) of a GL to it, so every iso belongs
+    to exactly one node. The isos containing a node belong to the nodes at most the diameter of the GL away.
+
+    :ivar max_nodes: the maximum amount of nodes whose isos are kept, the least recently used ones are dropped
+            if there are more. None for no limit, then only :py:meth:`release` drops isos
+    :ivar hits: how often the isos of a node were in the cache
+    :ivar misses: how often the isos of a node had to be found
+    :ivar evictions: how often isos were dropped because of max_nodes
+    :ivar peak_nodes: the maximum amount of nodes whose isos were kept at the same time
+    """
+    __slots__ = '_GO', '_GLs', '_edge_attr', '_finders', '_automorphisms_per_GL', '_node_order', '_isos_per_node', \
+                'max_nodes', 'hits', 'misses', 'evictions', 'peak_nodes'
+
+    def __init__(self, GO, GLs, edge_attr='type', unique=False, max_nodes=None):
+        """nothing is searched yet
+
+        :param GO: the output graph
+        :param GLs: the ordered graphs that describe the patterns
+        :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+        :param unique: if True only one iso per set of nodes is kept, see :func:`~graphwfc.helpers.unique_isos`
+        :param max_nodes: see the ivar max_nodes, it should be bigger than a region
+        """
+        self._GO = GO
+        self._GLs = GLs
+        self._edge_attr = edge_attr
+        # how to search is decided once, it needs a look at all of GO
+        self._finders = [_iso_finder(GO, GL) for GL in GLs]
+        self._automorphisms_per_GL = [get_automorphisms(GL, edge_attr=edge_attr) for GL in GLs] if unique else None
+        # the isos are sorted by the node order of GO like those of get_isos
+        self._node_order = {node: index for index, node in enumerate(GO.nodes())}
+        self._isos_per_node = collections.OrderedDict()
+        self.max_nodes = max_nodes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.peak_nodes = 0
+
+    def __len__(self):
+        """the amount of nodes whose isos are kept"""
+        return len(self._isos_per_node)
+
+    def _iso_key(self, iso):
+        return [self._node_order[node] for node in iso]
+
+    def _find(self, nodes):
+        """finds the isos of the nodes with one search per GL, caches them and returns them per node"""
+        self.misses += len(nodes)
+        isos_per_node = {node: [list() for GL in self._GLs] for node in nodes}
+        for GL_id, (GL, finder) in enumerate(zip(self._GLs, self._finders)):
+            for iso in finder(self._GO, GL, self._edge_attr, anchors=nodes):
+                if self._automorphisms_per_GL is not None:
+                    # the iso of a set of nodes that unique_isos would keep from the sorted isos of GO
+                    key = self._iso_key(iso)
+                    if any(self._iso_key([iso[position] for position in automorphism]) < key
+                           for automorphism in self._automorphisms_per_GL[GL_id]):
+                        continue
+                isos_per_node[iso[0]][GL_id].append(iso)
+        for node in nodes:
+            isos_per_GL = isos_per_node[node]
+            for isos in isos_per_GL:
+                isos.sort(key=self._iso_key)
+            self._isos_per_node[node] = isos_per_GL
+        self.peak_nodes = max(self.peak_nodes, len(self._isos_per_node))
+        while self.max_nodes is not None and len(self._isos_per_node) > self.max_nodes:
+            self._isos_per_node.popitem(last=False)
+            self.evictions += 1
+        return isos_per_node
+
+    def isos_at(self, node):
+        """returns the isos of node per GL as tuples of nodes, sorted like :func:`~graphwfc.helpers.get_isos`"""
+        isos_per_GL = self._isos_per_node.get(node)
+        if isos_per_GL is None:
+            return self._find([node])[node]
+        self._isos_per_node.move_to_end(node)
+        self.hits += 1
+        return isos_per_GL
+
+    def region_isos(self, nodes):
+        """returns the isos that lie completely in nodes per GL, sorted by the order of nodes
+
+        This is what :func:`~graphwfc.helpers.get_isos` returns for the subgraph of GO with these nodes in this order.
+
+        :param nodes: the nodes of the region in an order
+        :return: the isos per GL as lists of tuples of nodes
+        """
+        node_ids = {node: node_id for node_id, node in enumerate(nodes)}
+        missing = [node for node in nodes if node not in self._isos_per_node]
+        found = self._find(missing) if missing else dict()
+        isos_per_GL = [list() for GL in self._GLs]
+        for node in nodes:
+            # found isos may be dropped already if max_nodes is smaller than the region
+            node_isos_per_GL = found.get(node)
+            if node_isos_per_GL is None:
+                node_isos_per_GL = self.isos_at(node)
+            for isos, region_isos in zip(node_isos_per_GL, isos_per_GL):
+                region_isos.extend(iso for iso in isos if all(iso_node in node_ids for iso_node in iso))
+        for region_isos in isos_per_GL:
+            region_isos.sort(key=lambda iso: [node_ids[iso_node] for iso_node in iso])
+        return isos_per_GL
+
+    def release(self, nodes):
+        """drops the isos of the nodes, they are found again if they are needed again"""
+        for node in nodes:
+            self._isos_per_node.pop(node, None)
+
+
+def _chunk(GO, start, window, done):
+    """returns up to window nodes that aren't done by a breadth first search from start"""
+    chunk = [start]
+    in_chunk = {start}
+    for node in chunk:
+        for neighbor in _neighbors(GO, node):
+            if len(chunk) == window:
+                return chunk
+            if neighbor not in in_chunk and neighbor not in done:
+                in_chunk.add(neighbor)
+                chunk.append(neighbor)
+    return chunk
+
+
+def run_frontier(GO, GI=None, GLs=None, pattern_count_per_GL=None, node_attr='color', edge_attr='type', window=1000,
+                 overlap=None, attempts=10, retries=3, seed=None, isos=None, compact=False, unique=False,
+                 cache_dir=None, **run_kwargs):
+    """colors GO chunk after chunk along a front, see :mod:`graphwfc.frontier`
+
+    Colors that GO already has are kept. If a chunk can't be solved, it is retried with the colors in a wider area
+    around it freed every time, like a tile of :func:`~graphwfc.tiled.run_tiled`.
+
+    :param GO: the output graph to be colored
+    :param GI: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param GLs: see :class:`~graphwfc.GraphWFCState.GraphWFCState`, needed to find the isos
+    :param pattern_count_per_GL: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param node_attr: the name of the node attribute used as color
+    :param edge_attr: the name of the edge attribute used to distinguish between edges
+    :param window: the maximum amount of nodes per chunk
+    :param overlap: how many edges the region of a chunk reaches beyond it, see :func:`~graphwfc.tiled.run_tiled`
+    :param attempts: the maximum amount of attempts per chunk and retry
+    :param retries: how often a failed chunk is retried with a wider area freed before the run fails
+    :param seed: the seed of the first attempt of the first chunk, the n-th attempt of the r-th retry of the c-th
+            chunk uses seed + ((retries + 1) * c + r) * attempts + n, the first try is retry 0. Random if not given
+    :param isos: (optional) a :class:`LazyIsos` of GO and GLs to use, e.g. one with max_nodes or to look at
+            its numbers afterwards. A new one without max_nodes if not given
+    :param compact: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param unique: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param cache_dir: (optional) a directory to cache the patterns of GI in or an :class:`~graphwfc.cache.IsoCache`.
+            The isos of the regions are found again every time, each region is only used once
+    :param run_kwargs: passed to :func:`~graphwfc.GraphWFCState.GraphWFCState.run`, e.g. max_backtracks
+    :return: a dict with the color of every node in an iso or None if a chunk couldn't be solved in any retry
+    """
+    assert GLs is not None
+    diameter = max(nx.diameter(GL.to_undirected()) if len(GL) > 1 else 0 for GL in GLs)
+    if overlap is None:
+        overlap = 4 * diameter
+    assert overlap >= diameter, 'the regions have to reach as far as the GLs'
+    if pattern_count_per_GL is None:
+        pattern_count_per_GL = get_patterns(GI=GI, GLs=GLs, node_attr=node_attr, edge_attr=edge_attr,
+                                            cache_dir=cache_dir)
+    state_kwargs = dict(GLs=GLs, pattern_count_per_GL=pattern_count_per_GL, node_attr=node_attr,
+                        edge_attr=edge_attr, compact=compact, unique=unique)
+    if isos is None:
+        isos = LazyIsos(GO, GLs, edge_attr=edge_attr, unique=unique)
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    given = {node: color for node, color in GO.nodes(data=node_attr) if color is not None}
+    colors = dict(given)
+    # the nodes that won't change anymore, nodes in no iso are done without a color
+    done = set(given)
+    # the nodes next to done ones, the next chunk starts at one of them
+    front = collections.deque()
+    unvisited = iter(GO.nodes())
+    chunk_id = 0
+    while True:
+        start = None
+        while front and start is None:
+            node = front.popleft()
+            if node not in done:
+                start = node
+        if start is None:
+            # GO isn't connected or the first chunk
+            start = next((node for node in unvisited if node not in done), None)
+            if start is None:
+                break
+        chunk = _chunk(GO, start, window, done)
+        first_seed = seed + (retries + 1) * chunk_id * attempts
+        # the regions of the retries contain those before them, the isos of the last one are released below
+        chunk_colors, region = _solve_retries(
+            GO, chunk, colors, given, overlap, diameter, retries,
+            lambda retry: [first_seed + retry * attempts + attempt for attempt in range(attempts)], run_kwargs,
+            state_kwargs, first_retry=0, isos=isos)
+        if chunk_colors is None:
+            if __debug__:
+                print('chunk ' + str(chunk_id) + ' failed')
+            return None
+        # freed nodes that weren't colored before are left to their own chunk
+        done.update(chunk)
+        colors.update((node, color) for node, color in chunk_colors.items() if node in done)
+        front.extend(neighbor for node in chunk for neighbor in _neighbors(GO, node) if neighbor not in done)
+        # a node is only in a later region if an uncolored node is at most overlap edges away
+        pending = [node for node in _region(GO, region, overlap) if node not in done]
+        needed = set(_region(GO, pending, overlap))
+        isos.release([node for node in region if node not in needed])
+        chunk_id += 1
+    return colors
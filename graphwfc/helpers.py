@@ -2,50 +2,390 @@ import networkx as nx
 from networkx import DiGraph
 from networkx.algorithms import isomorphism
 from collections import defaultdict
+from contextlib import contextmanager
+from itertools import count
+import numpy as np
 
 
-def get_isos(GB, GLs, edge_attr='type'):
+class _AnchoredMatcherMixin:
+    """restricts a VF2 matcher to the isos that map the node anchored_node of GL to one of the nodes in anchors"""
+    def candidate_pairs_iter(self):
+        if self.core_1:
+            yield from super().candidate_pairs_iter()
+        else:
+            for GB_node in self.anchors:
+                yield GB_node, self.anchored_node
+
+
+class _AnchoredGraphMatcher(_AnchoredMatcherMixin, isomorphism.GraphMatcher):
+    pass
+
+
+class _AnchoredDiGraphMatcher(_AnchoredMatcherMixin, isomorphism.DiGraphMatcher):
+    pass
+
+
+# marks a missing edge where an edge type is expected
+_NO_EDGE = object()
+
+
+def _iter_isos_vf2(GB, GL, edge_attr, anchors=None):
+    """yields the isos of GL in GB found by VF2, works for every GL"""
+    order = sorted(GL.nodes())
+    edgetest = isomorphism.categorical_edge_match(edge_attr, -1)
+    if nx.is_directed(GB):
+        matcher_class = isomorphism.DiGraphMatcher if anchors is None else _AnchoredDiGraphMatcher
+    else:
+        matcher_class = isomorphism.GraphMatcher if anchors is None else _AnchoredGraphMatcher
+    matcher = matcher_class(GB, GL, edge_match=edgetest)
+    if anchors is not None:
+        matcher.anchors = anchors
+        matcher.anchored_node = order[0]
+    for iso_GBtoGL in matcher.subgraph_isomorphisms_iter():
+        iso_GLtoGB = {GL_node: GB_node for GB_node, GL_node in iso_GBtoGL.items()}
+        yield tuple([iso_GLtoGB[GL_node] for GL_node in order])
+
+
+def _iter_isos_of_edge(GB, GL, edge_attr, anchors=None):
+    """yields the isos of a GL that is a single edge with a pass over the edges of GB"""
+    first, second = sorted(GL.nodes())
+    if GL.has_edge(first, second):
+        edge_type = GL.edges[first, second].get(edge_attr, -1)
+        GB_adj, GB_back = GB.adj, (GB.pred if GB.is_directed() else None)
+    else:
+        edge_type = GL.edges[second, first].get(edge_attr, -1)
+        GB_adj, GB_back = GB.pred, GB.succ
+    for GB_node in (GB.nodes() if anchors is None else anchors):
+        for GB_neighbor, attributes in GB_adj[GB_node].items():
+            if attributes.get(edge_attr, -1) != edge_type:
+                continue
+            # in a directed GB an edge back would be part of the induced subgraph
+            if GB_back is not None and GB_neighbor in GB_back[GB_node]:
+                continue
+            yield GB_node, GB_neighbor
+
+
+def _iter_isos_along_edges(GB, GL, edge_attr, anchors=None):
+    """yields the isos of a connected GL by mapping its nodes one after another to neighbors in GB
+
+    Every node of GL but the first is visited after one of its neighbors, so its candidates are only the
+    neighbors of where that neighbor is mapped to. This is all that is needed for edges, paths, stars or
+    patches of grids and far faster than VF2 for such small GLs.
+    """
+    order = sorted(GL.nodes())
+    directed = GB.is_directed()
+    # the GL nodes in the order they are mapped and for each one how to find and check its candidates
+    visited = [order[0]]
+    steps = [None]
+    for GL_parent, GL_node in nx.bfs_edges(GL.to_undirected(as_view=True), order[0]):
+        parent_id = visited.index(GL_parent)
+        outgoing = (not directed) or GL.has_edge(GL_parent, GL_node)
+        # the type of the edges to and from every node mapped before, as the subgraph has to be induced
+        checks = list()
+        for earlier_id, GL_earlier in enumerate(visited):
+            out_type = GL.edges[GL_earlier, GL_node].get(edge_attr, -1) \
+                if GL.has_edge(GL_earlier, GL_node) else _NO_EDGE
+            in_type = GL.edges[GL_node, GL_earlier].get(edge_attr, -1) \
+                if directed and GL.has_edge(GL_node, GL_earlier) else _NO_EDGE
+            checks.append((earlier_id, out_type, in_type))
+        visited.append(GL_node)
+        steps.append((parent_id, outgoing, checks))
+    GB_succ = GB.adj
+    GB_pred = GB.pred if directed else GB.adj
+    positions = [visited.index(GL_node) for GL_node in order]
+    mapped = list()
+    used = set()
+
+    def extend():
+        if len(mapped) == len(visited):
+            yield tuple([mapped[position] for position in positions])
+            return
+        parent_id, outgoing, checks = steps[len(mapped)]
+        for GB_node in (GB_succ if outgoing else GB_pred)[mapped[parent_id]]:
+            if GB_node in used:
+                continue
+            for earlier_id, out_type, in_type in checks:
+                edge = GB_succ[mapped[earlier_id]].get(GB_node)
+                if (_NO_EDGE if edge is None else edge.get(edge_attr, -1)) != out_type:
+                    break
+                if directed:
+                    edge = GB_succ[GB_node].get(mapped[earlier_id])
+                    if (_NO_EDGE if edge is None else edge.get(edge_attr, -1)) != in_type:
+                        break
+            else:
+                mapped.append(GB_node)
+                used.add(GB_node)
+                yield from extend()
+                used.remove(GB_node)
+                mapped.pop()
+
+    for GB_node in (GB.nodes() if anchors is None else anchors):
+        mapped.append(GB_node)
+        used.add(GB_node)
+        yield from extend()
+        used.remove(GB_node)
+        mapped.pop()
+
+
+def _iso_finder(GB, GL):
+    """returns the function that finds the isos of GL in GB, see _iter_isos
+
+    Connected GLs, which are nearly all GLs in practice, are matched along their edges. A single edge is
+    matched with one pass over the edges of GB. Everything else uses VF2.
+    """
+    if nx.is_directed(GB) != nx.is_directed(GL):
+        raise TypeError('You may not use both directed and undirected graphs.')
+    # self-loops and parallel edges are left to VF2
+    if GB.is_multigraph() or GL.is_multigraph() or nx.number_of_selfloops(GB) or nx.number_of_selfloops(GL) \
+            or not nx.is_connected(GL.to_undirected(as_view=True)):
+        return _iter_isos_vf2
+    if len(GL) == 2 and GL.number_of_edges() == 1:
+        return _iter_isos_of_edge
+    return _iter_isos_along_edges
+
+
+def _iter_isos(GB, GL, edge_attr, anchors=None):
+    """yields the isos of GL in GB, if anchors are given only those mapping the first node of GL to one of them"""
+    return _iso_finder(GB, GL)(GB, GL, edge_attr, anchors=anchors)
+
+
+def iter_isos(GB, GL, edge_attr='type'):
+    """yields the isos of GL in GB one at a time without storing them
+
+    Unlike get_isos the isos are not sorted, for graphs read from the same file the order is still always the same.
+
+    :param GB: the 'big' Graph, GI or GO
+    :param GL: a 'small' graph GL
+    :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+    :return: a generator of the isos of GL in GB as tuples of nodes of GB
+    """
+    return _iter_isos(GB, GL, edge_attr)
+
+
+# what the workers of the open pools of _fork_pool are initialized with, per pool
+_shared_per_pool = dict()
+_pool_ids = count()
+
+
+def _init_pool_worker(initializer, pool_id, shared):
+    initializer(_shared_per_pool[pool_id] if shared is None else shared)
+
+
+@contextmanager
+def _fork_pool(processes, initializer, shared):
+    """a multiprocessing pool whose workers call initializer(shared) before they do anything else
+
+    Where processes can be forked the workers inherit shared instead of unpickling it. It is kept until the with
+    block is left, so workers the pool starts again get it as well. Leaving the with block terminates the workers.
+    """
+    import multiprocessing
+    pool_id = next(_pool_ids)
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        _shared_per_pool[pool_id] = shared
+        initargs = (initializer, pool_id, None)
+    else:
+        context = multiprocessing.get_context()
+        initargs = (initializer, pool_id, shared)
+    try:
+        with context.Pool(processes, initializer=_init_pool_worker, initargs=initargs) as pool:
+            yield pool
+    finally:
+        _shared_per_pool.pop(pool_id, None)
+
+
+# the graphs (GB, GLs, edge_attr) of the workers of get_isos
+_worker_graphs = None
+_worker_GB_node_order = None
+
+
+def _init_iso_worker(graphs):
+    global _worker_graphs, _worker_GB_node_order
+    _worker_graphs = graphs
+    _worker_GB_node_order = {node: index for index, node in enumerate(_worker_graphs[0].nodes())}
+
+
+def _find_anchored_isos(GL_id_and_anchors):
+    GL_id, anchors = GL_id_and_anchors
+    GB, GLs, edge_attr = _worker_graphs
+    iso_list = list(_iter_isos(GB, GLs[GL_id], edge_attr, anchors=anchors))
+    iso_list.sort(key=lambda iso: [_worker_GB_node_order[node] for node in iso])
+    return GL_id, iso_list
+
+
+def _get_isos_parallel(GB, GLs, edge_attr, processes):
+    """splits the search by the node of GB the first node of a GL is mapped to and runs it in a process pool
+
+    The parts are contiguous in the node order of GB, so their sorted results only need to be concatenated
+    to be sorted.
+    """
+    GB_nodes = list(GB.nodes())
+    # a few parts per process, so that processes that finish early get more work
+    part_size = max(1, -(-len(GB_nodes) // (processes * 4)))
+    parts = [(GL_id, GB_nodes[start:start + part_size])
+             for GL_id in range(len(GLs)) for start in range(0, len(GB_nodes), part_size)]
+    with _fork_pool(processes, _init_iso_worker, (GB, GLs, edge_attr)) as pool:
+        GB_isos_per_GL = [list() for GL in GLs]
+        for GL_id, iso_list in pool.imap(_find_anchored_isos, parts):
+            GB_isos_per_GL[GL_id].extend(iso_list)
+    if __debug__:
+        print("Isomorphisms: " + str([len(iso_list) for iso_list in GB_isos_per_GL]))
+    return GB_isos_per_GL
+
+
+def get_automorphisms(GL, edge_attr='type'):
+    """returns the automorphisms of GL as permutations of the positions of its nodes
+
+    The position of a node is its index in sorted(GL.nodes()), like in the isos. If iso is an iso of GL,
+    tuple(iso[position] for position in automorphism) is an iso of GL on the same nodes for every automorphism.
+    The first automorphism is the identity.
+
+    :param GL: a 'small' graph GL
+    :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+    :return: the automorphisms of GL
+    """
+    positions = {node: position for position, node in enumerate(sorted(GL.nodes()))}
+    return sorted(tuple(positions[node] for node in iso) for iso in _iter_isos(GL, GL, edge_attr))
+
+
+def unique_isos(isos):
+    """returns the isos without those that map to the same nodes as an earlier one
+
+    For a symmetric GL, like an undirected edge, a star or a square, get_isos finds an iso for every automorphism
+    of GL on the same nodes. They all allow the same colorings if the patterns are symmetric as well,
+    see :func:`fold_patterns`, so only one of them is needed.
+
+    :param isos: the isos of a GL, e.g. from get_isos
+    :return: the first iso per set of nodes
+    """
+    node_sets = set()
+    unique = list()
+    for iso in isos:
+        node_set = frozenset(iso)
+        if node_set not in node_sets:
+            node_sets.add(node_set)
+            unique.append(iso)
+    return unique
+
+
+def fold_patterns(counted_patterns, automorphisms):
+    """returns the patterns that are allowed at an iso if its automorphic isos were dropped by unique_isos
+
+    A coloring has a pattern at every automorphic iso of an iso if its pattern is allowed in every permutation
+    by an automorphism. Patterns from GI are always symmetric in that way, as GI has all automorphic isos, so
+    only patterns from elsewhere are removed.
+
+    :param counted_patterns: the patterns of a GL and how often they were found, e.g. from get_patterns
+    :param automorphisms: the automorphisms of the GL from get_automorphisms
+    :return: the counted patterns without those that aren't allowed in every permutation
+    """
+    return {pattern: count for pattern, count in counted_patterns.items()
+            if all(tuple(pattern[position] for position in automorphism) in counted_patterns
+                   for automorphism in automorphisms)}
+
+
+def get_isos(GB, GLs, edge_attr='type', cache_dir=None, processes=1, unique=False):
     """returns the isomorphisms from every GL in GLs to a node induced subgraph of GB as a ordered list of nodes
 
     This function is used to get the needed isos. Usually called with GI or GO as GB.
     While this is called by the GraphWFCState constructor it might be useful
     to call it yourself and cache the results if some graphs are used multiple times.
+    The isos are sorted by the order of the nodes in GB, so that they don't depend on the (hash based) order
+    in which they are found and the same graphs always give the same list.
+    Connected GLs are matched along their edges, only other GLs need the far slower VF2.
 
     :param GB: the 'big' Graph, GI or GO
     :param GLs: the 'small' graphs GL in an order (e.g. in a list)
     :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+    :param cache_dir: (optional) a directory to cache the isos in or an :class:`~graphwfc.cache.IsoCache`,
+            e.g. one with another max_size
+    :param processes: the amount of processes searching at the same time, the result is the same for any amount
+    :param unique: if True only one iso per set of nodes is returned, see :func:`unique_isos`
     :return: the isos in G per LG
     """
+    if cache_dir is not None:
+        from .cache import open_cache
+        GB_isos_per_GL = open_cache(cache_dir).get_isos(GB, GLs, edge_attr=edge_attr, processes=processes)
+        return [unique_isos(isos) for isos in GB_isos_per_GL] if unique else GB_isos_per_GL
 
-    GB_isos_per_GL = list()
     for GL in GLs:
         if not nx.is_connected(GL.to_undirected()):
             print("A GL is not connected, this may take ages!")
+    if processes > 1:
+        GB_isos_per_GL = _get_isos_parallel(GB, GLs, edge_attr, processes)
+        return [unique_isos(isos) for isos in GB_isos_per_GL] if unique else GB_isos_per_GL
+
+    GB_node_order = {node: index for index, node in enumerate(GB.nodes())}
+    GB_isos_per_GL = list()
+    for GL in GLs:
         if __debug__:
             iso_count = 0
-        order = sorted(GL.nodes())
-        edgetest = isomorphism.categorical_edge_match(edge_attr, -1)
-        if nx.is_directed(GB) and nx.is_directed(GL):
-            matcher = isomorphism.DiGraphMatcher(GB, GL, edge_match=edgetest)
-        elif (not nx.is_directed(GB)) and (not nx.is_directed(GL)):
-            matcher = isomorphism.GraphMatcher(GB, GL, edge_match=edgetest)
-        else:
-            raise TypeError('You may not use both directed and undirected graphs.')
         iso_list = list()
-        for iso_GBtoGL in matcher.subgraph_isomorphisms_iter():
-            iso_GLtoGB = {GL_node: GB_node for GB_node, GL_node in iso_GBtoGL.items()}
-            iso = tuple([iso_GLtoGB[GL_node] for GL_node in order])
+        for iso in _iter_isos(GB, GL, edge_attr):
             iso_list.append(iso)
             if __debug__:
                 iso_count += 1
                 print("\rIsomorphisms: " + str(iso_count), end='', flush=True)
         if __debug__:
             print("")
-        GB_isos_per_GL.append(iso_list)
+        iso_list.sort(key=lambda iso: [GB_node_order[node] for node in iso])
+        GB_isos_per_GL.append(unique_isos(iso_list) if unique else iso_list)
     return GB_isos_per_GL
 
 
-def get_patterns(GI, GLs=None, GI_isos_per_GL=None, node_attr='color', edge_attr='type'):
+def _iso_array(isos, GB_node_ids, GL_size):
+    """returns the isos as an array with a row per iso and the nodes replaced by their ids"""
+    return np.array([[GB_node_ids[node] for node in iso] for iso in isos],
+                    dtype=np.int32 if len(GB_node_ids) < 2**31 else np.int64).reshape(len(isos), GL_size)
+
+
+def _unique_iso_array(iso_array):
+    """the same as unique_isos for an array from get_iso_arrays"""
+    if not len(iso_array):
+        return iso_array
+    _, first_rows = np.unique(np.sort(iso_array, axis=1), axis=0, return_index=True)
+    return iso_array[np.sort(first_rows)]
+
+
+def get_iso_arrays(GB, GLs=None, GB_isos_per_GL=None, edge_attr='type', cache_dir=None, processes=1, unique=False):
+    """returns the isos like get_isos, but as one integer array per GL with a row per iso
+
+    A node is given as its index in list(GB.nodes()). This needs far less memory than the tuples of get_isos.
+    With a cache_dir the arrays are memory-mapped from the cache and the isos are never stored as tuples.
+
+    :param GB: the 'big' Graph, GI or GO
+    :param GLs: the 'small' graphs GL in an order (e.g. in a list)
+    :param GB_isos_per_GL: (optional) the isos from get_isos to convert instead of searching them, then GLs are optional.
+            They may be arrays already, like those from :func:`~graphwfc.lattice.Lattice.get_iso_arrays`
+    :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+    :param cache_dir: (optional) a directory to cache the isos in or an :class:`~graphwfc.cache.IsoCache`
+    :param processes: the amount of processes searching at the same time, see :func:`get_isos`
+    :param unique: if True only one iso per set of nodes is returned, see :func:`unique_isos`
+    :return: an int array per GL with the isos in GB
+    """
+    assert GLs is not None or GB_isos_per_GL is not None
+    if GB_isos_per_GL is None and cache_dir is not None:
+        from .cache import open_cache
+        iso_arrays = open_cache(cache_dir).load_iso_arrays(GB, GLs, edge_attr=edge_attr, processes=processes)
+    else:
+        if GB_isos_per_GL is None:
+            GB_isos_per_GL = get_isos(GB, GLs, edge_attr=edge_attr, processes=processes)
+        GB_node_ids = None
+        iso_arrays = list()
+        for GL_id, isos in enumerate(GB_isos_per_GL):
+            if isinstance(isos, np.ndarray):
+                # e.g. from a Lattice, already in the right form
+                iso_arrays.append(isos)
+                continue
+            if GB_node_ids is None:
+                GB_node_ids = {node: node_id for node_id, node in enumerate(GB.nodes())}
+            GL_size = len(GLs[GL_id]) if GLs is not None else len(isos[0]) if isos else 0
+            iso_arrays.append(_iso_array(isos, GB_node_ids, GL_size))
+    return [_unique_iso_array(iso_array) for iso_array in iso_arrays] if unique else iso_arrays
+
+
+def get_patterns(GI, GLs=None, GI_isos_per_GL=None, node_attr='color', edge_attr='type', cache_dir=None,
+                 processes=1, unique=False):
     """extracts the patterns from GI for each GL and counts them
 
         This is called by the GraphWFCState constructor. If neither GI nor GLs differ for two GraphWFCStates,
@@ -57,15 +397,96 @@ def get_patterns(GI, GLs=None, GI_isos_per_GL=None, node_attr='color', edge_attr
             Alternative for the GLs parameter
     :param node_attr: the node attribute to be used in GraphWFC
     :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+    :param cache_dir: (optional) a directory to cache the patterns and isos in or an
+            :class:`~graphwfc.cache.IsoCache`. Only used if GI_isos_per_GL is not given
+    :param processes: the amount of processes searching for isos at the same time, see :func:`get_isos`
+    :param unique: if True only one iso per set of nodes in GI is used and its pattern is counted once
+            for every automorphism of GL, which gives the same counts. GI_isos_per_GL have to be unique then as well.
     :return: the patterns found in GI per LG and how often they were found
     """
     assert GLs is not None or GI_isos_per_GL is not None
+    assert GLs is not None or not unique
+    if cache_dir is not None and GI_isos_per_GL is None:
+        from .cache import open_cache
+        return open_cache(cache_dir).get_patterns(GI, GLs, node_attr=node_attr, edge_attr=edge_attr,
+                                                  processes=processes)
     if GI_isos_per_GL is None:
-        GI_isos_per_GL = get_isos(GI, GLs, edge_attr=edge_attr)
-    pattern_count_per_GL = [None] * len(GLs)
-    for GL_id, GL in enumerate(GLs):
+        GI_isos_per_GL = get_isos(GI, GLs, edge_attr=edge_attr, processes=processes, unique=unique)
+    pattern_count_per_GL = [None] * len(GI_isos_per_GL)
+    for GL_id, isos in enumerate(GI_isos_per_GL):
         counted_patterns = defaultdict(int)
-        for iso in GI_isos_per_GL[GL_id]:
-            counted_patterns[tuple(GI.nodes[node][node_attr] for node in iso)] += 1
+        # a unique iso stands for all its automorphic isos, their patterns are the permutations of its pattern
+        automorphisms = get_automorphisms(GLs[GL_id], edge_attr=edge_attr) if unique else None
+        for iso in isos:
+            pattern = tuple(GI.nodes[node][node_attr] for node in iso)
+            if automorphisms is None:
+                counted_patterns[pattern] += 1
+            else:
+                for automorphism in automorphisms:
+                    counted_patterns[tuple(pattern[position] for position in automorphism)] += 1
         pattern_count_per_GL[GL_id] = dict(counted_patterns)
     return pattern_count_per_GL
+
+
+class PatternCounter:
+    """counts the patterns of GLs in one or more GIs while their isos are searched
+
+    The isos are never stored, so the memory needed only grows with the amount of different patterns.
+    The counts of several GIs are added up, the counts of a GI can be weighted.
+
+    >>> counter = PatternCounter(GLs, GIs=[GI_a, GI_b], weights=[1, 2], node_attr='c')
+    >>> counter.update(GI_c)
+    >>> S = GraphWFCState(GO=GO, GLs=GLs, pattern_count_per_GL=counter.pattern_count_per_GL, node_attr='c')
+
+    :ivar GLs: the (ordered) GLs to define the 'shape' of the patterns
+    :ivar node_attr: the node attribute to be used in GraphWFC
+    :ivar edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+    """
+    __slots__ = 'GLs', 'node_attr', 'edge_attr', '_counted_patterns_per_GL'
+
+    def __init__(self, GLs, GIs=(), weights=None, node_attr='color', edge_attr='type'):
+        """creates a counter and counts the patterns in the GIs
+
+        :param GLs: the (ordered) GLs to define the 'shape' of the patterns
+        :param GIs: (optional) the input graphs to count the patterns in
+        :param weights: (optional) a weight per GI its patterns are counted with, 1 if not given
+        :param node_attr: the node attribute to be used in GraphWFC
+        :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+        """
+        assert weights is None or len(weights) == len(GIs)
+        self.GLs = GLs
+        self.node_attr = node_attr
+        self.edge_attr = edge_attr
+        self._counted_patterns_per_GL = [defaultdict(int) for GL in GLs]
+        for GI_id, GI in enumerate(GIs):
+            self.update(GI, 1 if weights is None else weights[GI_id])
+
+    def update(self, GI, weight=1):
+        """counts the patterns in GI
+
+        :param GI: an input graph, every node targeted by an iso must be colored
+        :param weight: every pattern found in GI is counted this often, may be a float. With 0 GI is skipped,
+                a pattern counted 0 times would be possible but could never be chosen
+        """
+        assert weight >= 0, 'a pattern can not be counted less than 0 times'
+        if not weight:
+            return
+        for GL, counted_patterns in zip(self.GLs, self._counted_patterns_per_GL):
+            for iso in _iter_isos(GI, GL, self.edge_attr):
+                counted_patterns[tuple(GI.nodes[node][self.node_attr] for node in iso)] += weight
+
+    def merge(self, other):
+        """adds the counts of another counter with the same GLs, e.g. one that counted in another process
+
+        :param other: a PatternCounter or the pattern_count_per_GL of one
+        """
+        other_pattern_count_per_GL = other.pattern_count_per_GL if isinstance(other, PatternCounter) else other
+        assert len(other_pattern_count_per_GL) == len(self.GLs)
+        for counted_patterns, other_counted_patterns in zip(self._counted_patterns_per_GL, other_pattern_count_per_GL):
+            for pattern, count in other_counted_patterns.items():
+                counted_patterns[pattern] += count
+
+    @property
+    def pattern_count_per_GL(self):
+        """the patterns counted so far per GL and how often they were found, like the return value of get_patterns"""
+        return [dict(counted_patterns) for counted_patterns in self._counted_patterns_per_GL]
@@ -0,0 +1,156 @@
+"""builds lattices like grids, tori and tilings together with their isos
+
+A lattice is a unit cell repeated along some axes, so every cell looks the same. Instead of searching the isos in
+the whole GO, they are searched once around a single cell and moved to all other cells, which takes seconds
+even for a 1000x1000 grid.
+
+>>> lattice = Lattice.grid((1000, 1000), types=(1, 3))
+>>> S = GraphWFCState(GO=lattice.graph(), GO_isos_per_GL=lattice.get_iso_arrays(GLs), GLs=GLs, GI=GI)
+"""
+import networkx as nx
+import numpy as np
+from .helpers import _iter_isos, _unique_iso_array
+
+
+class Lattice:
+    """a graph made of a unit cell that is repeated along every axis
+
+    A node is given by the coordinates of its cell and its site in the cell. Its label is the tuple of the
+    coordinates if there is only one site per cell and the coordinates followed by the site otherwise.
+    The nodes are ordered by their cell, in the order of itertools.product, and then by their site.
+
+    :ivar shape: the amount of cells along each axis
+    :ivar edges: the edges of the unit cell as (site, other_site, offset, attributes). Every cell has an edge from
+            its site to other_site in the cell that is offset away, given as an int per axis.
+    :ivar sites: the amount of nodes per cell
+    :ivar periodic: per axis whether the lattice wraps around, like a torus
+    :ivar directed: whether the graph is a DiGraph
+    """
+    __slots__ = 'shape', 'edges', 'sites', 'periodic', 'directed'
+
+    def __init__(self, shape, edges, sites=1, periodic=False, directed=True):
+        """describes a lattice, the graph is only built by :py:meth:graph
+
+        :param shape: the amount of cells along each axis
+        :param edges: the edges of the unit cell as (site, other_site, offset) or (site, other_site, offset, attributes)
+        :param sites: the amount of nodes per cell
+        :param periodic: whether the lattice wraps around, either for all axes or as a bool per axis
+        :param directed: whether the graph is a DiGraph
+        """
+        self.shape = tuple(shape)
+        self.edges = [(edge[0], edge[1], tuple(edge[2]), edge[3] if len(edge) > 3 else dict()) for edge in edges]
+        assert all(len(offset) == len(self.shape) for _, _, offset, _ in self.edges)
+        assert all(0 <= site < sites and 0 <= other_site < sites for site, other_site, _, _ in self.edges)
+        self.sites = sites
+        self.periodic = tuple(periodic) if isinstance(periodic, (tuple, list)) else (periodic,) * len(self.shape)
+        self.directed = directed
+
+    @classmethod
+    def grid(cls, shape, types=None, periodic=False, directed=True, edge_attr='type'):
+        """returns a grid with an edge from every node to the next one along each axis
+
+        :param shape: the amount of nodes along each axis
+        :param types: (optional) the edge type per axis, stored in the attribute edge_attr
+        :param periodic: whether the grid wraps around, either for all axes or as a bool per axis
+        :param directed: whether the graph is a DiGraph
+        :param edge_attr: the attribute the types are stored in
+        """
+        edges = list()
+        for axis in range(len(shape)):
+            offset = tuple(1 if other_axis == axis else 0 for other_axis in range(len(shape)))
+            edges.append((0, 0, offset, dict() if types is None else {edge_attr: types[axis]}))
+        return cls(shape, edges, periodic=periodic, directed=directed)
+
+    def _cells(self):
+        """the coordinates of every cell in order as an array with a row per cell"""
+        return np.indices(self.shape).reshape(len(self.shape), -1).T
+
+    def _node_ids(self, coordinates, site):
+        """the ids of the nodes at the coordinates (a row per node, wrapped around) and the site"""
+        return np.ravel_multi_index(coordinates.T, self.shape, mode='wrap') * self.sites + site
+
+    def _move(self, cells, offset):
+        """the cells moved by the offset and whether they are still in the lattice"""
+        moved = cells + np.array(offset, dtype=cells.dtype)
+        inside = np.ones(len(cells), dtype=bool)
+        for axis, size in enumerate(self.shape):
+            if not self.periodic[axis]:
+                inside &= (moved[:, axis] >= 0) & (moved[:, axis] < size)
+        return moved, inside
+
+    def nodes(self):
+        """returns the labels of the nodes in order, a node id is an index in this list"""
+        if self.sites == 1:
+            return [tuple(cell) for cell in self._cells().tolist()]
+        return [tuple(cell) + (site,) for cell in self._cells().tolist() for site in range(self.sites)]
+
+    def graph(self):
+        """returns the lattice as a networkx (Di)Graph"""
+        G = nx.DiGraph() if self.directed else nx.Graph()
+        nodes = self.nodes()
+        G.add_nodes_from(nodes)
+        cells = self._cells()
+        for site, other_site, offset, attributes in self.edges:
+            moved, inside = self._move(cells, offset)
+            node_ids = self._node_ids(cells[inside], site).tolist()
+            other_node_ids = self._node_ids(moved[inside], other_site).tolist()
+            G.add_edges_from((nodes[node_id], nodes[other_node_id], attributes)
+                             for node_id, other_node_id in zip(node_ids, other_node_ids))
+        return G
+
+    def get_iso_arrays(self, GLs, edge_attr='type', unique=False):
+        """returns the isos in the lattice like :func:`~graphwfc.helpers.get_iso_arrays` on the graph would
+
+        The isos whose first node is in one cell are searched in a patch around that cell, every other cell has
+        the same isos moved to it. The GLs have to be connected.
+
+        :param GLs: the 'small' graphs GL in an order (e.g. in a list)
+        :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+        :param unique: if True only one iso per set of nodes is returned, see :func:`~graphwfc.helpers.unique_isos`
+        :return: an int array per GL with a row per iso, the nodes are given as their index in :py:meth:nodes
+        """
+        cells = self._cells()
+        node_count = len(cells) * self.sites
+        max_offset = max([max(abs(step) for step in offset) for _, _, offset, _ in self.edges if offset] + [0])
+        iso_arrays = list()
+        for GL in GLs:
+            assert nx.is_connected(GL.to_undirected()), 'only connected GLs can be moved across a lattice'
+            # no node of an iso is further away from its first node than this along any axis
+            reach = (nx.diameter(GL.to_undirected()) if len(GL) > 1 else 0) * max_offset
+            for axis, size in enumerate(self.shape):
+                # otherwise an iso could wrap around and meet itself
+                assert not self.periodic[axis] or size > 2 * reach + max_offset, 'the lattice is too small for a GL'
+            patch = Lattice((2 * reach + 1,) * len(self.shape), self.edges, sites=self.sites, directed=self.directed)
+            patch_nodes = patch.nodes()
+            patch_node_ids = {node: node_id for node_id, node in enumerate(patch_nodes)}
+            center = np.full((1, len(self.shape)), reach)
+            anchors = [patch_nodes[node_id] for node_id in patch._node_ids(center, np.arange(self.sites)).tolist()]
+            parts = list()
+            for iso in _iter_isos(patch.graph(), GL, edge_attr, anchors=anchors):
+                columns = list()
+                inside = np.ones(len(cells), dtype=bool)
+                for node in iso:
+                    cell, site = divmod(patch_node_ids[node], self.sites)
+                    offset = np.array(np.unravel_index(cell, patch.shape)) - reach
+                    moved, moved_inside = self._move(cells, offset)
+                    inside &= moved_inside
+                    columns.append(self._node_ids(moved, site))
+                parts.append(np.stack(columns, axis=1)[inside])
+            iso_array = np.concatenate(parts) if parts else np.zeros((0, len(GL)), dtype=np.int64)
+            # the same order as get_isos, sorted by the node order
+            iso_array = iso_array[np.lexsort(iso_array.T[::-1])]
+            iso_array = iso_array.astype(np.int32 if node_count < 2**31 else np.int64)
+            iso_arrays.append(_unique_iso_array(iso_array) if unique else iso_array)
+        return iso_arrays
+
+    def get_isos(self, GLs, edge_attr='type', unique=False):
+        """returns the isos in the lattice like :func:`~graphwfc.helpers.get_isos` on the graph would
+
+        :param GLs: the 'small' graphs GL in an order (e.g. in a list)
+        :param edge_attr: the attribute used to decide whether two edges should be considered to be of the same type
+        :param unique: if True only one iso per set of nodes is returned, see :func:`~graphwfc.helpers.unique_isos`
+        :return: the isos per GL as tuples of node labels
+        """
+        nodes = self.nodes()
+        return [[tuple(nodes[node_id] for node_id in iso) for iso in iso_array.tolist()]
+                for iso_array in self.get_iso_arrays(GLs, edge_attr=edge_attr, unique=unique)]
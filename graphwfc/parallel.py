@@ -0,0 +1,77 @@
+"""runs several attempts of GraphWaveFunctionCollapse at the same time
+
+Every attempt runs in a process of a pool and has its own seed. The first successful attempt wins
+and the others are cancelled. Since a run only depends on its seed, the winning attempt can be repeated
+with GraphWFCState(..., seed=seed).run().
+"""
+import multiprocessing
+import random
+from .GraphWFCState import GraphWFCState
+from .helpers import get_isos, get_patterns, _fork_pool
+
+# the GraphWFCState of a worker process, it is reset for every attempt
+_worker_state = None
+
+
+def _init_worker(state_kwargs):
+    global _worker_state
+    _worker_state = GraphWFCState(**state_kwargs)
+
+
+def _attempt(seed_and_run_kwargs):
+    seed, run_kwargs = seed_and_run_kwargs
+    _worker_state.reset(seed)
+    if _worker_state.run(**run_kwargs):
+        # only the invisible nodes have no color
+        return seed, {node: color for node, color in zip(*_worker_state.colors()) if color is not None}
+    return seed, None
+
+
+def run_parallel(GO, GI=None, GLs=None, pattern_count_per_GL=None, GI_isos_per_GL=None, GO_isos_per_GL=None,
+                 node_attr='color', edge_attr='type', compact=False, cache_dir=None, unique=False, attempts=10,
+                 processes=None, seed=None, **run_kwargs):
+    """runs attempts in a process pool until one of them colored GO
+
+    The patterns and the isos in GO are computed once before the workers are started, using the same amount
+    of processes. On systems that can fork the workers share them with this process, otherwise they are sent
+    once per worker.
+    Every worker creates one GraphWFCState and resets it with the seed of each of its attempts.
+
+    :param GO: the output graph to be colored
+    :param GI: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param GLs: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param pattern_count_per_GL: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param GI_isos_per_GL: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param GO_isos_per_GL: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param node_attr: the name of the node attribute used as color
+    :param edge_attr: the name of the edge attribute used to distinguish between edges
+    :param compact: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param cache_dir: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param unique: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param attempts: the maximum amount of attempts
+    :param processes: the amount of worker processes, defaults to the amount of CPUs
+    :param seed: the seed of the first attempt, the n-th attempt uses seed + n. Random if not given
+    :param run_kwargs: passed to :func:`~graphwfc.GraphWFCState.GraphWFCState.run`, e.g. max_backtracks
+    :return: the seed of the successful attempt and a dict with the color of every node of its GO
+            or None if no attempt was successful
+    """
+    if pattern_count_per_GL is None:
+        pattern_count_per_GL = get_patterns(GI=GI, GLs=GLs, GI_isos_per_GL=GI_isos_per_GL,
+                                            node_attr=node_attr, edge_attr=edge_attr, cache_dir=cache_dir,
+                                            processes=processes or multiprocessing.cpu_count(),
+                                            unique=unique and GI_isos_per_GL is None)
+    if GO_isos_per_GL is None:
+        GO_isos_per_GL = get_isos(GB=GO, GLs=GLs, edge_attr=edge_attr, cache_dir=cache_dir,
+                                  processes=processes or multiprocessing.cpu_count(), unique=unique)
+    state_kwargs = dict(GO=GO, GLs=GLs, pattern_count_per_GL=pattern_count_per_GL, GO_isos_per_GL=GO_isos_per_GL,
+                        node_attr=node_attr, edge_attr=edge_attr, compact=compact, unique=unique)
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    # leaving the with block terminates the workers and with them the remaining attempts
+    with _fork_pool(processes, _init_worker, state_kwargs) as pool:
+        for attempt_seed, values in pool.imap_unordered(
+                _attempt, [(seed + attempt, run_kwargs) for attempt in range(attempts)]):
+            if values is not None:
+                return attempt_seed, values
+    return None
@@ -0,0 +1,91 @@
+"""runs GraphWaveFunctionCollapse again and again with growing backtrack budgets and learns from the failures
+
+Instead of trying seed after seed with the same budget, every attempt gets as many backtracks as a restart policy
+allows, and after every failure :func:`~graphwfc.GraphWFCState.GraphWFCState.learn_nogood` looks for a few of its
+decisions that can't be made together. The later attempts then don't make them again.
+
+>>> S = GraphWFCState(GO=GO, GI=GI, GLs=GLs)
+>>> report = run_restarts(S, attempts=20, policy='luby', unit=10)
+>>> if report['success']:
+...     nx.write_graphml(S.GO, 'out.graphml')
+"""
+import random
+import time
+
+POLICIES = ('luby', 'geometric', 'fixed')
+
+
+def luby(i):
+    """returns the i-th number (starting at 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ..."""
+    assert i > 0
+    while True:
+        k = i.bit_length()
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        i -= (1 << (k - 1)) - 1
+
+
+def get_budget(policy, attempt, unit=10, factor=2.0):
+    """returns the max_backtracks of an attempt
+
+    :param policy: 'luby' (unit times the Luby sequence), 'geometric' (unit times factor to the power of the attempt)
+            or 'fixed' (always unit, like trying seed after seed)
+    :param attempt: the number of the attempt, starting at 0
+    :param unit: the backtracks of the first attempt
+    :param factor: how much the budget grows per attempt for 'geometric'
+    """
+    if policy == 'luby':
+        return unit * luby(attempt + 1)
+    if policy == 'geometric':
+        return round(unit * factor ** attempt)
+    if policy == 'fixed':
+        return unit
+    raise ValueError('unknown restart policy: ' + str(policy))
+
+
+def run_restarts(state, attempts=10, policy='luby', unit=10, factor=2.0, learn=True, max_nogood_size=8,
+                 backtrack_depth=1, seed=None):
+    """runs attempts on the state until one colors GO, learning a nogood from every failed one
+
+    The n-th attempt resets the state with seed + n, so a successful attempt can be repeated
+    with reset(seed) and run(max_backtracks=...) as long as the state has the same nogoods.
+
+    :param state: a :class:`~graphwfc.GraphWFCState.GraphWFCState`, colored afterwards if an attempt succeeded
+    :param attempts: the maximum amount of attempts
+    :param policy: how many backtracks an attempt may do, see :func:`get_budget`
+    :param unit: see :func:`get_budget`
+    :param factor: see :func:`get_budget`
+    :param learn: whether to learn from failed attempts, without it this is just a loop over seeds
+    :param max_nogood_size: see :func:`~graphwfc.GraphWFCState.GraphWFCState.learn_nogood`
+    :param backtrack_depth: see :func:`~graphwfc.GraphWFCState.GraphWFCState.run`
+    :param seed: the seed of the first attempt, random if not given
+    :return: a dict with success, attempts, seed (of the successful or first attempt), max_backtracks (of the
+            successful or last attempt), nogoods (the amount learned), iterations and backtracks (of all attempts),
+            time (seconds), time_to_success (None without success) and learn_time (seconds spent learning)
+    """
+    assert policy in POLICIES
+    if seed is None:
+        seed = random.getrandbits(32)
+    report = {'success': False, 'attempts': 0, 'seed': seed, 'max_backtracks': 0, 'nogoods': 0, 'iterations': 0,
+              'backtracks': 0, 'time': 0.0, 'time_to_success': None, 'learn_time': 0.0}
+    start = time.perf_counter()
+    for attempt in range(attempts):
+        max_backtracks = get_budget(policy, attempt, unit=unit, factor=factor)
+        state.reset(seed + attempt)
+        result = state.run(max_backtracks=max_backtracks, backtrack_depth=backtrack_depth)
+        report['attempts'] = attempt + 1
+        report['max_backtracks'] = max_backtracks
+        report['iterations'] += state.iteration_count
+        report['backtracks'] += state.backtrack_count
+        if result:
+            report['success'] = True
+            report['seed'] = seed + attempt
+            report['time_to_success'] = time.perf_counter() - start
+            break
+        if learn and attempt + 1 < attempts:
+            learn_start = time.perf_counter()
+            if state.learn_nogood(max_size=max_nogood_size) is not None:
+                report['nogoods'] += 1
+            report['learn_time'] += time.perf_counter() - learn_start
+    report['time'] = time.perf_counter() - start
+    return report
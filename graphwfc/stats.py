@@ -0,0 +1,135 @@
+"""collects numbers about where a GraphWFCState spends its time
+
+Statistics are only collected if a :class:`Stats` is given to the state, GraphWFCState(..., stats=Stats())
+or stats=True. Without it the state only checks once per phase whether it has one.
+
+>>> stats = Stats(callback=lambda event, stats: print(event, stats.as_dict()))
+>>> S = GraphWFCState(GO=GO, GI=GI, GLs=GLs, stats=stats)
+>>> S.run()
+>>> print(stats.summary())
+"""
+import time
+from array import array
+from collections import Counter
+
+
+class _Phase:
+    """adds the time spent in a with block to a phase of the stats"""
+    __slots__ = 'stats', 'name', 'start'
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exception):
+        self.stats.add_time(self.name, time.perf_counter() - self.start)
+
+
+class Stats:
+    """the numbers collected by a GraphWFCState
+
+    The phases are 'patterns' (counting the patterns in GI, including its isos), 'isos' (finding the isos in GO),
+    'setup' (the rest of the construction), 'initial propagation', 'reset', 'observe' (choosing an iso and
+    a pattern), 'propagate' and 'backtrack' (only timed while backtracks are left).
+
+    :ivar phase_times: the seconds spent per phase
+    :ivar phase_counts: how often a phase was entered
+    :ivar iso_counts_per_GL: the amount of isos in GO per GL
+    :ivar removed_values_per_wave: per propagation the amount of colors removed from nodes. Every observation is
+            followed by a propagation, so are the construction, backtracks and resolves
+    :ivar changed_isos_per_wave: per propagation the amount of times patterns were removed from an iso
+    :ivar contradictions: the location (a node or an iso) of every contradiction that run() or resolve() ran into
+    :ivar value_count_histogram: how many nodes have how many colors left, updated after the construction
+            and every run that ended, not when iter or the time budget was used up
+    :ivar pattern_count_histograms: per GL how many isos have how many patterns left, updated like
+            value_count_histogram
+    :ivar callback: (optional) called with the event ('construct', 'reset' or 'run') and the stats after each
+    """
+    __slots__ = 'phase_times', 'phase_counts', 'iso_counts_per_GL', 'removed_values_per_wave', \
+                'changed_isos_per_wave', 'contradictions', 'value_count_histogram', 'pattern_count_histograms', \
+                'callback'
+
+    def __init__(self, callback=None):
+        """creates empty stats
+
+        :param callback: (optional) a function called as callback(event, stats), e.g. to send the numbers on
+        """
+        self.phase_times = dict()
+        self.phase_counts = dict()
+        self.iso_counts_per_GL = list()
+        self.removed_values_per_wave = array('q')
+        self.changed_isos_per_wave = array('q')
+        self.contradictions = list()
+        self.value_count_histogram = dict()
+        self.pattern_count_histograms = list()
+        self.callback = callback
+
+    def phase(self, name):
+        """returns a context manager that adds the time spent in it to the phase
+
+        :param name: the name of the phase
+        """
+        return _Phase(self, name)
+
+    def add_time(self, name, seconds):
+        """adds time to a phase and counts it as one more time the phase was entered"""
+        self.phase_times[name] = self.phase_times.get(name, 0.0) + seconds
+        self.phase_counts[name] = self.phase_counts.get(name, 0) + 1
+
+    def add_wave(self, removed_values, changed_isos):
+        """records a propagation"""
+        self.removed_values_per_wave.append(removed_values)
+        self.changed_isos_per_wave.append(changed_isos)
+
+    def set_histograms(self, value_counts, pattern_counts_per_GL):
+        """sets the histograms from the amount of colors per node and of patterns per iso of every GL"""
+        self.value_count_histogram = dict(sorted(Counter(value_counts).items()))
+        self.pattern_count_histograms = [dict(sorted(Counter(pattern_counts).items()))
+                                         for pattern_counts in pattern_counts_per_GL]
+
+    def emit(self, event):
+        """calls the callback if there is one"""
+        if self.callback is not None:
+            self.callback(event, self)
+
+    def as_dict(self):
+        """returns the numbers as a dict of plain python values, the propagations are summarized
+
+        :return: a dict that can be given to json.dumps (with default=str if nodes aren't strings or numbers)
+        """
+        waves = len(self.removed_values_per_wave)
+        return {
+            'phase_times': dict(self.phase_times),
+            'phase_counts': dict(self.phase_counts),
+            'iso_counts_per_GL': list(self.iso_counts_per_GL),
+            'waves': waves,
+            'removed_values': sum(self.removed_values_per_wave),
+            'max_removed_values_per_wave': max(self.removed_values_per_wave, default=0),
+            'changed_isos': sum(self.changed_isos_per_wave),
+            'max_changed_isos_per_wave': max(self.changed_isos_per_wave, default=0),
+            'contradictions': list(self.contradictions),
+            'value_count_histogram': dict(self.value_count_histogram),
+            'pattern_count_histograms': [dict(histogram) for histogram in self.pattern_count_histograms],
+        }
+
+    def summary(self):
+        """returns the numbers as readable text"""
+        numbers = self.as_dict()
+        lines = ['isos per GL: ' + str(numbers['iso_counts_per_GL'])]
+        for name, seconds in sorted(self.phase_times.items(), key=lambda phase: -phase[1]):
+            lines.append(name + ': ' + format(seconds, '.3f') + 's in ' + str(self.phase_counts[name]))
+        waves = max(numbers['waves'], 1)
+        lines.append('propagations: ' + str(numbers['waves']) + ', per propagation ' +
+                     format(numbers['removed_values'] / waves, '.1f') + ' removed colors (at most ' +
+                     str(numbers['max_removed_values_per_wave']) + ') and ' +
+                     format(numbers['changed_isos'] / waves, '.1f') + ' changed isos (at most ' +
+                     str(numbers['max_changed_isos_per_wave']) + ')')
+        lines.append('contradictions: ' + str(len(self.contradictions)) +
+                     (', the last at ' + str(self.contradictions[-1]) if self.contradictions else ''))
+        lines.append('nodes per amount of colors left: ' + str(self.value_count_histogram))
+        for GL_id, histogram in enumerate(self.pattern_count_histograms):
+            lines.append('isos of GL ' + str(GL_id) + ' per amount of patterns left: ' + str(histogram))
+        return '\n'.join(lines)
@@ -0,0 +1,258 @@
+"""colors big GOs tile by tile
+
+GO is split into tiles. A tile is solved by its own GraphWFCState on the tile and the nodes around it
+(its region), with the colors of already solved tiles in the region fixed. Only the colors of the tile itself
+are kept, the rest of the region lets it look ahead. If the region reaches at least as far as the widest GL,
+every iso of GO is in the region of the last tile solved of those it touches, so all of GO is colored
+with allowed patterns.
+Tiles whose regions don't reach into each other are solved at the same time. If the colors around a tile
+don't fit together, the tile is retried with the colors near it freed, they are kept only where every iso
+through them lies in the region. Every further retry frees the colors in an area twice as wide, so a contradiction
+only throws away the work around it. The memory needed per state only depends on the tile size and the retries.
+"""
+import itertools
+import random
+from contextlib import nullcontext
+from functools import partial
+import networkx as nx
+from .GraphWFCState import GraphWFCState
+from .helpers import get_patterns, _fork_pool
+
+# the arguments shared by the GraphWFCStates of all tiles
+_worker_state_kwargs = None
+
+
+def _neighbors(GO, node):
+    """the neighbors of node along edges of either direction, unlike to_undirected in a fixed order"""
+    if GO.is_directed():
+        return itertools.chain(GO.succ[node], GO.pred[node])
+    return GO.adj[node]
+
+
+def grid_tiles(GO, tile_shape):
+    """splits a GO with coordinate tuples as nodes, like a grid or a :class:`~graphwfc.lattice.Lattice`, into boxes
+
+    :param GO: the output graph, its nodes are tuples that start with their coordinates
+    :param tile_shape: the amount of nodes along each axis per tile
+    :return: the tiles as lists of nodes
+    """
+    nodes_per_box = dict()
+    for node in GO.nodes():
+        box = tuple(coordinate // size for coordinate, size in zip(node, tile_shape))
+        nodes_per_box.setdefault(box, []).append(node)
+    return [nodes_per_box[box] for box in sorted(nodes_per_box)]
+
+
+def bfs_tiles(GO, tile_size):
+    """splits any GO into connected tiles of about tile_size nodes by a breadth first search from unassigned nodes
+
+    :param GO: the output graph
+    :param tile_size: the maximum amount of nodes per tile
+    :return: the tiles as lists of nodes
+    """
+    tile_ids = dict()
+    tiles = list()
+    for start in GO.nodes():
+        if start in tile_ids:
+            continue
+        tile = [start]
+        tile_ids[start] = len(tiles)
+        for node in tile:
+            for neighbor in _neighbors(GO, node):
+                if len(tile) == tile_size:
+                    break
+                if neighbor not in tile_ids:
+                    tile_ids[neighbor] = len(tiles)
+                    tile.append(neighbor)
+        tiles.append(tile)
+    return tiles
+
+
+def _region(GO, tile, overlap):
+    """returns the nodes of the tile and those at most overlap edges away in the order they are found"""
+    region = list(tile)
+    region_nodes = set(region)
+    frontier = region
+    for hop in range(overlap):
+        next_frontier = list()
+        for node in frontier:
+            for neighbor in _neighbors(GO, node):
+                if neighbor not in region_nodes:
+                    region_nodes.add(neighbor)
+                    next_frontier.append(neighbor)
+        region.extend(next_frontier)
+        frontier = next_frontier
+    return region
+
+
+def _subgraph(GO, nodes):
+    """returns a copy of the subgraph of GO with the nodes in the given order, GO.subgraph may order them by hash"""
+    node_set = set(nodes)
+    subgraph = GO.__class__()
+    subgraph.add_nodes_from((node, GO.nodes[node]) for node in nodes)
+    subgraph.add_edges_from((node, neighbor, attributes) for node in nodes
+                            for neighbor, attributes in GO.adj[node].items() if neighbor in node_set)
+    return subgraph
+
+
+def _retry_region(GO, nodes, colors, given, overlap, diameter, retry, node_attr):
+    """returns the region, its GO with the fixed colors and the free nodes of the retry-th try to solve the nodes
+
+    The first try (retry 0) only frees the nodes, its region reaches overlap edges beyond them. The region of retry
+    r reaches twice as far as that of the retry before, 2 ** (r - 1) * overlap edges, and the colors less than
+    diameter edges from its border are freed, so every iso through a freed node lies in the region. The colors of
+    the input GO are never freed.
+    """
+    reach = 2 ** max(retry - 1, 0) * overlap
+    region = _region(GO, nodes, reach)
+    free = set(_region(GO, nodes, reach - diameter) if retry else nodes) - given.keys()
+    region_GO = _subgraph(GO, region)
+    nx.set_node_attributes(region_GO, {node: colors[node] for node in region
+                                       if node in colors and node not in free}, node_attr)
+    return region, region_GO, [node for node in region if node in free]
+
+
+def _solve_retries(GO, nodes, colors, given, overlap, diameter, retries, seeds_per_retry, run_kwargs, state_kwargs,
+                   first_retry=1, isos=None):
+    """retries to solve the nodes, every retry frees the colors in a wider area around them, see _retry_region
+
+    :param seeds_per_retry: returns the seeds of the attempts of a retry
+    :param isos: (optional) a :class:`~graphwfc.frontier.LazyIsos` to take the isos of the regions from
+    :return: the colors of the free nodes of the first successful retry, or None, and the region of the last retry
+    """
+    region = None
+    for retry in range(first_retry, retries + 1):
+        region, region_GO, free = _retry_region(GO, nodes, colors, given, overlap, diameter, retry,
+                                                state_kwargs['node_attr'])
+        solved = _solve_region(region_GO, free, seeds_per_retry(retry), run_kwargs, state_kwargs,
+                               GO_isos_per_GL=None if isos is None else isos.region_isos(region))
+        if solved is not None:
+            return solved, region
+    return None, region
+
+
+def _init_worker(state_kwargs):
+    global _worker_state_kwargs
+    _worker_state_kwargs = state_kwargs
+
+
+def _solve_region(region_GO, free, seeds, run_kwargs, state_kwargs, GO_isos_per_GL=None):
+    """runs the attempts on a region until one succeeds, returns the colors of the free nodes or None"""
+    try:
+        state = GraphWFCState(GO=region_GO, GO_isos_per_GL=GO_isos_per_GL, seed=seeds[0], **state_kwargs)
+    except ValueError:
+        # the fixed colors around the tile already contradict each other
+        return None
+    for attempt, seed in enumerate(seeds):
+        if attempt > 0:
+            state.reset(seed)
+        if state.run(**run_kwargs):
+            # nodes in no iso have no color
+            color_per_node = dict(zip(*state.colors()))
+            return {node: color_per_node[node] for node in free if color_per_node[node] is not None}
+    return None
+
+
+def _solve_tile(task):
+    """runs the attempts of a tile until one succeeds, returns the colors of the free nodes or None"""
+    tile_id, region_GO, free, seeds, run_kwargs = task
+    return tile_id, _solve_region(region_GO, free, seeds, run_kwargs, _worker_state_kwargs)
+
+
+def run_tiled(GO, tiles, GI=None, GLs=None, pattern_count_per_GL=None, node_attr='color', edge_attr='type',
+              overlap=None, attempts=10, retries=3, processes=1, seed=None, compact=False, unique=False,
+              cache_dir=None, **run_kwargs):
+    """colors GO one tile after another, see :mod:`graphwfc.tiled`
+
+    Colors that GO already has are kept. The tiles are solved in rounds, the tiles of a round don't reach into each
+    other's regions and are solved at the same time if processes > 1. Tiles that failed are retried after their
+    round one by one. Every retry solves the tile in a region reaching twice as far as the one before, with all
+    colors in it freed but those less than diameter edges from its border.
+
+    :param GO: the output graph to be colored
+    :param tiles: the nodes of GO split into tiles, e.g. by :func:`grid_tiles` or :func:`bfs_tiles`
+    :param GI: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param GLs: see :class:`~graphwfc.GraphWFCState.GraphWFCState`, needed to find the isos of every region
+    :param pattern_count_per_GL: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param node_attr: the name of the node attribute used as color
+    :param edge_attr: the name of the edge attribute used to distinguish between edges
+    :param overlap: how many edges the region of a tile reaches beyond it. It has to be at least the diameter of
+            every GL, by default it is four times the largest diameter, so that a tile can look ahead
+    :param attempts: the maximum amount of attempts per tile and retry
+    :param retries: how often a failed tile is retried with a wider area freed before the run fails
+    :param processes: the amount of tiles solved at the same time, all CPUs if None
+    :param seed: the seed of the first attempt of the first tile, the n-th attempt of the t-th tile uses
+            seed + t * attempts + n, of its r-th retry seed + (r * len(tiles) + t) * attempts + n.
+            Random if not given
+    :param compact: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param unique: see :class:`~graphwfc.GraphWFCState.GraphWFCState`
+    :param cache_dir: (optional) a directory to cache the patterns of GI in or an :class:`~graphwfc.cache.IsoCache`.
+            The isos of the regions are found again every time, each region is only used once
+    :param run_kwargs: passed to :func:`~graphwfc.GraphWFCState.GraphWFCState.run`, e.g. max_backtracks
+    :return: a dict with the color of every node in an iso or None if a tile couldn't be solved in any retry
+    """
+    assert GLs is not None
+    diameter = max(nx.diameter(GL.to_undirected()) if len(GL) > 1 else 0 for GL in GLs)
+    if overlap is None:
+        overlap = 4 * diameter
+    assert overlap >= diameter, 'the regions have to reach as far as the GLs'
+    if pattern_count_per_GL is None:
+        pattern_count_per_GL = get_patterns(GI=GI, GLs=GLs, node_attr=node_attr, edge_attr=edge_attr,
+                                            cache_dir=cache_dir)
+    state_kwargs = dict(GLs=GLs, pattern_count_per_GL=pattern_count_per_GL, node_attr=node_attr,
+                        edge_attr=edge_attr, compact=compact, unique=unique)
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    # tiles conflict if the region of one reaches into the other, tiles of the same color can be solved together
+    tile_ids = {node: tile_id for tile_id, tile in enumerate(tiles) for node in tile}
+    conflicts = nx.Graph()
+    conflicts.add_nodes_from(range(len(tiles)))
+    for tile_id, tile in enumerate(tiles):
+        conflicts.add_edges_from((tile_id, tile_ids[node]) for node in _region(GO, tile, overlap)
+                                 if node in tile_ids and tile_ids[node] != tile_id)
+    round_per_tile = nx.greedy_color(conflicts, strategy='largest_first')
+    rounds = [[] for _ in range(max(round_per_tile.values(), default=-1) + 1)]
+    for tile_id in range(len(tiles)):
+        rounds[round_per_tile[tile_id]].append(tile_id)
+
+    given = {node: color for node, color in GO.nodes(data=node_attr) if color is not None}
+    colors = dict(given)
+
+    def seeds(tile_id, retry):
+        first_seed = seed + (retry * len(tiles) + tile_id) * attempts
+        return [first_seed + attempt for attempt in range(attempts)]
+
+    def tasks(tile_ids):
+        for tile_id in tile_ids:
+            _, region_GO, free = _retry_region(GO, tiles[tile_id], colors, given, overlap, diameter, 0, node_attr)
+            yield tile_id, region_GO, free, seeds(tile_id, 0), run_kwargs
+
+    # the failed tiles are solved again by this process
+    _init_worker(state_kwargs)
+    with _fork_pool(processes, _init_worker, state_kwargs) if processes != 1 else nullcontext() as pool:
+        for tile_ids_of_round in rounds:
+            if pool is None:
+                solved = map(_solve_tile, tasks(tile_ids_of_round))
+            else:
+                solved = pool.imap_unordered(_solve_tile, tasks(tile_ids_of_round))
+            # the colors of a round are only added after it, so the regions of a round don't change during it
+            round_colors = dict()
+            failed = list()
+            for tile_id, tile_colors in solved:
+                if tile_colors is None:
+                    failed.append(tile_id)
+                else:
+                    round_colors.update(tile_colors)
+            colors.update(round_colors)
+            # usually the colors around a failed tile don't fit together, they are freed and solved with the tile.
+            # The freed nodes may lie in other regions of the round, so this happens one tile after another.
+            for tile_id in sorted(failed):
+                tile_colors, _ = _solve_retries(GO, tiles[tile_id], colors, given, overlap, diameter, retries,
+                                                partial(seeds, tile_id), run_kwargs, state_kwargs)
+                if tile_colors is None:
+                    if __debug__:
+                        print('tile ' + str(tile_id) + ' failed')
+                    return None
+                colors.update(tile_colors)
+    return colors
@@ -9,6 +9,7 @@ setup(
     packages=['graphwfc',],
     install_requires=[
           'networkx<=2.4',
+          'numpy',
       ],
     python_requires=">=3.0",
     url='https://github.com/lamelizard/GraphWaveFunctionCollapse',
@@ -0,0 +1,425 @@
+import collections
+import copy
+import importlib
+import itertools
+import math
+import os
+import random
+import unittest
+from unittest import mock
+import networkx as nx
+from graphwfc.GraphWFCState import GraphWFCState
+from graphwfc.helpers import get_isos, get_patterns
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+
+def read_example(name):
+    return [nx.read_graphml(os.path.join(EXAMPLES_DIR, name, file_name + '.graphml'))
+            for file_name in ('GI', 'GL', 'GO')]
+
+
+def wrong_supports(state):
+    """returns the isos whose support counters differ from those counted from their remaining patterns"""
+    wrong = list()
+    for GL_id, supports in enumerate(state._supports_per_GL):
+        support_count = len(state._initial_supports_per_GL[GL_id])
+        for iso_id in range(state._iso_counts_per_GL[GL_id]):
+            expected = [0] * support_count
+            for pattern_id in state._domain.ids(state._patterns_per_GL_per_iso[GL_id][iso_id]):
+                for support in state._pattern_supports_per_GL[GL_id][pattern_id]:
+                    expected[support] += 1
+            if list(supports[iso_id * support_count:(iso_id + 1) * support_count]) != expected:
+                wrong.append((GL_id, iso_id))
+    return wrong
+
+
+def snapshot(state):
+    """returns copies of the colors per node, patterns per iso and support counters"""
+    return (list(state._values_per_node), [list(iso_patterns) for iso_patterns in state._patterns_per_GL_per_iso],
+            [list(supports) for supports in state._supports_per_GL], list(state._color_per_node))
+
+
+def domains(state):
+    """returns the ids of the possible colors per node and of the possible patterns per iso"""
+    return ([state._domain.ids(values) for values in state._values_per_node],
+            [[state._domain.ids(patterns) for patterns in iso_patterns]
+             for iso_patterns in state._patterns_per_GL_per_iso])
+
+
+def arc_consistent(state, values_per_node, patterns_per_GL_per_iso):
+    """removes the colors and patterns that are impossible by looking at every iso until nothing changes
+
+    This is the fixpoint the propagation of GraphWFCState has to arrive at, the domains are given as lists of ids.
+    """
+    values_per_node = [set(values) for values in values_per_node]
+    patterns_per_GL_per_iso = [[set(patterns) for patterns in iso_patterns]
+                               for iso_patterns in patterns_per_GL_per_iso]
+    changed = True
+    while changed:
+        changed = False
+        for GL_id, iso_patterns in enumerate(patterns_per_GL_per_iso):
+            size = state._GL_sizes[GL_id]
+            patterns = [[state._color_ids[color] for color in pattern] for pattern in state._patterns_per_GL[GL_id]]
+            for iso_id, pattern_ids in enumerate(iso_patterns):
+                nodes = state._iso_nodes_per_GL[GL_id][iso_id * size:(iso_id + 1) * size]
+                kept = {pattern_id for pattern_id in pattern_ids
+                        if all(color in values_per_node[node] for node, color in zip(nodes, patterns[pattern_id]))}
+                if kept != pattern_ids:
+                    iso_patterns[iso_id] = kept
+                    changed = True
+                for position, node in enumerate(nodes):
+                    supported = values_per_node[node] & {patterns[pattern_id][position] for pattern_id in kept}
+                    if supported != values_per_node[node]:
+                        values_per_node[node] = supported
+                        changed = True
+    return ([sorted(values) for values in values_per_node],
+            [[sorted(patterns) for patterns in iso_patterns] for iso_patterns in patterns_per_GL_per_iso])
+
+
+class TestDomains(unittest.TestCase):
+    def test_set_and_bitset_agree(self):
+        for name in ('atlas', 'starcave'):
+            GI, GL, GO = read_example(name)
+            states = [GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', compact=compact, seed=0)
+                      for compact in (False, True)]
+            self.assertEqual(domains(states[0]), domains(states[1]), name)
+            for seed in (1, 2, 3):
+                results = list()
+                for state in states:
+                    state.reset(seed)
+                    results.append((state.run(max_backtracks=20), state.colors(), state.backtrack_count,
+                                    domains(state)))
+                self.assertEqual(results[0], results[1], name + ' seed ' + str(seed))
+
+    def test_propagation_is_arc_consistency(self):
+        GI, GL, GO = read_example('atlas')
+        state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', seed=0)
+        self.assertTrue(state.run())
+        GO_colored = GO.copy()
+        nodes, colors = state.colors()
+        nx.set_node_attributes(GO_colored, dict(list(zip(nodes, colors))[::10]), 'value')
+        for compact in (False, True):
+            state = GraphWFCState(GO=GO_colored, GI=GI, GLs=[GL], node_attr='value', compact=compact, seed=1)
+            # the construction starts with all colors for uncolored nodes and all patterns for every iso
+            values_per_node, patterns_per_GL_per_iso = domains(state)
+            values_per_node = [values if state._nodes[node] in state.invisible_nodes
+                               else [state._color_ids[GO_colored.nodes[state._nodes[node]]['value']]]
+                               if 'value' in GO_colored.nodes[state._nodes[node]] else list(range(len(state._colors)))
+                               for node, values in enumerate(values_per_node)]
+            patterns_per_GL_per_iso = [[list(range(len(state._patterns_per_GL[GL_id])))] * len(iso_patterns)
+                                       for GL_id, iso_patterns in enumerate(patterns_per_GL_per_iso)]
+            self.assertEqual(domains(state), arc_consistent(state, values_per_node, patterns_per_GL_per_iso))
+            iso_ids = [{state._iso(GL_id, iso_id): iso_id for iso_id in range(iso_count)}
+                       for GL_id, iso_count in enumerate(state._iso_counts_per_GL)]
+            before = domains(state)
+            for step in itertools.islice(state.steps(max_backtracks=5), 60):
+                if step.GL_id is not None and not step.backtracked:
+                    # an observation leaves one pattern in its iso
+                    values_per_node, patterns_per_GL_per_iso = before
+                    patterns_per_GL_per_iso[step.GL_id][iso_ids[step.GL_id][step.iso]] = \
+                        [state._patterns_per_GL[step.GL_id].index(step.pattern)]
+                    self.assertEqual(domains(state), arc_consistent(state, values_per_node, patterns_per_GL_per_iso))
+                before = domains(state)
+                self.assertEqual(before, arc_consistent(state, *before))
+
+
+class TestConstruction(unittest.TestCase):
+    def test_chunked_waves_give_the_same_state(self):
+        for name in ('atlas', 'starcave'):
+            GI, GL, GO = read_example(name)
+            state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', seed=0)
+            self.assertTrue(state.run(max_backtracks=10))
+            nodes, colors = state.colors()
+            GO_colored = GO.copy()
+            nx.set_node_attributes(GO_colored, dict(list(zip(nodes, colors))[::7]), 'value')
+            states = list()
+            for wave_chunk in (1 << 16, 5):
+                with mock.patch.object(importlib.import_module('graphwfc.GraphWFCState'), '_WAVE_CHUNK', wave_chunk):
+                    states.append(GraphWFCState(GO=GO_colored, GI=GI, GLs=[GL], node_attr='value', seed=0))
+            self.assertEqual(*[(snapshot(state), domains(state), [list(sums) for sums in state._weight_sums_per_GL],
+                                state._entropy_heap) for state in states])
+
+    def test_contradiction_is_reported_at_a_node(self):
+        GI, GL, GO = read_example('starcave')
+        colors = sorted({color for _, color in GI.nodes(data='value')})
+        for seed in range(4):
+            randomness = random.Random(seed)
+            GO_colored = GO.copy()
+            nx.set_node_attributes(GO_colored, {node: randomness.choice(colors) for node in
+                                                randomness.sample(sorted(GO.nodes()), 5 * (seed + 1))}, 'value')
+            with self.assertRaises(ValueError) as raised:
+                GraphWFCState(GO=GO_colored, GI=GI, GLs=[GL], node_attr='value')
+            self.assertIn(str(raised.exception).rsplit('at: ', 1)[1], GO.nodes())
+
+
+class TestWaves(unittest.TestCase):
+    def test_waves_give_the_same_state_as_single_removals(self):
+        def state_numbers(state):
+            return (domains(state), [list(supports) for supports in state._supports_per_GL],
+                    list(state._color_per_node), [[round(weight_sum, 6) for weight_sum in sums]
+                                                  for sums in state._weight_sums_per_GL],
+                    {entropy: sorted(isos) for entropy, isos in state._isos_per_entropy.items()})
+
+        module = importlib.import_module('graphwfc.GraphWFCState')
+        for name in ('atlas', 'starcave'):
+            GI, GL, GO = read_example(name)
+            for compact in (False, True):
+                state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', compact=compact, seed=0)
+                state._trail = []
+                # one state propagates every removed color on its own, the other one in waves after the first
+                states = (state, copy.deepcopy(state))
+                randomness = random.Random(0)
+                contradictions = 0
+                for _ in range(60):
+                    iso_patterns = state._patterns_per_GL_per_iso[0]
+                    undecided_isos = [iso_id for iso_id, patterns in enumerate(iso_patterns)
+                                      if state._domain.count(patterns) > 1]
+                    if not undecided_isos:
+                        break
+                    iso_id = randomness.choice(undecided_isos)
+                    pattern_id = randomness.choice(state._domain.ids(iso_patterns[iso_id]))
+                    results = list()
+                    for wave_threshold, state in zip((1 << 30, 1), states):
+                        trail_length = len(state._trail)
+                        before = state_numbers(state)
+                        with mock.patch.object(module, '_WAVE_THRESHOLD', wave_threshold):
+                            try:
+                                state._remove_patterns(0, iso_id, state._domain.difference(
+                                    state._patterns_per_GL_per_iso[0][iso_id], state._domain.single(pattern_id)))
+                                state._propagate()
+                            except module._Contradiction:
+                                # the trail has to undo a contradiction in the waves too
+                                state._undo(trail_length)
+                                self.assertEqual(state_numbers(state), before, name)
+                                results.append(None)
+                                continue
+                        results.append(state_numbers(state))
+                        self.assertEqual(wrong_supports(state), [], name)
+                    self.assertEqual(*results, name)
+                    contradictions += results[0] is None
+                self.assertGreater(contradictions, 0, name)
+
+    def test_runs_with_waves_are_arc_consistent(self):
+        GI, GL, GO = read_example('starcave')
+        state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', seed=0)
+        fresh_domains = domains(state)
+        pattern_count_per_GL = get_patterns(GI=GI, GLs=[GL], node_attr='value')
+        backtrack_count = 0
+        with mock.patch.object(importlib.import_module('graphwfc.GraphWFCState'), '_WAVE_THRESHOLD', 1):
+            for seed in (1, 2, 3):
+                state.reset(seed)
+                self.assertEqual(domains(state), fresh_domains)
+                for step in state.steps(max_backtracks=20):
+                    current_domains = domains(state)
+                    if step.result is not False:
+                        self.assertEqual(current_domains, arc_consistent(state, *current_domains))
+                self.assertTrue(step.result)
+                self.assertEqual(wrong_supports(state), [])
+                backtrack_count += state.backtrack_count
+                for iso in get_isos(state.GO, [GL])[0]:
+                    self.assertIn(tuple(state.GO.nodes[node]['value'] for node in iso), pattern_count_per_GL[0])
+        self.assertGreater(backtrack_count, 0)
+
+
+class TestObservation(unittest.TestCase):
+    def test_observes_an_iso_with_the_lowest_entropy(self):
+        GI, GL, GO = read_example('atlas')
+        counted_patterns = get_patterns(GI=GI, GLs=[GL], node_attr='value')[0]
+        isos = get_isos(GO, [GL])[0]
+        state = GraphWFCState(GO=GO, GLs=[GL], pattern_count_per_GL=[counted_patterns], GO_isos_per_GL=[isos],
+                              node_attr='value', seed=0)
+
+        def entropy(iso):
+            # the patterns left in an iso are those that fit the colors left at its nodes
+            possible_colors = [set(state.possible_colors(node)) for node in iso]
+            weights = [count for pattern, count in counted_patterns.items()
+                       if all(color in colors for color, colors in zip(pattern, possible_colors))]
+            if len(weights) <= 1:
+                return 0
+            return math.log(sum(weights)) - sum(weight * math.log(weight) for weight in weights) / sum(weights)
+
+        steps = state.steps()
+        for _ in range(30):
+            # the entropies before the step, the iso is observed before the step is yielded
+            entropies = [entropy(iso) for iso in isos]
+            step = next(steps)
+            if step.result is not None:
+                break
+            self.assertAlmostEqual(entropies[isos.index(step.iso)], min(entropy for entropy in entropies if entropy > 0),
+                                   places=6)
+
+    def test_patterns_are_chosen_by_their_weights(self):
+        GI = nx.path_graph(4)
+        nx.set_node_attributes(GI, {0: 'b', 1: 'b', 2: 'r', 3: 'y'}, 'c')
+        counted_patterns = get_patterns(GI=GI, GLs=[nx.path_graph(2)], node_attr='c')[0]
+        state = GraphWFCState(GO=nx.path_graph(2), GLs=[nx.path_graph(2)], pattern_count_per_GL=[counted_patterns],
+                              node_attr='c', seed=0)
+        chosen = collections.Counter()
+        for seed in range(3000):
+            state.reset(seed)
+            self.assertIsNot(state.run(iter=1), False)
+            chosen[tuple(state.colors()[1])] += 1
+        for pattern, count in counted_patterns.items():
+            self.assertAlmostEqual(chosen[pattern] / 3000, count / sum(counted_patterns.values()), delta=0.03)
+
+
+class TestBacktracking(unittest.TestCase):
+    def test_supports_after_backtracks(self):
+        for name in ('maze', 'starcave'):
+            GI, GL, GO = read_example(name)
+            for compact in (False, True):
+                state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', compact=compact, seed=0)
+                backtrack_count = 0
+                for seed in (1, 2):
+                    state.reset(seed)
+                    state.run(max_backtracks=200)
+                    backtrack_count += state.backtrack_count
+                    self.assertEqual(wrong_supports(state), [], name + ' seed ' + str(seed))
+                # the seeds are chosen so that there is something to undo
+                self.assertGreater(backtrack_count, 0, name)
+
+
+class TestSteps(unittest.TestCase):
+    def test_deltas_replay_the_colors(self):
+        GI, GL, GO = read_example('starcave')
+        state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', seed=0)
+        results = collections.Counter()
+        for max_backtracks in (0, 5):
+            for seed in range(8):
+                state.reset(seed)
+                colors = dict(zip(*state.colors()))
+                for step in state.steps(max_backtracks=max_backtracks):
+                    colors.update(step.colors)
+                results[max_backtracks, step.result] += 1
+                # also after a contradiction that left removed colors unpropagated
+                self.assertEqual(colors, dict(zip(*state.colors())), (max_backtracks, seed))
+        self.assertGreater(results[0, False], 0)
+        self.assertGreater(results[5, True], 0)
+
+
+class TestReset(unittest.TestCase):
+    def test_reset_gives_the_state_after_the_construction(self):
+        def state_numbers(state):
+            return (snapshot(state), [list(sums) for sums in state._weight_sums_per_GL],
+                    [list(sums) for sums in state._weight_log_sums_per_GL],
+                    [list(entropies) for entropies in state._iso_entropies_per_GL],
+                    [list(positions) for positions in state._iso_entropy_positions_per_GL],
+                    {entropy: list(isos) for entropy, isos in state._isos_per_entropy.items()},
+                    sorted(set(state._entropy_heap) & state._isos_per_entropy.keys()))
+
+        for name in ('maze', 'starcave'):
+            GI, GL, GO = read_example(name)
+            nodes = list(GO.nodes())
+            GO_colored = GO.copy()
+            # some colors of GO, so that the construction already changes some isos
+            state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', seed=0)
+            self.assertTrue(state.run(max_backtracks=50))
+            nx.set_node_attributes(GO_colored, {node: state.GO.nodes[node]['value'] for node in nodes[::13]}, 'value')
+            for compact in (False, True):
+                state = GraphWFCState(GO=GO_colored, GI=GI, GLs=[GL], node_attr='value', compact=compact, seed=0)
+                fresh_numbers = state_numbers(state)
+                results = list()
+                for seed, iterations in ((1, 3), (2, -1), (3, -1)):
+                    state.reset(seed)
+                    self.assertEqual(state_numbers(state), fresh_numbers, name)
+                    results.append((state.run(iter=iterations, max_backtracks=10), state.colors()[1].copy()))
+                fresh_state = GraphWFCState(GO=GO_colored, GI=GI, GLs=[GL], node_attr='value', compact=compact,
+                                            seed=3)
+                self.assertEqual((fresh_state.run(max_backtracks=10), fresh_state.colors()[1]), results[-1], name)
+
+
+class TestResolve(unittest.TestCase):
+    def test_failed_resolve_changes_nothing(self):
+        GI, GL, GO = read_example('starcave')
+        state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', seed=1)
+        self.assertTrue(state.run(max_backtracks=10))
+        nodes, colors = state.colors()
+        failures = 0
+        for node, color in list(zip(nodes, colors))[::20]:
+            if color is None:
+                continue
+            for other_color in state._colors:
+                if other_color == color:
+                    continue
+                before = snapshot(state)
+                state.pin({node: other_color})
+                # without hops only the node is freed, so most pins contradict its neighbors
+                resolved = state.resolve([node], hops=0)
+                state.unpin([node])
+                if resolved:
+                    break
+                failures += 1
+                self.assertEqual(snapshot(state), before, str(node))
+        self.assertGreater(failures, 0)
+        self.assertEqual(wrong_supports(state), [])
+
+    def test_nogoods_are_not_used_after_a_pin_replaced_a_color_of_GO(self):
+        def color_GO(state):
+            for seed in range(10):
+                state.reset(seed)
+                if state.run(max_backtracks=20):
+                    return
+            self.fail('GO was not colored')
+
+        GI, GL, GO = read_example('starcave')
+        state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', seed=1)
+        self.assertTrue(state.run(max_backtracks=10))
+        given_colors = {node: color for node, color in list(zip(*state.colors()))[::7]}
+        GO_colored = GO.copy()
+        nx.set_node_attributes(GO_colored, given_colors, 'value')
+        state = GraphWFCState(GO=GO_colored, GI=GI, GLs=[GL], node_attr='value', seed=0)
+        for seed in range(12):
+            state.reset(seed)
+            if not state.run():
+                state.learn_nogood()
+        self.assertGreater(len(state.nogoods), 0)
+        with mock.patch.object(GraphWFCState, '_nogood_patterns', autospec=True,
+                               side_effect=GraphWFCState._nogood_patterns) as nogood_patterns:
+            for node, color in list(given_colors.items())[::40]:
+                other_color = next(other_color for other_color in state._colors if other_color != color)
+                for pinned_color, nogoods_used in ((color, True), (other_color, False)):
+                    color_GO(state)
+                    without_nogoods = copy.deepcopy(state)
+                    without_nogoods._nogoods_per_iso.clear()
+                    state.pin({node: pinned_color})
+                    without_nogoods.pin({node: pinned_color})
+                    nogood_patterns.reset_mock()
+                    resolved = state.resolve([node], hops=len(GO), max_backtracks=5)
+                    self.assertEqual(nogood_patterns.called, nogoods_used, str(node))
+                    if not nogoods_used:
+                        # the pin replaced the color of the input GO, resolve() works as if nothing was learned
+                        self.assertEqual(resolved, without_nogoods.resolve([node], hops=len(GO), max_backtracks=5))
+                        self.assertEqual(state.colors(), without_nogoods.colors(), str(node))
+                    # nogoods learned while a node is pinned are learned with the input GO too
+                    state.reset(1)
+                    if not state.run():
+                        state.learn_nogood()
+                    state.unpin([node])
+            # after a reset the nogoods are used again and the input GO can still be colored
+            nogood_patterns.reset_mock()
+            color_GO(state)
+            self.assertTrue(nogood_patterns.called)
+        colors = dict(zip(*state.colors()))
+        self.assertEqual({node: colors[node] for node in given_colors}, given_colors)
+        self.assertEqual(wrong_supports(state), [])
+
+
+class TestGO(unittest.TestCase):
+    def test_every_attempt_gets_its_own_GO(self):
+        GI, GL, GO = read_example('beach')
+        state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', seed=0)
+        outputs = list()
+        for seed in range(3):
+            state.reset(seed)
+            if state.run(max_backtracks=10):
+                outputs.append((state.GO, dict(state.GO.nodes(data='value'))))
+        self.assertGreater(len(outputs), 1)
+        self.assertIsNot(outputs[0][0], outputs[1][0])
+        for output, colors in outputs:
+            self.assertEqual(dict(output.nodes(data='value')), colors)
+        self.assertNotEqual(outputs[0][1], outputs[1][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
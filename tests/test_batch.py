@@ -0,0 +1,53 @@
+import json
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import unittest
+import networkx as nx
+from graphwfc.batch import start_pool, solve_lines
+from graphwfc.helpers import get_patterns
+
+
+class TestBatch(unittest.TestCase):
+    def solve(self, pool, lines):
+        """returns the results of solve_lines as dicts, kills a worker at the first result if kill is set"""
+        results = list()
+
+        def write(result_line):
+            if self.kill and not results:
+                os.kill(multiprocessing.active_children()[0].pid, signal.SIGKILL)
+            results.append(json.loads(result_line))
+
+        thread = threading.Thread(target=solve_lines, args=(pool, lines, write), daemon=True)
+        thread.start()
+        thread.join(120)
+        self.assertFalse(thread.is_alive(), 'solve_lines hangs')
+        self.assertEqual(sorted(result['id'] for result in results), list(range(len(lines))))
+        return results
+
+    def test_killed_worker(self):
+        GI = nx.path_graph(12)
+        nx.set_node_attributes(GI, {node: node % 3 for node in GI.nodes()}, 'value')
+        GL = nx.path_graph(2)
+        with tempfile.TemporaryDirectory() as directory:
+            GO_path = os.path.join(directory, 'GO.graphml')
+            nx.write_graphml(nx.path_graph(300), GO_path)
+            lines = [json.dumps({'id': job_id, 'GO': GO_path, 'seed': job_id}) for job_id in range(8)]
+            with start_pool([GL], get_patterns(GI=GI, GLs=[GL], node_attr='value'), node_attr='value',
+                            processes=2) as pool:
+                self.kill = False
+                self.assertEqual({result['status'] for result in self.solve(pool, lines[:2])}, {'success'})
+                # an idle worker dies, the jobs get new workers
+                os.kill(multiprocessing.active_children()[0].pid, signal.SIGKILL)
+                self.assertEqual({result['status'] for result in self.solve(pool, lines)}, {'success'})
+                # a worker dies while jobs are solved, they are solved again
+                self.kill = True
+                self.assertEqual({result['status'] for result in self.solve(pool, lines)}, {'success'})
+                self.kill = False
+                self.assertEqual({result['status'] for result in self.solve(pool, lines)}, {'success'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from graphwfc.bench import get_cases, run_case, run_benchmark, compare
+
+
+class TestBench(unittest.TestCase):
+    def test_run_case_measures_a_tree(self):
+        metrics = run_case('tree', 300, seeds=3, max_backtracks=5)
+        self.assertEqual(metrics['nodes'], 300)
+        # an undirected edge is matched both ways, the README's GI has 3 edges with 5 different patterns
+        self.assertEqual(metrics['isos'], 2 * 299)
+        self.assertEqual(metrics['patterns'], 5)
+        # a tree can always be colored
+        self.assertEqual(metrics['success_rate'], 1)
+        for metric in ('patterns_time', 'isos_time', 'construct_time', 'reset_time', 'run_time'):
+            self.assertGreaterEqual(metrics[metric], 0, metric)
+        self.assertGreater(metrics['peak_memory_bytes'], 0)
+
+    def test_every_case_gets_its_own_peak_memory(self):
+        cases = get_cases(kinds=('tree', 'regular'), sizes=(200,))
+        self.assertEqual([name for name, kind, parameter in cases], ['tree-200', 'regular-200'])
+        results = run_benchmark(cases, seeds=2, verbose=False)
+        for name in ('tree-200', 'regular-200'):
+            # the peak of each process, at least the interpreter
+            self.assertGreater(results['cases'][name]['peak_memory_bytes'], 1 << 20, name)
+
+    def test_compare_finds_regressions(self):
+        old = {'cases': {'a': {'run_time': 1.0, 'construct_time': 0.001, 'peak_memory_bytes': 100 << 20,
+                               'success_rate': 1.0},
+                         'b': {'run_time': 1.0, 'success_rate': 1.0}}}
+        new = {'cases': {'a': {'run_time': 1.1, 'construct_time': 0.005, 'peak_memory_bytes': 150 << 20,
+                               'success_rate': 0.6},
+                         'b': {'run_time': 2.0, 'success_rate': 1.0},
+                         'c': {'run_time': 9.0, 'success_rate': 0.0}}}
+        # 10% slower and a few milliseconds are noise, a case without old results can't regress
+        self.assertEqual(compare(old, new), ['a peak_memory_bytes: 1.049e+08 -> 1.573e+08',
+                                             'a success_rate: 100% -> 60%', 'b run_time: 1 -> 2'])
+        self.assertEqual(compare(new, old), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+import networkx as nx
+from graphwfc.binary import read_gwfc, write_gwfc, write_colors
+from graphwfc.lattice import Lattice
+from test_GraphWFCState import read_example
+
+
+def graphs():
+    """yields graphs with different kinds of labels and attributes, some missing"""
+    GI, GL, GO = read_example('beach')
+    yield 'beach GI', GI
+    yield 'beach GO', GO
+    grid = Lattice.grid((4, 5), types=(1, 3), directed=False).graph()
+    nx.set_node_attributes(grid, {node: float(sum(node)) for node in list(grid.nodes())[::2]}, 'value')
+    yield 'undirected grid', grid
+    sites = Lattice((3, 3), [(0, 1, (0, 0)), (1, 0, (1, 0), {'type': 'down'})], sites=2).graph()
+    nx.set_node_attributes(sites, {node: str(node) for node in sites.nodes()}, 'value')
+    yield 'lattice with sites', sites
+    edgeless = nx.Graph()
+    edgeless.add_nodes_from([3, 1, 2])
+    yield 'edgeless', edgeless
+    mixed = nx.path_graph(['a', 1, 2.5, True, None, (1, 2)])
+    nx.set_node_attributes(mixed, dict(zip(mixed.nodes(), [True, 1, 1.0, None, 'x', (0, 1)])), 'value')
+    nx.set_edge_attributes(mixed, dict(zip(mixed.edges(), [False, True, False, None, 'y'])), 'type')
+    yield 'mixed', mixed
+    flags = nx.path_graph(3)
+    nx.set_node_attributes(flags, {0: True, 2: False}, 'value')
+    yield 'bools, one missing', flags
+    yield 'empty', nx.DiGraph()
+
+
+class TestGwfc(unittest.TestCase):
+    def assert_graphs_equal(self, G, read, name):
+        self.assertEqual(read.is_directed(), G.is_directed(), name)
+        # with the types, since True == 1 == 1.0
+        self.assertEqual([(node, type(node), value, type(value)) for node, value in read.nodes(data='value')],
+                         [(node, type(node), value, type(value)) for node, value in G.nodes(data='value')], name)
+        self.assertEqual([(u, v, value, type(value)) for u, v, value in read.edges(data='type')],
+                         [(u, v, value, type(value)) for u, v, value in G.edges(data='type')], name)
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'G.gwfc')
+            for name, G in graphs():
+                write_gwfc(G, path, node_attr='value', edge_attr='type')
+                for mmap in (False, True):
+                    read = read_gwfc(path, mmap=mmap)
+                    self.assert_graphs_equal(G, read, name)
+                    # other attributes are dropped
+                    for _, attributes in read.nodes(data=True):
+                        self.assertLessEqual(set(attributes), {'value'})
+                    for _, _, attributes in read.edges(data=True):
+                        self.assertLessEqual(set(attributes), {'type'})
+
+    def test_value_that_does_not_read_back(self):
+        G = nx.Graph()
+        G.add_nodes_from([(0, {'value': 1}), (1, {'value': object()})])
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(TypeError):
+                write_gwfc(G, os.path.join(directory, 'G.gwfc'), node_attr='value')
+
+    def test_colors_only(self):
+        GI, GL, GO = read_example('beach')
+        colors = dict(GI.nodes(data='value'))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'colors.gwfc')
+            write_colors(colors, path, node_attr='value')
+            read = read_gwfc(path)
+            self.assertEqual(dict(read.nodes(data='value')), colors)
+            self.assertEqual(read.number_of_edges(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+import networkx as nx
+from graphwfc.cache import IsoCache
+from graphwfc.helpers import get_isos
+
+
+class TestIsoCache(unittest.TestCase):
+    def test_entry_bigger_than_max_size(self):
+        GB = nx.path_graph(50)
+        GL = nx.path_graph(2)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = IsoCache(cache_dir, max_size=100)
+            for attempt in range(2):
+                iso_arrays = cache.load_iso_arrays(GB, [GL])
+                self.assertEqual([tuple(iso) for iso in iso_arrays[0].tolist()], get_isos(GB, [GL])[0])
+
+    def test_evicted_entry_is_computed_again(self):
+        GB = nx.path_graph(10)
+        GLs = [nx.path_graph(2), nx.path_graph(3)]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = IsoCache(cache_dir)
+            expected = cache.get_isos(GB, GLs)
+            for file_name in os.listdir(cache_dir):
+                os.remove(os.path.join(cache_dir, file_name))
+            self.assertEqual(cache.get_isos(GB, GLs), expected)
+            nx.set_node_attributes(GB, {node: node % 3 for node in GB.nodes()}, 'c')
+            expected = cache.get_patterns(GB, GLs, node_attr='c')
+            for file_name in os.listdir(cache_dir):
+                os.remove(os.path.join(cache_dir, file_name))
+            self.assertEqual(cache.get_patterns(GB, GLs, node_attr='c'), expected)
+
+    def test_max_size_of_a_cache_given_as_cache_dir(self):
+        GLs = [nx.path_graph(2)]
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for size in (10, 20):
+                get_isos(nx.path_graph(size), GLs, cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = IsoCache(cache_dir, max_size=100)
+            for size in (10, 20):
+                self.assertEqual(get_isos(nx.path_graph(size), GLs, cache_dir=cache),
+                                 get_isos(nx.path_graph(size), GLs))
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
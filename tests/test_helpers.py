@@ -0,0 +1,145 @@
+import unittest
+import networkx as nx
+from graphwfc import helpers
+from graphwfc.GraphWFCState import GraphWFCState
+from graphwfc.helpers import get_isos, get_iso_arrays, get_patterns, PatternCounter, _iso_finder, _iter_isos_vf2, \
+    _iter_isos_of_edge, _iter_isos_along_edges, _fork_pool
+from test_GraphWFCState import read_example
+
+# what the workers of a _fork_pool in TestForkPool were initialized with
+_worker_value = None
+
+
+def _set_worker_value(value):
+    global _worker_value
+    _worker_value = value
+
+
+def _get_worker_value(_):
+    return _worker_value
+
+
+def graphs():
+    """yields GBs with GLs that are matched without VF2, from the examples and some small generated ones"""
+    for name in ('atlas', 'beach', 'starcave'):
+        GI, GL, GO = read_example(name)
+        yield name + ' GI', GI, GL
+        yield name + ' GO', GO, GL
+    grid = nx.grid_2d_graph(6, 7)
+    yield 'grid path', grid, nx.path_graph(3)
+    yield 'grid square', grid, nx.cycle_graph(4)
+    yield 'grid edge', grid, nx.path_graph(2)
+    directed = nx.DiGraph(nx.gnp_random_graph(30, 0.15, seed=0, directed=True))
+    typed = directed.copy()
+    nx.set_edge_attributes(typed, {edge: sum(edge) % 2 for edge in typed.edges()}, 'type')
+    edge = nx.DiGraph([(0, 1)])
+    edge.edges[0, 1]['type'] = 1
+    yield 'typed edge', typed, edge
+    yield 'directed reversed edge', directed, nx.DiGraph([(1, 0)])
+    yield 'directed path', directed, nx.DiGraph([(0, 1), (2, 1)])
+    yield 'directed both ways', directed, nx.DiGraph([(0, 1), (1, 0), (1, 2)])
+
+
+class TestIsos(unittest.TestCase):
+    def test_finders_agree_with_vf2(self):
+        for name, GB, GL in graphs():
+            finder = _iso_finder(GB, GL)
+            self.assertIn(finder, (_iter_isos_of_edge, _iter_isos_along_edges), name)
+            expected = sorted(_iter_isos_vf2(GB, GL, 'type'), key=str)
+            self.assertEqual(sorted(finder(GB, GL, 'type'), key=str), expected, name)
+            anchors = list(GB.nodes())[::3]
+            anchored = sorted((iso for iso in expected if iso[0] in anchors), key=str)
+            self.assertEqual(sorted(finder(GB, GL, 'type', anchors=anchors), key=str), anchored, name)
+            self.assertEqual(sorted(_iter_isos_vf2(GB, GL, 'type', anchors=anchors), key=str), anchored, name)
+
+    def test_parallel_isos_equal_serial_ones(self):
+        for name in ('atlas', 'starcave'):
+            GI, GL, GO = read_example(name)
+            GLs = [GL, nx.DiGraph(GL.subgraph(sorted(GL.nodes())[:2]))]
+            for unique in (False, True):
+                self.assertEqual(get_isos(GO, GLs, processes=3, unique=unique), get_isos(GO, GLs, unique=unique),
+                                 name)
+
+
+class TestForkPool(unittest.TestCase):
+    def test_workers_get_the_value_of_their_pool(self):
+        with _fork_pool(2, _set_worker_value, {'graph': nx.path_graph(3)}) as first_pool:
+            with _fork_pool(2, _set_worker_value, 'other') as second_pool:
+                self.assertEqual(second_pool.map(_get_worker_value, range(4)), ['other'] * 4)
+            self.assertEqual([sorted(value['graph'].nodes()) for value in first_pool.map(_get_worker_value, range(4))],
+                             [[0, 1, 2]] * 4)
+        self.assertEqual(helpers._shared_per_pool, {})
+
+
+class TestIsoArrays(unittest.TestCase):
+    def test_iso_arrays_give_the_isos_and_the_same_runs(self):
+        GI, GL, GO = read_example('starcave')
+        GO = GO.copy()
+        # nodes in no iso, between the others in the node order
+        GO.add_nodes_from(['lonely ' + str(index) for index in range(5)])
+        GO.add_edge('lonely 0', 'lonely 1')
+        nodes = list(GO.nodes())
+        for unique in (False, True):
+            isos = get_isos(GO, [GL], unique=unique)
+            iso_arrays = get_iso_arrays(GO, [GL], unique=unique)
+            self.assertEqual([[tuple(nodes[node] for node in iso) for iso in iso_array.tolist()]
+                              for iso_array in iso_arrays], isos)
+        results = list()
+        for GO_isos_per_GL in (None, get_isos(GO, [GL]), get_iso_arrays(GO, [GL])):
+            state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], GO_isos_per_GL=GO_isos_per_GL, node_attr='value', seed=4)
+            self.assertEqual(state.invisible_nodes, {'lonely ' + str(index) for index in range(5)})
+            steps = [(step.iso, step.pattern, step.colors) for step in state.steps(max_backtracks=20)]
+            results.append((steps, state.colors()[1]))
+        # the last step found nothing left to observe, GO is colored
+        self.assertIsNone(results[0][0][-1][0])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+
+
+class TestPatternCounter(unittest.TestCase):
+    def test_counts_like_get_patterns(self):
+        for name in ('atlas', 'starcave'):
+            GI, GL, GO = read_example(name)
+            GLs = [GL, nx.DiGraph(GL.subgraph(sorted(GL.nodes())[:2]))]
+            counter = PatternCounter(GLs, GIs=[GI], node_attr='value')
+            self.assertEqual(counter.pattern_count_per_GL, get_patterns(GI=GI, GLs=GLs, node_attr='value'), name)
+
+    def test_GI_with_weight_0_adds_no_patterns(self):
+        GI = nx.path_graph(4)
+        nx.set_node_attributes(GI, {0: 'b', 1: 'b', 2: 'r', 3: 'y'}, 'c')
+        other_GI = nx.path_graph(3)
+        nx.set_node_attributes(other_GI, {0: 'g', 1: 'y', 2: 'g'}, 'c')
+        GLs = [nx.path_graph(2)]
+        counter = PatternCounter(GLs, GIs=[GI, other_GI], weights=[1, 0], node_attr='c')
+        self.assertEqual(counter.pattern_count_per_GL, get_patterns(GI=GI, GLs=GLs, node_attr='c'))
+        state = GraphWFCState(GO=nx.path_graph(20), GLs=GLs, pattern_count_per_GL=counter.pattern_count_per_GL,
+                              node_attr='c', seed=0)
+        self.assertTrue(state.run(max_backtracks=10))
+        self.assertNotIn('g', state.colors()[1])
+
+
+class TestUniqueIsos(unittest.TestCase):
+    def test_unique_isos_give_valid_colorings(self):
+        GI = nx.grid_2d_graph(7, 7)
+        nx.set_node_attributes(GI, {(x, y): (x + 2 * y) % 3 for x, y in GI.nodes()}, 'value')
+        GO = nx.grid_2d_graph(12, 12)
+        GL = nx.cycle_graph(4)
+        isos = get_isos(GO, [GL])[0]
+        # a square has 8 automorphisms, one iso per square of GO is kept
+        self.assertEqual(len(get_isos(GO, [GL], unique=True)[0]), len(isos) // 8)
+        patterns = get_patterns(GI=GI, GLs=[GL], node_attr='value')[0]
+        successes = 0
+        for seed in range(5):
+            state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', unique=True, seed=seed)
+            if not state.run(max_backtracks=20):
+                continue
+            successes += 1
+            # the colors fit a pattern at every iso, also at those that were dropped
+            colors = dict(zip(*state.colors()))
+            for iso in isos:
+                self.assertIn(tuple(colors[node] for node in iso), patterns, seed)
+        self.assertGreater(successes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
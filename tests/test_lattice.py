@@ -0,0 +1,47 @@
+import unittest
+import networkx as nx
+import numpy as np
+from graphwfc.helpers import get_iso_arrays
+from graphwfc.lattice import Lattice
+
+
+def GLs():
+    """a path, a corner and a square of a 2D grid with the edge types of Lattice.grid(..., types=(1, 3))"""
+    path = nx.DiGraph()
+    path.add_edges_from([(0, 1), (1, 2)], type=1)
+    corner = nx.DiGraph()
+    corner.add_edge(0, 1, type=1)
+    corner.add_edge(0, 2, type=3)
+    square = corner.copy()
+    square.add_edge(1, 3, type=3)
+    square.add_edge(2, 3, type=1)
+    return [path, corner, square]
+
+
+class TestLattice(unittest.TestCase):
+    def assert_isos_equal(self, lattice, GLs):
+        G = lattice.graph()
+        self.assertEqual(list(G.nodes()), lattice.nodes())
+        for unique in (False, True):
+            expected = get_iso_arrays(G, GLs, unique=unique)
+            found = lattice.get_iso_arrays(GLs, unique=unique)
+            for GL_id, (iso_array, expected_array) in enumerate(zip(found, expected)):
+                self.assertGreater(len(expected_array), 0)
+                np.testing.assert_array_equal(iso_array, expected_array, 'GL ' + str(GL_id))
+
+    def test_grid(self):
+        self.assert_isos_equal(Lattice.grid((7, 9), types=(1, 3)), GLs())
+
+    def test_torus(self):
+        self.assert_isos_equal(Lattice.grid((7, 9), types=(1, 3), periodic=True), GLs())
+        self.assert_isos_equal(Lattice.grid((7, 9), types=(1, 3), periodic=(True, False)), GLs())
+
+    def test_undirected_with_sites(self):
+        # a honeycomb, two sites per cell
+        lattice = Lattice((7, 8), [(0, 1, (0, 0)), (1, 0, (1, 0)), (1, 0, (0, 1))], sites=2, periodic=True,
+                          directed=False)
+        self.assert_isos_equal(lattice, [nx.path_graph(2), nx.path_graph(3), nx.star_graph(3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+import unittest
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_main(*args):
+    """runs python -m graphwfc with the arguments and returns the process"""
+    return subprocess.run([sys.executable, '-m', 'graphwfc'] + list(args), cwd=REPOSITORY_DIR,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+
+class TestMain(unittest.TestCase):
+    def test_options_of_a_single_state_need_it(self):
+        for option in (['--stats'], ['--restarts', 'luby']):
+            for other in (['-j', '2'], ['-t', '100'], ['-f', '100']):
+                process = run_main(*(option + other))
+                self.assertEqual(process.returncode, 2, option + other)
+                self.assertIn(option[0] + ' only works with -j 1 without -t or -f', process.stderr)
+
+    def test_cache_size_needs_a_cache_dir(self):
+        process = run_main('--cache_size', '10')
+        self.assertEqual(process.returncode, 2)
+        self.assertIn('--cache_size only works with -c', process.stderr)
+
+    def test_colors_only_needs_an_output(self):
+        process = run_main('--colors_only')
+        self.assertEqual(process.returncode, 2)
+        self.assertIn('--colors_only needs -o', process.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
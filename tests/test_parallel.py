@@ -0,0 +1,22 @@
+import unittest
+from graphwfc.GraphWFCState import GraphWFCState
+from graphwfc.parallel import run_parallel
+from test_GraphWFCState import read_example
+
+
+class TestParallel(unittest.TestCase):
+    def test_winning_seed_repeats_the_coloring(self):
+        for name in ('atlas', 'starcave'):
+            GI, GL, GO = read_example(name)
+            result = run_parallel(GO, GI=GI, GLs=[GL], node_attr='value', attempts=6, processes=2, seed=10,
+                                  max_backtracks=20)
+            self.assertIsNotNone(result, name)
+            seed, values = result
+            self.assertIn(seed, range(10, 16), name)
+            state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', seed=seed)
+            self.assertTrue(state.run(max_backtracks=20), name)
+            self.assertEqual({node: color for node, color in zip(*state.colors()) if color is not None}, values, name)
+
+
+if __name__ == '__main__':
+    unittest.main()
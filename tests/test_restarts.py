@@ -0,0 +1,61 @@
+import unittest
+import networkx as nx
+from graphwfc.GraphWFCState import GraphWFCState
+from graphwfc.helpers import get_isos, get_patterns
+from graphwfc.restarts import luby, get_budget, run_restarts
+from test_GraphWFCState import read_example
+
+
+def learn_nogoods(state, seeds):
+    """runs the seeds without backtracking and learns from every failed run"""
+    for seed in seeds:
+        state.reset(seed)
+        if not state.run():
+            state.learn_nogood()
+
+
+class TestRestarts(unittest.TestCase):
+    def test_budgets(self):
+        self.assertEqual([luby(i) for i in range(1, 16)], [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8])
+        self.assertEqual([get_budget('geometric', attempt, unit=3) for attempt in range(4)], [3, 6, 12, 24])
+        self.assertEqual([get_budget('fixed', attempt, unit=3) for attempt in range(3)], [3, 3, 3])
+
+    def test_learned_nogoods_contradict(self):
+        GI, GL, GO = read_example('starcave')
+        state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value', seed=0)
+        learn_nogoods(state, range(8))
+        self.assertGreater(len(state.nogoods), 0)
+        for nogood in state.nogoods:
+            colors = dict()
+            for GL_id, iso, pattern in nogood:
+                for node, color in zip(iso, pattern):
+                    colors.setdefault(node, set()).add(color)
+            if any(len(node_colors) > 1 for node_colors in colors.values()):
+                # the decisions give a node two colors
+                continue
+            # giving GO the colors of the decisions leaves no coloring
+            GO_colored = GO.copy()
+            nx.set_node_attributes(GO_colored, {node: node_colors.pop() for node, node_colors in colors.items()},
+                                   'value')
+            with self.assertRaises(ValueError, msg=str(nogood)):
+                GraphWFCState(GO=GO_colored, GI=GI, GLs=[GL], node_attr='value')
+
+    def test_restarts_color_GO(self):
+        GI, GL, GO = read_example('maze')
+        patterns = get_patterns(GI=GI, GLs=[GL], node_attr='value')[0]
+        state = GraphWFCState(GO=GO, GI=GI, GLs=[GL], node_attr='value')
+        report = run_restarts(state, attempts=10, unit=5, seed=0)
+        self.assertTrue(report['success'])
+        self.assertEqual(report['nogoods'], len(state.nogoods))
+        # the successful attempt can be repeated with its seed and budget, the state has the same nogoods
+        colors = state.colors()[1].copy()
+        state.reset(report['seed'])
+        self.assertTrue(state.run(max_backtracks=report['max_backtracks']))
+        self.assertEqual(state.colors()[1], colors)
+        color_per_node = dict(zip(*state.colors()))
+        for iso in get_isos(GO, [GL])[0]:
+            self.assertIn(tuple(color_per_node[node] for node in iso), patterns)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import networkx as nx
+from graphwfc.GraphWFCState import GraphWFCState
+from graphwfc.stats import Stats
+
+
+def colored_path(colors):
+    """returns a path with the colors as attribute 'c' of its nodes"""
+    GI = nx.path_graph(len(colors))
+    nx.set_node_attributes(GI, dict(enumerate(colors)), 'c')
+    return GI
+
+
+class TestStats(unittest.TestCase):
+    def test_counters_of_a_path(self):
+        # two colors that alternate, the first observation decides every node of the path
+        stats = Stats()
+        state = GraphWFCState(GO=nx.path_graph(6), GI=colored_path('aba'), GLs=[nx.path_graph(2)], node_attr='c',
+                              stats=stats, seed=0)
+        numbers = stats.as_dict()
+        # an undirected edge is matched both ways
+        self.assertEqual(numbers['iso_counts_per_GL'], [10])
+        self.assertEqual(numbers['waves'], 1)
+        self.assertEqual(numbers['removed_values'], 0)
+        self.assertEqual(numbers['value_count_histogram'], {2: 6})
+        self.assertEqual(numbers['pattern_count_histograms'], [{2: 10}])
+        self.assertTrue(state.run())
+        numbers = stats.as_dict()
+        self.assertEqual(numbers['phase_counts'], {'patterns': 1, 'isos': 1, 'setup': 1, 'initial propagation': 1,
+                                                   'observe': 2, 'propagate': 1})
+        self.assertEqual(numbers['waves'], 2)
+        # every node lost one color, every iso but the observed one lost a pattern in the propagation
+        self.assertEqual(numbers['removed_values'], 6)
+        self.assertEqual(numbers['changed_isos'], 9)
+        self.assertEqual(numbers['value_count_histogram'], {1: 6})
+        self.assertEqual(numbers['pattern_count_histograms'], [{1: 10}])
+
+    def test_histograms_are_updated_when_a_run_ended(self):
+        events = list()
+        stats = Stats(callback=lambda event, stats: events.append((event, stats.value_count_histogram)))
+        # three colors that may not repeat, an observation only decides the two nodes of its iso
+        GI = nx.cycle_graph(3)
+        nx.set_node_attributes(GI, dict(enumerate('abc')), 'c')
+        state = GraphWFCState(GO=nx.path_graph(8), GI=GI, GLs=[nx.path_graph(2)], node_attr='c',
+                              stats=stats, seed=0)
+        self.assertEqual(events, [('construct', {3: 8})])
+        self.assertIsNone(state.run(iter=1))
+        self.assertIsNone(state.run(time_budget=0))
+        self.assertTrue(state.run())
+        self.assertEqual(events[1:], [('run', {3: 8}), ('run', {3: 8}), ('run', {1: 8})])
+
+    def test_backtracks_are_only_timed_if_allowed(self):
+        # an odd cycle can't be colored with two alternating colors, which the propagation doesn't see
+        GO = nx.cycle_graph(5)
+        GI, GLs = colored_path('aba'), [nx.path_graph(2)]
+        stats = Stats()
+        state = GraphWFCState(GO=GO, GI=GI, GLs=GLs, node_attr='c', stats=stats, seed=0)
+        self.assertFalse(state.run())
+        self.assertEqual(stats.phase_counts['observe'], 1)
+        self.assertNotIn('backtrack', stats.phase_counts)
+        self.assertEqual(len(stats.contradictions), 1)
+        stats = Stats()
+        state = GraphWFCState(GO=GO, GI=GI, GLs=GLs, node_attr='c', stats=stats, seed=0)
+        self.assertFalse(state.run(max_backtracks=5))
+        # banning the pattern of the only decision leaves the other one, which contradicts too
+        self.assertEqual(stats.phase_counts['backtrack'], 1)
+        self.assertEqual(state.backtrack_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from graphwfc import tiled
+from graphwfc.frontier import run_frontier
+from graphwfc.helpers import get_isos, get_patterns
+from graphwfc.tiled import run_tiled, bfs_tiles
+from test_GraphWFCState import read_example
+
+
+class TestStitching(unittest.TestCase):
+    def assert_valid(self, GO, colors, GL, pattern_count_per_GL):
+        """every node in an iso has a color and the colors of every iso are a pattern of GI"""
+        isos = get_isos(GO, [GL])[0]
+        self.assertEqual(set(colors), {node for iso in isos for node in iso})
+        for iso in isos:
+            self.assertIn(tuple(colors[node] for node in iso), pattern_count_per_GL[0], str(iso))
+
+    def solvers(self, GI, GL, GO, seed):
+        """the colors of GO from run_tiled, run_tiled with two processes and run_frontier"""
+        kwargs = dict(GI=GI, GLs=[GL], node_attr='value', seed=seed, attempts=5, max_backtracks=10)
+        yield 'tiled', run_tiled(GO, bfs_tiles(GO, 200), **kwargs)
+        yield 'tiled in parallel', run_tiled(GO, bfs_tiles(GO, 200), processes=2, **kwargs)
+        yield 'frontier', run_frontier(GO, window=200, **kwargs)
+
+    def test_stitched_colors_are_valid(self):
+        GI, GL, GO = read_example('starcave')
+        pattern_count_per_GL = get_patterns(GI=GI, GLs=[GL], node_attr='value')
+        for name, colors in self.solvers(GI, GL, GO, 0):
+            self.assertIsNotNone(colors, name)
+            self.assert_valid(GO, colors, GL, pattern_count_per_GL)
+
+    def test_failed_tiles_of_beach_are_retried(self):
+        # the tiles of beach often can't be solved with the colors around them, the retries free wider areas
+        GI, GL, GO = read_example('beach')
+        pattern_count_per_GL = get_patterns(GI=GI, GLs=[GL], node_attr='value')
+        with mock.patch('graphwfc.tiled._solve_retries', wraps=tiled._solve_retries) as solve_retries:
+            for tile_size, seed, processes in ((100, 1, 1), (100, 2, 2), (200, 1, 1), (200, 2, 1)):
+                colors = run_tiled(GO, bfs_tiles(GO, tile_size), GI=GI, GLs=[GL], node_attr='value', seed=seed,
+                                   processes=processes)
+                self.assertIsNotNone(colors, (tile_size, seed))
+                self.assert_valid(GO, colors, GL, pattern_count_per_GL)
+        self.assertGreater(solve_retries.call_count, 0)
+
+    def test_failed_chunks_of_beach_are_retried(self):
+        # with two attempts per chunk some chunks of beach are only solved after their area was widened twice
+        GI, GL, GO = read_example('beach')
+        pattern_count_per_GL = get_patterns(GI=GI, GLs=[GL], node_attr='value')
+        with mock.patch('graphwfc.tiled._retry_region', wraps=tiled._retry_region) as retry_region:
+            for seed in range(6):
+                colors = run_frontier(GO, GI=GI, GLs=[GL], node_attr='value', window=200, attempts=2, seed=seed)
+                self.assertIsNotNone(colors, seed)
+                self.assert_valid(GO, colors, GL, pattern_count_per_GL)
+        self.assertGreaterEqual(max(call.args[6] for call in retry_region.call_args_list), 2)
+
+    def test_cache_dir_gives_the_same_colors(self):
+        GI, GL, GO = read_example('starcave')
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for name, solve in (('tiled', lambda **kwargs: run_tiled(GO, bfs_tiles(GO, 200), **kwargs)),
+                                ('frontier', lambda **kwargs: run_frontier(GO, window=200, **kwargs))):
+                kwargs = dict(GI=GI, GLs=[GL], node_attr='value', seed=1, attempts=5, max_backtracks=10)
+                expected = solve(**kwargs)
+                self.assertIsNotNone(expected, name)
+                # the second time the patterns are read from the cache
+                for attempt in range(2):
+                    self.assertEqual(solve(cache_dir=cache_dir, **kwargs), expected, name)
+                self.assertNotEqual(os.listdir(cache_dir), [], name)
+
+
+if __name__ == '__main__':
+    unittest.main()